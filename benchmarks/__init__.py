@@ -0,0 +1 @@
+"""Замеры производительности БД на синтетических таблицах."""
@@ -0,0 +1,63 @@
+import csv
+import random
+
+DEFAULT_SCHEMA = {
+    "name": "str",
+    "city": "str",
+    "age": "int",
+    "score": "int",
+    "active": "bool",
+}
+STR_CARDINALITY = {"name": None, "city": 50}
+INT_RANGE = {"age": (18, 90), "score": (0, 1_000_000)}
+
+
+def schema_columns(schema: dict) -> list[str]:
+    """Аргументы create_table: ["name:str", ...]."""
+    return [f"{col}:{col_type}" for col, col_type in schema.items()]
+
+
+def generate_rows(schema: dict, count: int, seed: int = 0, start: int = 0):
+    """Синтетические строки (без ID) под схему create_table.
+
+    Строки str — из словаря заданной мощности (None — уникальные),
+    int — равномерно из диапазона столбца, bool — пополам.
+    """
+    rnd = random.Random(seed)
+    makers = [_maker(col, col_type, rnd) for col, col_type in schema.items()]
+    for number in range(start, start + count):
+        yield [make(number) for make in makers]
+
+
+def write_csv(filepath: str, schema: dict, count: int, seed: int = 0) -> None:
+    """Пишет CSV для команды import."""
+    with open(filepath, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(schema)
+        for row in generate_rows(schema, count, seed):
+            writer.writerow(
+                [literal(v) if isinstance(v, bool) else v for v in row]
+            )
+
+
+def literal(value: object) -> str:
+    """Значение в синтаксисе запроса: "строка", 1, true."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def _maker(col: str, col_type: str, rnd: random.Random):
+    if col_type == "bool":
+        return lambda _: rnd.random() < 0.5
+    if col_type == "int":
+        low, high = INT_RANGE.get(col, (0, 1000))
+        return lambda _: rnd.randint(low, high)
+
+    cardinality = STR_CARDINALITY.get(col, 1000)
+    if cardinality is None:
+        return lambda number: f"{col}{number}"
+    return lambda _: f"{col}{rnd.randrange(cardinality)}"
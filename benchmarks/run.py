@@ -0,0 +1,417 @@
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from prettytable import PrettyTable
+
+from src.primitive_db import engine, parallel
+from src.primitive_db.buffer import BUFFER_POOL
+from src.primitive_db.decorators import set_auto_confirm
+from src.primitive_db.utils import TABLE_FORMATS, load_table_data
+
+from .data import DEFAULT_SCHEMA, generate_rows, literal, schema_columns, write_csv
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_OPS = 100
+DEFAULT_TOLERANCE = 0.25
+COLD_START_RUNS = 3
+# select без where печатает всю таблицу: дальше замер занимает минуты.
+SELECT_ALL_MAX_ROWS = 100_000
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Замеры производительности БД на синтетических таблицах.",
+    )
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="размеры таблиц через запятую (по умолчанию 1000,10000,100000)",
+    )
+    parser.add_argument(
+        "--ops", type=int, default=DEFAULT_OPS, help="операций на замер"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="зерно генератора")
+    parser.add_argument(
+        "--output", metavar="FILE", help="сохранить результаты в JSON"
+    )
+    parser.add_argument(
+        "--baseline", metavar="FILE", help="сравнить с результатами прошлого запуска"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="допустимый рост медианы задержки (по умолчанию 0.25 — на 25%%)",
+    )
+    parser.add_argument("--workers", type=int, help="процессов параллельного просмотра")
+    parser.add_argument("--buffer-rows", type=int, help="строк в пуле буферов")
+    parser.add_argument("--cache-rows", type=int, help="строк в кэше select")
+    parser.add_argument(
+        "--format",
+        choices=sorted(TABLE_FORMATS),
+        default="json",
+        help="формат снимка таблицы (по умолчанию json)",
+    )
+    parser.add_argument(
+        "--dictionary",
+        default="",
+        metavar="COLS",
+        help="столбцы str, хранимые кодами словаря, через запятую",
+    )
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    settings = _apply_settings(args)
+    settings["format"] = args.format
+    dictionary = [name for name in args.dictionary.split(",") if name.strip()]
+    settings["dictionary"] = dictionary
+    baseline = _load(args.baseline) if args.baseline else None
+    output = os.path.abspath(args.output) if args.output else None
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "ops": args.ops,
+            "seed": args.seed,
+            "schema": DEFAULT_SCHEMA,
+            "settings": settings,
+        },
+        "results": {},
+    }
+    for size in sizes:
+        print(f"Таблица на {size} строк...", flush=True)
+        report["results"][str(size)] = bench_size(
+            size, args.ops, args.seed, args.format, dictionary
+        )
+
+    print_results(report)
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=4)
+        print(f"Результаты сохранены в {output}")
+
+    if baseline is None:
+        return 0
+    regressions = print_comparison(report, baseline, args.tolerance)
+    return 1 if regressions else 0
+
+
+def bench_size(
+    size: int, ops: int, seed: int, fmt: str = "json", dictionary=()
+) -> dict:
+    """Все замеры для таблицы из size строк в чистом каталоге данных.
+
+    fmt — формат снимка, в который таблица переводится после загрузки,
+    dictionary — столбцы со словарём.
+    """
+    table = f"bench_{size}"
+    rnd = random.Random(seed)
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="primitive_db_bench_")
+    os.chdir(workdir)
+    try:
+        _run(f"create_table {table} {' '.join(schema_columns(DEFAULT_SCHEMA))}")
+        write_csv("data.csv", DEFAULT_SCHEMA, size, seed)
+        results = {
+            "import": measure_once(lambda: _run(f"import {table} data.csv"), size)
+        }
+        _run(f"checkpoint {table}")
+        for column in dictionary:
+            _run(f"encoding {table} {column.strip()} dictionary")
+        if fmt != "json":
+            _run(f"convert {table} {fmt}")
+        results["memory"] = measure_memory(table)
+        results["cold_start"] = measure(
+            lambda _: _cold_start(workdir, table), COLD_START_RUNS
+        )
+
+        new_rows = list(generate_rows(DEFAULT_SCHEMA, ops, seed + 1, start=size))
+        results["insert"] = measure(
+            lambda i: _run(
+                f"insert into {table} values "
+                f"({', '.join(literal(v) for v in new_rows[i])})"
+            ),
+            ops,
+        )
+
+        if size <= SELECT_ALL_MAX_ROWS:
+            results["select_all"] = measure(
+                lambda _: _run(f"select from {table}"), max(ops // 20, 3)
+            )
+        results["select_where"] = measure(
+            lambda _: _run(
+                f'select from {table} where name = "name{rnd.randrange(size)}"'
+            ),
+            ops,
+        )
+        results["select_range"] = measure(
+            lambda _: _run(
+                f"select count(*), avg(score) from {table} "
+                f"where age between {rnd.randint(18, 85)} and 90 and active = true"
+            ),
+            ops,
+        )
+        cached = f'select from {table} where city = "city7" limit 20'
+        _run(cached)
+        results["select_cached"] = measure(lambda _: _run(cached), ops)
+
+        ids = rnd.sample(range(1, size + 1), min(2 * ops, size))
+        updates = ids[:ops]
+        deletes = ids[ops:]
+        results["update"] = measure(
+            lambda i: _run(
+                f"update {table} set score = {i} where ID = {updates[i]}"
+            ),
+            len(updates),
+        )
+        if deletes:
+            results["delete"] = measure(
+                lambda i: _run(f"delete from {table} where ID = {deletes[i]}"),
+                len(deletes),
+            )
+        results["info"] = measure(lambda _: _run(f"info {table}"), max(ops // 10, 3))
+        return results
+    finally:
+        os.chdir(cwd)
+        BUFFER_POOL.evict_table(table)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def measure(func, count: int) -> dict:
+    """Задержки count вызовов func(i): пропускная способность и перцентили."""
+    latencies = []
+    start = time.perf_counter()
+    for i in range(count):
+        began = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - began)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def measure_once(func, rows: int) -> dict:
+    """Один вызов, обрабатывающий rows строк: строк в секунду."""
+    start = time.perf_counter()
+    func()
+    total = time.perf_counter() - start
+    return {
+        "count": 1,
+        "rows": rows,
+        "total_s": total,
+        "rows_per_s": rows / total if total else None,
+    }
+
+
+def measure_memory(table: str) -> dict:
+    """Память строк таблицы: Record против тех же строк в dict.
+
+    table_bytes — вся загруженная таблица (со значениями), record_bytes и
+    dict_bytes — только контейнеры строк (значения общие).
+    """
+    tracemalloc.start()
+    try:
+        rows = load_table_data(table)
+        table_bytes = tracemalloc.get_traced_memory()[0]
+        before = tracemalloc.get_traced_memory()[0]
+        records = [type(row)(row) for row in rows]
+        record_bytes = tracemalloc.get_traced_memory()[0] - before
+        before = tracemalloc.get_traced_memory()[0]
+        dicts = [row.to_dict() for row in rows]
+        dict_bytes = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del records, dicts
+
+    count = max(len(rows), 1)
+    return {
+        "rows": len(rows),
+        "table_bytes": table_bytes,
+        "bytes_per_row": table_bytes / count,
+        "record_bytes_per_row": record_bytes / count,
+        "dict_bytes_per_row": dict_bytes / count,
+    }
+
+
+def summarize(latencies: list[float], total: float) -> dict:
+    """count, total_s, ops_per_s и перцентили задержки в миллисекундах."""
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "total_s": total,
+        "ops_per_s": len(ordered) / total if total else None,
+        "p50_ms": _percentile(ordered, 0.50) * 1000,
+        "p95_ms": _percentile(ordered, 0.95) * 1000,
+        "p99_ms": _percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """Сравнение медиан задержки (для import — скорости) с базовым запуском."""
+    rows = []
+    for size, ops in report["results"].items():
+        for op, current in ops.items():
+            base = baseline.get("results", {}).get(size, {}).get(op)
+            if not base:
+                continue
+            if "rows_per_s" in current:
+                # Для загрузки больше — лучше: сравниваем время на строку.
+                before, after = 1 / base["rows_per_s"], 1 / current["rows_per_s"]
+            elif "bytes_per_row" in current:
+                before, after = base["bytes_per_row"], current["bytes_per_row"]
+            else:
+                before, after = base["p50_ms"], current["p50_ms"]
+            ratio = after / before if before else math.inf
+            rows.append(
+                {
+                    "size": size,
+                    "op": op,
+                    "baseline": before,
+                    "current": after,
+                    "ratio": ratio,
+                    "regression": ratio > 1 + tolerance,
+                }
+            )
+    return rows
+
+
+def print_results(report: dict) -> None:
+    table = PrettyTable()
+    table.field_names = [
+        "Строк",
+        "Операция",
+        "Опер./с",
+        "p50, мс",
+        "p95, мс",
+        "p99, мс",
+    ]
+    for size, ops in report["results"].items():
+        for op, stats in ops.items():
+            if "rows_per_s" in stats:
+                table.add_row(
+                    [size, op, f"{stats['rows_per_s']:.0f} строк/с", "", "", ""]
+                )
+                continue
+            if "bytes_per_row" in stats:
+                table.add_row(
+                    [size, op, f"{stats['bytes_per_row']:.0f} байт/строку", "", "", ""]
+                )
+                continue
+            table.add_row(
+                [
+                    size,
+                    op,
+                    f"{stats['ops_per_s']:.1f}",
+                    f"{stats['p50_ms']:.3f}",
+                    f"{stats['p95_ms']:.3f}",
+                    f"{stats['p99_ms']:.3f}",
+                ]
+            )
+    print(table)
+    _print_memory(report)
+
+
+def _print_memory(report: dict) -> None:
+    """Контейнеры строк: Record против dict."""
+    table = PrettyTable()
+    table.field_names = ["Строк", "Record, байт", "dict, байт", "Экономия"]
+    for size, ops in report["results"].items():
+        memory = ops.get("memory")
+        if not memory:
+            continue
+        record, plain = memory["record_bytes_per_row"], memory["dict_bytes_per_row"]
+        saving = 1 - record / plain if plain else 0.0
+        table.add_row([size, f"{record:.0f}", f"{plain:.0f}", f"{saving:.0%}"])
+    if table.rows:
+        print("Память на строку (без значений):")
+        print(table)
+
+
+def print_comparison(report: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """Печатает сравнение с базовым запуском. Возвращает регрессии."""
+    rows = compare(report, baseline, tolerance)
+    table = PrettyTable()
+    table.field_names = ["Строк", "Операция", "Было", "Стало", "Отношение", ""]
+    for row in rows:
+        table.add_row(
+            [
+                row["size"],
+                row["op"],
+                f"{row['baseline']:.4g}",
+                f"{row['current']:.4g}",
+                f"{row['ratio']:.2f}",
+                "РЕГРЕССИЯ" if row["regression"] else "",
+            ]
+        )
+    print(table)
+
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"Регрессий: {len(regressions)} (допуск {tolerance:.0%}).")
+    else:
+        print(f"Регрессий нет (допуск {tolerance:.0%}).")
+    return regressions
+
+
+def _apply_settings(args) -> dict:
+    """Применяет настройки движка из аргументов и возвращает их значения."""
+    if args.workers is not None:
+        parallel.set_workers(args.workers)
+    if args.buffer_rows is not None:
+        BUFFER_POOL.max_rows = args.buffer_rows
+    if args.cache_rows is not None:
+        engine.SELECT_CACHE.max_rows = args.cache_rows
+    set_auto_confirm(True)
+    return {
+        "workers": parallel.workers(),
+        "buffer_rows": BUFFER_POOL.max_rows,
+        "cache_rows": engine.SELECT_CACHE.max_rows,
+    }
+
+
+def _run(command: str) -> None:
+    """Выполняет команду движка, отбрасывая вывод."""
+    with redirect_stdout(io.StringIO()):
+        engine.execute(command)
+
+
+def _cold_start(workdir: str, table: str) -> None:
+    """Новый процесс: запуск, чтение метаданных и таблицы, один запрос."""
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+    subprocess.run(
+        [sys.executable, "-m", "src.primitive_db.main", "--script", "-", "--yes"],
+        input=f"select from {table} where ID = 1\n",
+        cwd=workdir,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    """Перцентиль методом ближайшего ранга."""
+    rank = max(math.ceil(q * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def _load(filepath: str) -> dict:
+    with open(filepath, "r", encoding="utf-8") as file:
+        return json.load(file)
@@ -0,0 +1,157 @@
+from .parser import Aggregate
+from .records import column_values
+
+NUMERIC_FUNCS = {"sum", "avg"}
+
+
+class _Count:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def add(self, values: list) -> None:
+        self.value += len(values)
+
+    def result(self) -> int:
+        return self.value
+
+    def merge(self, other: "_Count") -> None:
+        self.value += other.value
+
+
+class _Sum:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = None
+
+    def add(self, values: list) -> None:
+        if values:
+            total = sum(values)
+            self.value = total if self.value is None else self.value + total
+
+    def result(self) -> int | None:
+        return self.value
+
+    def merge(self, other: "_Sum") -> None:
+        if other.value is not None:
+            self.add([other.value])
+
+
+class _Min:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = None
+
+    def add(self, values: list) -> None:
+        if values:
+            low = min(values)
+            if self.value is None or low < self.value:
+                self.value = low
+
+    def result(self) -> object:
+        return self.value
+
+    def merge(self, other: "_Min") -> None:
+        if other.value is not None:
+            self.add([other.value])
+
+
+class _Max:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = None
+
+    def add(self, values: list) -> None:
+        if values:
+            high = max(values)
+            if self.value is None or high > self.value:
+                self.value = high
+
+    def result(self) -> object:
+        return self.value
+
+    def merge(self, other: "_Max") -> None:
+        if other.value is not None:
+            self.add([other.value])
+
+
+class _Avg:
+    __slots__ = ("total", "count")
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.count = 0
+
+    def add(self, values: list) -> None:
+        self.total += sum(values)
+        self.count += len(values)
+
+    def result(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+    def merge(self, other: "_Avg") -> None:
+        self.total += other.total
+        self.count += other.count
+
+
+ACCUMULATORS = {
+    "count": _Count,
+    "sum": _Sum,
+    "min": _Min,
+    "max": _Max,
+    "avg": _Avg,
+}
+
+
+def accumulators(aggregates: list[Aggregate]) -> list:
+    """Новые накопители для списка агрегатов."""
+    return [ACCUMULATORS[item.func]() for item in aggregates]
+
+
+def aggregate_batches(batches, aggregates: list[Aggregate], group_by=None) -> dict:
+    """Накопители по группам (ключ — значение group_by) за проход по пачкам."""
+    groups: dict = {}
+    if group_by is None:
+        groups[None] = accumulators(aggregates)
+
+    for batch in batches:
+        if group_by is None:
+            parts = {None: batch}
+        else:
+            parts = {}
+            for key, row in zip(column_values(batch, group_by), batch, strict=True):
+                parts.setdefault(key, []).append(row)
+
+        for key, rows in parts.items():
+            state = groups.get(key)
+            if state is None:
+                state = groups[key] = accumulators(aggregates)
+            for acc, item in zip(state, aggregates, strict=True):
+                if item.column is None:
+                    acc.add(rows)
+                else:
+                    values = column_values(rows, item.column)
+                    acc.add([v for v in values if v is not None])
+    return groups
+
+
+def merge_groups(groups: dict, other: dict) -> None:
+    """Добавляет к groups накопители other (частичный результат сегмента)."""
+    for key, state in other.items():
+        mine = groups.get(key)
+        if mine is None:
+            groups[key] = state
+            continue
+        for acc, part in zip(mine, state, strict=True):
+            acc.merge(part)
+
+
+def label(item: str | Aggregate) -> str:
+    """Заголовок столбца результата: name, count(*), sum(age)."""
+    if isinstance(item, str):
+        return item
+    return f"{item.func}({item.column or '*'})"
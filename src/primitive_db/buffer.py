@@ -0,0 +1,238 @@
+import os
+from collections import OrderedDict
+
+from .index import SortedIndex, index_log_path, index_path, load_index
+from .metrics import METRICS
+from .records import Record
+from .utils import (
+    flush_writes,
+    load_metadata,
+    load_table_data,
+    log_path,
+    rollback_transaction,
+    save_metadata,
+    segment_dir,
+    table_path,
+)
+
+DEFAULT_MAX_ROWS = 1_000_000
+
+
+class _Entry:
+    __slots__ = ("paths", "signature", "value", "size")
+
+    def __init__(self, paths: tuple, signature: tuple, value, size: int) -> None:
+        self.paths = paths
+        self.signature = signature
+        self.value = value
+        self.size = size
+
+
+class BufferPool:
+    """Пул разобранных таблиц, индексов и метаданных в памяти.
+
+    Запись перечитывается с диска, только если у её файлов изменились
+    mtime или размер. Суммарный объём ограничен числом строк (LRU).
+    """
+
+    def __init__(self, max_rows: int = DEFAULT_MAX_ROWS) -> None:
+        self.max_rows = max_rows
+        self._entries: OrderedDict = OrderedDict()
+        self._rows = 0
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def table(self, table_name: str) -> list[Record]:
+        """Данные таблицы."""
+        return self._get(
+            ("table", table_name),
+            _table_paths(table_name),
+            lambda: load_table_data(table_name),
+        )
+
+    def cached_table(self, table_name: str) -> list[Record] | None:
+        """Данные таблицы, если они в пуле и актуальны, иначе None (без чтения)."""
+        if not self.has_table(table_name):
+            return None
+        return self.table(table_name)
+
+    def has_table(self, table_name: str) -> bool:
+        """Есть ли в пуле актуальные данные таблицы."""
+        entry = self._entries.get(("table", table_name))
+        return entry is not None and entry.signature == _signature(entry.paths)
+
+    def table_signature(self, table_name: str) -> tuple:
+        """Отпечаток файлов таблицы на диске."""
+        return _signature(_table_paths(table_name))
+
+    def index(
+        self, table_name: str, column: str, kind: str = "hash"
+    ) -> dict | SortedIndex:
+        """Индекс по столбцу."""
+        return self._get(
+            ("index", table_name, column),
+            (index_path(table_name, column), index_log_path(table_name, column)),
+            lambda: load_index(table_name, column, kind),
+        )
+
+    def metadata(self, filepath: str) -> dict:
+        """Метаданные БД."""
+        return self._get(
+            ("meta", filepath), (filepath,), lambda: load_metadata(filepath)
+        )
+
+    def save_metadata(self, filepath: str, data: dict) -> None:
+        """Сохраняет метаданные и оставляет их в пуле."""
+        self.write_through(
+            ("meta", filepath), lambda _: save_metadata(filepath, data), replace=data
+        )
+
+    def store_table(self, table_name: str, data: list[Record]) -> None:
+        """Кладёт в пул данные таблицы, только что записанные на диск."""
+        self._put(("table", table_name), _table_paths(table_name), data)
+
+    def write_through(self, key: tuple, write, apply=None, replace=None) -> None:
+        """Выполняет запись на диск и поддерживает запись пула.
+
+        Если закэшированное значение было актуально до записи, к нему
+        применяется apply(value) (или оно заменяется на replace), и это
+        значение передаётся в write(value). Иначе write(None), а запись
+        выбрасывается и будет перечитана при следующем обращении.
+        """
+        entry = self._entries.get(key)
+        fresh = entry is not None and entry.signature == _signature(entry.paths)
+
+        value = None
+        if fresh and replace is not None:
+            value = replace
+        elif fresh and apply is not None:
+            apply(entry.value)
+            value = entry.value
+
+        try:
+            write(value)
+        except Exception:
+            self.evict(key)
+            raise
+
+        if value is not None:
+            self._put(key, entry.paths, value)
+        else:
+            self.evict(key)
+
+    def flush_writes(self, flush=flush_writes) -> None:
+        """Сбрасывает отложенные записи (flush_writes или commit_transaction),
+        не теряя актуальности пула."""
+        fresh = [
+            key
+            for key, entry in self._entries.items()
+            if entry.signature == _signature(entry.paths)
+        ]
+        written = flush()
+        for key in fresh:
+            entry = self._entries[key]
+            if written.intersection(entry.paths):
+                entry.signature = _signature(entry.paths)
+
+    def rollback(self) -> None:
+        """Отменяет транзакцию и выбрасывает изменённые ею записи пула."""
+        discarded = rollback_transaction()
+        for key in [k for k, e in self._entries.items() if discarded & set(e.paths)]:
+            self.evict(key)
+
+    def evict(self, key: tuple) -> None:
+        """Выбрасывает запись из пула."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._rows -= entry.size
+
+    def evict_table(self, table_name: str) -> None:
+        """Выбрасывает таблицу и её индексы."""
+        for key in [k for k in self._entries if k[0] != "meta" and k[1] == table_name]:
+            self.evict(key)
+
+    def stats(self) -> dict:
+        """Счётчики пула."""
+        return {
+            "entries": len(self._entries),
+            "rows": self._rows,
+            "max_rows": self.max_rows,
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+    def _get(self, key: tuple, paths: tuple, loader):
+        entry = self._entries.get(key)
+        if entry is not None and entry.signature == _signature(paths):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+        self.loads += 1
+        signature = _signature(paths)
+        value = loader()
+        METRICS.inc("buffer_loads_total", kind=key[0])
+        METRICS.inc("bytes_read_total", _bytes(paths), kind=key[0])
+        self._put(key, paths, value, signature)
+        return value
+
+    def _put(self, key: tuple, paths: tuple, value, signature: tuple | None = None):
+        self.evict(key)
+        if signature is None:
+            signature = _signature(paths)
+        entry = _Entry(paths, signature, value, _size(value))
+        self._entries[key] = entry
+        self._rows += entry.size
+
+        # Только что добавленная запись остаётся, даже если она одна больше лимита.
+        while self._rows > self.max_rows and len(self._entries) > 1:
+            _, old = self._entries.popitem(last=False)
+            self._rows -= old.size
+            self.evictions += 1
+
+
+def _table_paths(table_name: str) -> tuple:
+    """Файлы таблицы; mtime каталога сегментов меняется при записи сегмента."""
+    return (table_path(table_name), segment_dir(table_name), log_path(table_name))
+
+
+def _signature(paths: tuple) -> tuple:
+    """Отпечаток файлов: (mtime_ns, размер) либо None для отсутствующих."""
+    result = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            result.append(None)
+        else:
+            result.append((st.st_mtime_ns, st.st_size))
+    return tuple(result)
+
+
+def _bytes(paths: tuple) -> int:
+    """Объём файлов записи на диске (каталог — сумма его файлов)."""
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            total += sum(entry.stat().st_size for entry in os.scandir(path))
+        elif os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def _size(value) -> int:
+    """Вес записи пула в строках."""
+    if isinstance(value, list):
+        return len(value)
+    if isinstance(value, SortedIndex):
+        return len(value.keys)
+    if isinstance(value, dict) and value and isinstance(
+        next(iter(value.values())), list
+    ):
+        return sum(len(ids) for ids in value.values())
+    return 0
+
+
+BUFFER_POOL = BufferPool()
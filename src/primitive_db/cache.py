@@ -0,0 +1,147 @@
+from collections import OrderedDict
+
+DEFAULT_MAX_ROWS = 100_000
+DEFAULT_MAX_PLANS = 512
+DEFAULT_MAX_PLAN_KEY = 4096
+
+
+class SelectCache:
+    """LRU-кэш результатов select с версиями таблиц.
+
+    Ключ записи — (таблица, версия таблицы, условие). Изменение таблицы
+    увеличивает её версию и выбрасывает только её записи. Объём кэша
+    ограничен суммарным числом закэшированных строк.
+    """
+
+    def __init__(self, max_rows: int = DEFAULT_MAX_ROWS) -> None:
+        self.max_rows = max_rows
+        self._entries: OrderedDict = OrderedDict()
+        self._versions: dict[str, int] = {}
+        self._rows = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __call__(self, key: tuple, value_func):
+        """Возвращает результат из кэша или вычисляет его."""
+        table_name, where = key
+        full_key = (table_name, self._versions.get(table_name, 0), where)
+
+        if full_key in self._entries:
+            self._entries.move_to_end(full_key)
+            self.hits += 1
+            return self._entries[full_key]
+
+        self.misses += 1
+        result = value_func()
+        if result is not None:
+            self._store(full_key, result)
+        return result
+
+    def stream(self, key: tuple, rows):
+        """Пропускает строки результата по одной и кэширует результат.
+
+        Результат попадает в кэш, только если пройден целиком и не больше
+        max_rows строк: больший не копируется в память ради кэша.
+        """
+        table_name, where = key
+        full_key = (table_name, self._versions.get(table_name, 0), where)
+        self.misses += 1
+        kept: list | None = []
+        for row in rows:
+            if kept is not None:
+                kept.append(row)
+                if len(kept) > self.max_rows:
+                    kept = None
+            yield row
+        if kept is not None:
+            self._store(full_key, kept)
+
+    def __contains__(self, key: tuple) -> bool:
+        """Есть ли результат в кэше (без учёта в счётчиках и порядке LRU)."""
+        table_name, where = key
+        return (table_name, self._versions.get(table_name, 0), where) in self._entries
+
+    def invalidate(self, table_name: str) -> None:
+        """Увеличивает версию таблицы и удаляет её записи."""
+        self._versions[table_name] = self._versions.get(table_name, 0) + 1
+        for full_key in [k for k in self._entries if k[0] == table_name]:
+            self._rows -= _size(self._entries.pop(full_key))
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        """Счётчики кэша."""
+        return {
+            "entries": len(self._entries),
+            "rows": self._rows,
+            "max_rows": self.max_rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _store(self, full_key: tuple, result: list) -> None:
+        size = _size(result)
+        if size > self.max_rows:
+            return
+
+        self._entries[full_key] = result
+        self._rows += size
+        while self._rows > self.max_rows:
+            _, evicted = self._entries.popitem(last=False)
+            self._rows -= _size(evicted)
+            self.evictions += 1
+
+
+def _size(result: list) -> int:
+    """Вес записи кэша в строках (пустой результат тоже занимает место)."""
+    return max(len(result), 1)
+
+
+class PlanCache:
+    """LRU-кэш планов запросов по нормализованному тексту.
+
+    Тексты длиннее max_key_length (например, insert на тысячи строк)
+    не кэшируются: они редко повторяются, а ключ занимал бы много памяти.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_PLANS,
+        max_key_length: int = DEFAULT_MAX_PLAN_KEY,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_key_length = max_key_length
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __call__(self, key: str, value_func):
+        """Возвращает план из кэша или строит его."""
+        plan = self._entries.get(key)
+        if plan is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return plan
+
+        self.misses += 1
+        plan = value_func()
+        if len(key) <= self.max_key_length:
+            self._entries[key] = plan
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return plan
+
+    def stats(self) -> dict:
+        """Счётчики кэша."""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,48 @@
+SYSTEM_KEY = "__system__"
+
+
+def table_names(metadata: dict) -> list[str]:
+    """Список пользовательских таблиц."""
+    return [name for name in metadata if name != SYSTEM_KEY]
+
+
+def is_table(metadata: dict, table_name: str) -> bool:
+    """Проверяет, что таблица существует."""
+    return table_name != SYSTEM_KEY and table_name in metadata
+
+
+def table_settings(metadata: dict, table_name: str) -> dict:
+    """Служебные сведения таблицы (индексы и т.п.)."""
+    system = metadata.setdefault(SYSTEM_KEY, {})
+    return system.setdefault(table_name, {})
+
+
+def table_indexes(metadata: dict, table_name: str) -> dict:
+    """Индексы таблицы: {столбец: вид}."""
+    return metadata.get(SYSTEM_KEY, {}).get(table_name, {}).get("indexes", {})
+
+
+def table_format(metadata: dict, table_name: str) -> str:
+    """Формат файлов сегментов таблицы: json или columnar."""
+    return metadata.get(SYSTEM_KEY, {}).get(table_name, {}).get("format", "json")
+
+
+def table_dictionary(metadata: dict, table_name: str) -> list[str]:
+    """Столбцы str таблицы, которые в колоночном формате кодируются словарём."""
+    return metadata.get(SYSTEM_KEY, {}).get(table_name, {}).get("dictionary", [])
+
+
+def table_tombstones(metadata: dict, table_name: str) -> int:
+    """Число удалённых строк, ещё лежащих в сегментах (до уплотнения)."""
+    return metadata.get(SYSTEM_KEY, {}).get(table_name, {}).get("tombstones", 0)
+
+
+def without_table(metadata: dict, table_name: str) -> dict:
+    """Копия метаданных без таблицы и её служебных сведений."""
+    new_metadata = dict(metadata)
+    new_metadata.pop(table_name, None)
+    if SYSTEM_KEY in new_metadata:
+        system = dict(new_metadata[SYSTEM_KEY])
+        system.pop(table_name, None)
+        new_metadata[SYSTEM_KEY] = system
+    return new_metadata
@@ -0,0 +1,142 @@
+import json
+import queue
+import socket
+import threading
+
+from .server import DEFAULT_HOST, DEFAULT_PORT
+
+POOL_SIZE = 4
+PIPELINE_WINDOW = 64
+TIMEOUT = 30.0
+
+
+class ServerError(Exception):
+    """Команда завершилась на сервере непредвиденной ошибкой."""
+
+
+class _Connection:
+    """Одно соединение с сервером."""
+
+    def __init__(self, host: str, port: int, timeout: float) -> None:
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.sock.makefile("rb")
+
+    def send(self, lines: list[str]) -> None:
+        self.sock.sendall("".join(lines).encode("utf-8"))
+
+    def receive(self) -> dict:
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("сервер закрыл соединение")
+        return json.loads(line)
+
+    def close(self) -> None:
+        self.file.close()
+        self.sock.close()
+
+
+class Client:
+    """Клиент сервера БД с пулом соединений.
+
+    Соединения открываются по мере надобности (не больше pool_size) и
+    переиспользуются; потоки, которым не хватило соединения, ждут
+    освободившееся. pipeline отправляет команды пачками, не дожидаясь
+    ответа на каждую.
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        pool_size: int = POOL_SIZE,
+        timeout: float = TIMEOUT,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def execute(self, command: str) -> str:
+        """Выполняет команду и возвращает напечатанный ею текст."""
+        return self.pipeline([command])[0]
+
+    def pipeline(self, commands: list[str], window: int = PIPELINE_WINDOW) -> list[str]:
+        """Выполняет команды по порядку на одном соединении.
+
+        Команды уходят пачками по window штук, ответы читаются после
+        отправки пачки: одна задержка сети на пачку вместо одной на команду.
+        Транзакция принадлежит соединению, поэтому begin ... commit
+        передаются одним вызовом pipeline.
+        """
+        lines = [_request_line(command) for command in commands]
+        conn = self._acquire()
+        results = []
+        try:
+            for start in range(0, len(lines), window):
+                batch = lines[start : start + window]
+                conn.send(batch)
+                results.extend(conn.receive() for _ in batch)
+        except BaseException:
+            self._discard(conn)
+            raise
+        self._idle.put(conn)
+
+        for response in results:
+            if not response["ok"]:
+                raise ServerError(response["output"].strip())
+        return [response["output"] for response in results]
+
+    def close(self) -> None:
+        """Закрывает свободные соединения пула."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _acquire(self) -> _Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened < self.pool_size
+            if can_open:
+                self._opened += 1
+        if not can_open:
+            try:
+                return self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError("нет свободного соединения в пуле") from None
+
+        try:
+            return _Connection(self.host, self.port, self.timeout)
+        except BaseException:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+    def _discard(self, conn: _Connection) -> None:
+        conn.close()
+        with self._lock:
+            self._opened -= 1
+
+
+def _request_line(command: str) -> str:
+    if "\n" in command or "\r" in command:
+        raise ValueError("команда должна занимать одну строку")
+    if command.strip() == "exit":
+        raise ValueError("exit закрывает соединение, используйте close()")
+    return command + "\n"
@@ -0,0 +1,358 @@
+import json
+import mmap
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from struct import Struct
+
+from .parser import BoolExpr, Condition, Where
+from .records import Record, column_names, column_values, record_type
+
+EXTENSION = ".col"
+MAGIC = b"PDBCOL1\n"
+ALIGN = 8
+# Словарь строится, если различных строк в сегменте не больше этой доли:
+# для почти уникального столбца он только добавил бы коды к тем же строкам.
+DICTIONARY_MAX_RATIO = 0.5
+
+_LENGTH = Struct("<Q")
+_INT64 = (-(2**63), 2**63 - 1)
+_BOOLS = (False, True)
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def encode_segment(rows: list[Record], dictionary=()) -> bytes:
+    """Сегмент в колоночном формате.
+
+    Файл: MAGIC, длина заголовка (8 байт), заголовок JSON (число строк и
+    расположение областей столбцов), затем сами области, выровненные по
+    ALIGN байт. int — массив int64, bool — байт на значение, str — смещения
+    (int64, строк + 1) и блок UTF-8; прочие значения хранятся как str из
+    JSON. Пустые значения (None) отмечает маска — байт на строку.
+
+    Столбцы str из dictionary кодируются словарём: отсортированные
+    различные строки (как str) и код строки — номер её значения в словаре
+    (целое 1 или 2 байта, -1 — пустое значение). Если различных строк
+    больше DICTIONARY_MAX_RATIO от числа строк, столбец хранится как str.
+    """
+    body = bytearray()
+
+    def place(data: bytes) -> list[int]:
+        body.extend(bytes(-len(body) % ALIGN))
+        start = len(body)
+        body.extend(data)
+        return [start, len(data)]
+
+    def place_strings(column: dict, values: list) -> None:
+        blobs = [b"" if v is None else v.encode("utf-8") for v in values]
+        offsets = array("q", [0])
+        total = 0
+        for blob in blobs:
+            total += len(blob)
+            offsets.append(total)
+        column["offsets"] = place(offsets.tobytes())
+        column["data"] = place(b"".join(blobs))
+
+    columns = []
+    for name in column_names(rows):
+        values = column_values(rows, name)
+        kind = _kind(values)
+        words = None
+        if kind == "str" and name in dictionary:
+            words = sorted(set(values) - {None})
+        if words is not None and len(words) <= DICTIONARY_MAX_RATIO * len(values):
+            codes = dict(zip(words, range(len(words))))
+            width = _code_width(len(words))
+            column = {"name": name, "type": "dict", "nulls": None, "width": width}
+            column["codes"] = place(
+                array(width, [codes.get(value, -1) for value in values]).tobytes()
+            )
+            place_strings(column, words)
+            columns.append(column)
+            continue
+
+        column = {"name": name, "type": kind, "nulls": None}
+        if any(value is None for value in values):
+            column["nulls"] = place(bytes(value is None for value in values))
+
+        if kind == "int":
+            column["data"] = place(array("q", (v or 0 for v in values)).tobytes())
+        elif kind == "bool":
+            column["data"] = place(bytes(value is True for value in values))
+        else:
+            if kind == "json":
+                values = list(map(_encode, values))
+            place_strings(column, values)
+        columns.append(column)
+
+    header = _encode(
+        {"rows": len(rows), "byteorder": sys.byteorder, "columns": columns}
+    ).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + _LENGTH.size + len(header)) % ALIGN)
+    return MAGIC + _LENGTH.pack(len(header)) + header + bytes(body)
+
+
+def _code_width(size: int) -> str:
+    """Тип массива кодов словаря из size строк (код -1 — пустое значение).
+
+    В сегменте не больше SEGMENT_ID_SPAN строк, а словарь — не больше
+    DICTIONARY_MAX_RATIO от них, поэтому кодам хватает 2 байт.
+    """
+    return "b" if size <= 127 else "h"
+
+
+def _kind(values: list) -> str:
+    """Вид хранения столбца по его значениям."""
+    types = set(map(type, values))
+    types.discard(type(None))
+    if types == {int}:
+        low, high = _INT64
+        present = [value for value in values if value is not None]
+        if low <= min(present) and max(present) <= high:
+            return "int"
+        return "json"
+    if types == {bool}:
+        return "bool"
+    if types <= {str}:
+        return "str"
+    return "json"
+
+
+class Segment:
+    """Сегмент в колоночном формате, открытый через mmap.
+
+    Столбец читается из файла только при обращении к нему, а с positions —
+    только значения этих строк. bytes_read — сколько байт прочитано.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[: len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path}: не колоночный сегмент")
+
+        start = len(MAGIC) + _LENGTH.size
+        (length,) = _LENGTH.unpack_from(self._map, len(MAGIC))
+        header = json.loads(self._map[start : start + length])
+        self._base = start + length
+        self._rows = header["rows"]
+        self._columns = {column["name"]: column for column in header["columns"]}
+        order = "<" if header["byteorder"] == "little" else ">"
+        self._swap = header["byteorder"] != sys.byteorder
+        self._order = order
+        self._int = Struct(order + "q")
+        self._words: dict[str, list] = {}
+        self.bytes_read = start + length
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def __enter__(self) -> "Segment":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._map.close()
+
+    def names(self) -> tuple[str, ...]:
+        """Столбцы сегмента по порядку."""
+        return tuple(self._columns)
+
+    def column(self, name: str, positions: list[int] | None = None) -> list:
+        """Значения столбца (только строк positions, если они заданы)."""
+        count = self._rows if positions is None else len(positions)
+        column = self._columns.get(name)
+        if column is None:
+            return [None] * count
+        if column["type"] == "dict":
+            # Строки словаря общие для всех строк сегмента (и интернированы),
+            # код -1 — последний элемент, None.
+            words = self._dictionary(column)
+            return list(map(words.__getitem__, self.codes(name, positions)))
+        sparse = self._sparse(positions)
+        if sparse:
+            values = self._pick(column, positions)
+        else:
+            values = self._whole(column)
+            if positions is not None:
+                values = [values[pos] for pos in positions]
+
+        nulls = column["nulls"]
+        if nulls is None:
+            return values
+        start = self._base + nulls[0]
+        if sparse:
+            mask = [self._map[start + pos] for pos in positions]
+            self.bytes_read += len(positions)
+        else:
+            mask = self._read(nulls)
+            if positions is not None:
+                mask = [mask[pos] for pos in positions]
+        return [None if null else value for value, null in zip(values, mask)]
+
+    def codes(self, name: str, positions: list[int] | None = None) -> list[int]:
+        """Коды словаря столбца (только строк positions, если они заданы)."""
+        column = self._columns[name]
+        width = column["width"]
+        if self._sparse(positions):
+            unpack = Struct(self._order + width).unpack_from
+            start = self._base + column["codes"][0]
+            size = array(width).itemsize
+            self.bytes_read += len(positions) * size
+            return [unpack(self._map, start + pos * size)[0] for pos in positions]
+
+        codes = array(width, self._read(column["codes"]))
+        if self._swap:
+            codes.byteswap()
+        codes = codes.tolist()
+        if positions is not None:
+            codes = [codes[pos] for pos in positions]
+        return codes
+
+    def coded(self, where: Where) -> tuple[Where, dict]:
+        """Условие и значения его столбцов для column_positions.
+
+        Условия по столбцам со словарём переводятся в условия на коды:
+        сравниваются целые, а строки столбца не читаются.
+        """
+        columns: dict = {}
+        return self._coded(where, columns), columns
+
+    def _coded(self, where: Where, columns: dict) -> Where:
+        if isinstance(where, BoolExpr):
+            items = tuple(self._coded(item, columns) for item in where.items)
+            return BoolExpr(where.op, items)
+
+        name = where.column
+        column = self._columns.get(name)
+        if column is None or column["type"] != "dict":
+            if name not in columns:
+                columns[name] = self.column(name)
+            return where
+        if name not in columns:
+            columns[name] = self.codes(name)
+        return _code_condition(where, self._dictionary(column)[:-1])
+
+    def records(self, positions: list[int] | None = None) -> list[Record]:
+        """Строки целиком (только positions, если они заданы)."""
+        if positions is not None and not positions:
+            return []
+        cls = record_type(self._columns)
+        columns = [self.column(name, positions) for name in self._columns]
+        return list(map(cls, zip(*columns)))
+
+    def _sparse(self, positions: list[int] | None) -> bool:
+        """Читать отдельные значения (их немного), а не всю область столбца."""
+        return positions is not None and len(positions) * ALIGN < self._rows
+
+    def _dictionary(self, column: dict) -> list:
+        """Строки словаря столбца и None в конце (для кода -1)."""
+        words = self._words.get(column["name"])
+        if words is None:
+            words = list(map(sys.intern, self._strings(column)))
+            words.append(None)
+            self._words[column["name"]] = words
+        return words
+
+    def _read(self, area: list[int]) -> bytes:
+        start = self._base + area[0]
+        self.bytes_read += area[1]
+        return self._map[start : start + area[1]]
+
+    def _whole(self, column: dict) -> list:
+        kind = column["type"]
+        if kind == "int":
+            values = array("q", self._read(column["data"]))
+            if self._swap:
+                values.byteswap()
+            return values.tolist()
+        if kind == "bool":
+            return list(map(_BOOLS.__getitem__, self._read(column["data"])))
+        values = self._strings(column)
+        if kind == "json":
+            return list(map(json.loads, values))
+        return values
+
+    def _strings(self, column: dict) -> list[str]:
+        """Строки области смещений и блока UTF-8."""
+        offsets = array("q", self._read(column["offsets"]))
+        if self._swap:
+            offsets.byteswap()
+        blob = self._read(column["data"])
+        bounds = zip(offsets, offsets[1:])
+        text = blob.decode("utf-8")
+        if len(text) == len(blob):
+            # Только ASCII: смещения в байтах совпадают со смещениями в тексте.
+            values = [text[start:end] for start, end in bounds]
+        else:
+            values = [blob[start:end].decode("utf-8") for start, end in bounds]
+        return values
+
+    def _pick(self, column: dict, positions: list[int]) -> list:
+        kind = column["type"]
+        data = self._base + column["data"][0]
+        if kind == "int":
+            self.bytes_read += len(positions) * self._int.size
+            unpack = self._int.unpack_from
+            return [unpack(self._map, data + pos * 8)[0] for pos in positions]
+        if kind == "bool":
+            self.bytes_read += len(positions)
+            return [_BOOLS[self._map[data + pos]] for pos in positions]
+
+        offsets = self._base + column["offsets"][0]
+        unpack = self._int.unpack_from
+        values = []
+        for pos in positions:
+            start = unpack(self._map, offsets + pos * 8)[0]
+            end = unpack(self._map, offsets + pos * 8 + 8)[0]
+            values.append(self._map[data + start : data + end].decode("utf-8"))
+            self.bytes_read += 16 + end - start
+        if kind == "json":
+            return list(map(json.loads, values))
+        return values
+
+
+def _code_condition(where: Condition, words: list[str]) -> Condition:
+    """Условие на строки в условие на коды отсортированного словаря words.
+
+    Порядок кодов совпадает с порядком строк, поэтому переводятся и
+    диапазоны. Код пустого значения -1 не подходит ни под одно условие.
+    """
+    name, op, value = where
+    if op == "=":
+        code = _code(words, value)
+        if code is None:
+            return Condition(name, "in", ())
+        return Condition(name, "=", code)
+    if op == "in":
+        codes = (_code(words, item) for item in value)
+        return Condition(name, "in", tuple(code for code in codes if code is not None))
+    if op == "between":
+        low, high = value
+        bounds = (bisect_left(words, low), bisect_right(words, high) - 1)
+        return Condition(name, "between", bounds)
+    if op == "<":
+        return Condition(name, "between", (0, bisect_left(words, value) - 1))
+    if op == "<=":
+        return Condition(name, "between", (0, bisect_right(words, value) - 1))
+    if op == ">":
+        return Condition(name, ">=", bisect_right(words, value))
+    if op == ">=":
+        return Condition(name, ">=", bisect_left(words, value))
+    raise ValueError(f"оператор {op}")
+
+
+def _code(words: list[str], value: str) -> int | None:
+    pos = bisect_left(words, value)
+    if pos < len(words) and words[pos] == value:
+        return pos
+    return None
+
+
+def load_segment(path: str) -> list[Record]:
+    """Все строки сегмента в колоночном формате."""
+    with Segment(path) as segment:
+        return segment.records()
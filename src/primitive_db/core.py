@@ -1,7 +1,77 @@
+import copy
+import csv
+import json
+import os
+from itertools import islice
+
+from .aggregate import aggregate_batches, label
+from .buffer import BUFFER_POOL
+from .catalog import (
+    SYSTEM_KEY,
+    is_table,
+    table_dictionary,
+    table_format,
+    table_indexes,
+    table_settings,
+    without_table,
+)
+from .columnar import EXTENSION as COLUMNAR_EXTENSION
+from .columnar import Segment
 from .decorators import confirm_action, handle_db_errors, log_time
-from .utils import load_table_data, save_table_data
+from .index import (
+    INDEX_KINDS,
+    SortedIndex,
+    apply_index_changes,
+    build_index,
+    index_count,
+    index_ids,
+    index_kind,
+    index_supports,
+    log_index_changes,
+    row_position,
+    rows_by_ids,
+    save_index,
+)
+from .metrics import METRICS
+from .parallel import aggregate_segments, scan_positions, use_parallel
+from .parser import Aggregate, BoolExpr, Condition, Where, is_name
+from .planner import (
+    SCAN_BATCH_ROWS,
+    column_positions,
+    conditions,
+    filter_batches,
+    order_where,
+    select_positions,
+)
+from .records import Record, as_dict, conform, record_type, unify
+from .segments import compute_manifest, segment_slice, widen_manifest
+from .segments import may_match as segment_may_match
+from .stats import (
+    apply_stats_changes,
+    compute_stats,
+    empty_stats,
+    may_match,
+    selectivity,
+)
+from .utils import (
+    DB_META_FILEPATH,
+    append_table_log,
+    load_tombstones,
+    logged_rows,
+    segment_files,
+    stats_path,
+    table_path,
+)
 
 ALLOWED_TYPES = {"int", "str", "bool"}
+IMPORT_BATCH_SIZE = 10_000
+# Столько строк удаляются из таблицы в памяти по одной (двоичный поиск +
+# сдвиг), больше — одним проходом с новым списком.
+DELETE_IN_PLACE_ROWS = 64
+INDEX_MAX_SELECTIVITY = 0.25
+# Сведения таблицы, которые меняет каждая запись: хранятся в отдельном
+# небольшом файле (stats_path), а не в db_meta.json.
+STATE_KEYS = ("sequence", "stats", "segments")
 
 
 @handle_db_errors
@@ -11,6 +81,10 @@ def create_table(metadata: dict, table_name: str, columns: list[str]) -> dict:
         print(f'Ошибка: Таблица "{table_name}" уже существует.')
         return metadata
 
+    if table_name == SYSTEM_KEY or not is_name(table_name):
+        print(f"Некорректное значение: {table_name}. Попробуйте снова.")
+        return metadata
+
     parsed: list[tuple[str, str]] = []
     for col in columns:
         if ":" not in col:
@@ -25,20 +99,27 @@ def create_table(metadata: dict, table_name: str, columns: list[str]) -> dict:
             print(f"Некорректное значение: {col}. Попробуйте снова.")
             return metadata
 
+        if not is_name(name):
+            print(f"Некорректное значение: {name}. Попробуйте снова.")
+            return metadata
+
         if col_type not in ALLOWED_TYPES:
             print(f"Некорректное значение: {col_type}. Попробуйте снова.")
             return metadata
 
+        # Журнал, сегменты и индексы находят строки по столбцу ID.
+        if name.lower() == "id":
+            name = "ID"
         parsed.append((name, col_type))
 
-    has_id = any(name.lower() == "id" for name, _ in parsed)
+    has_id = any(name == "ID" for name, _ in parsed)
     final_cols: list[tuple[str, str]] = []
 
     if not has_id:
         final_cols.append(("ID", "int"))
     final_cols.extend(parsed)
 
-    new_metadata = dict(metadata)
+    new_metadata = copy.deepcopy(metadata)
     new_metadata[table_name] = {name: col_type for name, col_type in final_cols}
 
     cols_str = ", ".join(f"{name}:{col_type}" for name, col_type in final_cols)
@@ -50,12 +131,11 @@ def create_table(metadata: dict, table_name: str, columns: list[str]) -> dict:
 @confirm_action("удаление таблицы")
 def drop_table(metadata: dict, table_name: str) -> dict:
     """Удалить таблицу."""
-    if table_name not in metadata:
+    if not is_table(metadata, table_name):
         print(f'Ошибка: Таблица "{table_name}" не существует.')
         return metadata
 
-    new_metadata = dict(metadata)
-    del new_metadata[table_name]
+    new_metadata = without_table(metadata, table_name)
 
     print(f'Таблица "{table_name}" успешно удалена.')
     return new_metadata
@@ -96,95 +176,712 @@ def _cast_value(value: object, target_type: str) -> object | None:
 
 @handle_db_errors
 @log_time
-def insert(metadata: dict, table_name: str, values: list[object]) -> list[dict]:
+def insert(metadata: dict, table_name: str, values: list[object]) -> Record | None:
     """Добавить запись."""
-    if table_name not in metadata:
+    if not is_table(metadata, table_name):
+        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        return None
+
+    try:
+        row = _cast_row(metadata[table_name], values)
+    except ValueError as exc:
+        print(f"Некорректное значение: {exc}. Попробуйте снова.")
+        return None
+
+    new_id = reserve_ids(metadata, table_name, save=False)
+    row = _assign_id(row, new_id)
+
+    log_changes(metadata, table_name, inserted=[row])
+
+    print(f'Запись с ID={new_id} успешно добавлена в таблицу "{table_name}".')
+    return row
+
+
+@handle_db_errors
+@log_time
+def insert_many(
+    metadata: dict, table_name: str, rows_values: list[list[object]]
+) -> list[Record] | None:
+    """Добавить несколько записей одной записью в журнал."""
+    if not is_table(metadata, table_name):
         print(f'Ошибка: Таблица "{table_name}" не существует.')
-        return []
+        return None
 
     schema: dict = metadata[table_name]
-    columns = list(schema.keys())
+    try:
+        rows = [_cast_row(schema, values) for values in rows_values]
+    except ValueError as exc:
+        print(f"Некорректное значение: {exc}. Попробуйте снова.")
+        return None
+
+    _write_batch(metadata, table_name, rows)
+    print(
+        f'В таблицу "{table_name}" добавлено записей: {len(rows)} \
+(ID={rows[0].get("ID")}..{rows[-1].get("ID")}).'
+    )
+    return rows
+
+
+@handle_db_errors
+@log_time
+def import_file(
+    metadata: dict, table_name: str, filepath: str, batch_size: int = IMPORT_BATCH_SIZE
+) -> int | None:
+    """Импорт записей из CSV (с заголовком) или JSONL потоково, пачками."""
+    if not is_table(metadata, table_name):
+        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        return None
+
+    schema: dict = metadata[table_name]
+    columns = [c for c in schema if c.lower() != "id"]
+
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(filepath)
 
+    if filepath.lower().endswith(".csv"):
+        records = _read_csv(filepath)
+    elif filepath.lower().endswith((".jsonl", ".ndjson")):
+        records = _read_jsonl(filepath)
+    else:
+        print(f"Некорректное значение: {filepath}. Попробуйте снова.")
+        return None
+
+    # Таблица в пуле: контрольные точки журнала не перечитывают её с диска.
+    BUFFER_POOL.table(table_name)
+
+    imported = 0
+    skipped = 0
+    first_bad_line = None
+    batch: list[Record] = []
+
+    for line_no, record in enumerate(records, start=1):
+        try:
+            batch.append(_cast_row(schema, [record.get(col) for col in columns]))
+        except (ValueError, AttributeError):
+            skipped += 1
+            if first_bad_line is None:
+                first_bad_line = line_no
+            continue
+
+        if len(batch) >= batch_size:
+            _write_batch(metadata, table_name, batch)
+            imported += len(batch)
+            batch = []
+
+    if batch:
+        _write_batch(metadata, table_name, batch)
+        imported += len(batch)
+
+    print(f'В таблицу "{table_name}" импортировано записей: {imported}.')
+    if skipped:
+        print(
+            f"Пропущено некорректных записей: {skipped} \
+(первая — запись №{first_bad_line})."
+        )
+    return imported
+
+
+def _read_csv(filepath: str):
+    """Построчно читает CSV с заголовком."""
+    with open(filepath, "r", encoding="utf-8", newline="") as file:
+        yield from csv.DictReader(file)
+
+
+def _read_jsonl(filepath: str):
+    """Построчно читает JSONL; некорректная строка даёт None."""
+    with open(filepath, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+
+
+def _cast_row(schema: dict, values: list[object]) -> Record:
+    """Проверяет и приводит значения строки (без ID) к типам схемы.
+
+    ID остаётся пустым до выдачи (_assign_id).
+    """
+    columns = list(schema.keys())
     non_id_columns = [c for c in columns if c.lower() != "id"]
     if len(values) != len(non_id_columns):
-        print("Некорректное значение: количество значений. Попробуйте снова.")
-        return load_table_data(table_name)
+        raise ValueError("количество значений")
 
-    row: dict = {}
+    casted_values = {}
     for col_name, raw_value in zip(non_id_columns, values, strict=True):
-        col_type = schema[col_name]
-        casted = _cast_value(raw_value, col_type)
+        casted = _cast_value(raw_value, schema[col_name])
         if casted is None:
-            print(f"Некорректное значение: {raw_value}. Попробуйте снова.")
-            return load_table_data(table_name)
-        row[col_name] = casted
-
-    table_data = load_table_data(table_name)
-    max_id = 0
-    for record in table_data:
-        rec_id = record.get("ID")
-        if isinstance(rec_id, int) and rec_id > max_id:
-            max_id = rec_id
-
-    new_id = max_id + 1
-    row["ID"] = new_id
+            raise ValueError(str(raw_value))
+        casted_values[col_name] = casted
+
+    return record_type(columns)(casted_values.get(col) for col in columns)
+
+
+def _assign_id(row: Record, new_id: int) -> Record:
+    """Строка с ID, проставленным в столбец ID."""
+    for col in row.columns:
+        if col.lower() == "id":
+            return row.replace({col: new_id})
+    return row
+
+
+def _write_batch(metadata: dict, table_name: str, rows: list[Record]) -> None:
+    """Выдаёт ID блоком (строки списка заменяются) и пишет пачку одной
+    записью в журнал."""
+    first_id = reserve_ids(metadata, table_name, len(rows), save=False)
+    for offset, row in enumerate(rows):
+        rows[offset] = _assign_id(row, first_id + offset)
+    log_changes(metadata, table_name, inserted=rows)
+
+
+def reserve_ids(
+    metadata: dict, table_name: str, count: int = 1, save: bool = True
+) -> int:
+    """Резервирует блок из count ID. Возвращает первый ID блока.
+
+    Счётчик хранится в файле сведений таблицы и сохраняется до записи
+    данных, поэтому ID не переиспользуются даже после удаления строк.
+    save=False — сведения сохранит следующий log_changes.
+    """
+    state = table_state(metadata, table_name)
+    last_id = state.get("sequence")
+    if last_id is None:
+        # Таблица создана до появления счётчика: один раз ищем максимум.
+        last_id = max(
+            (
+                row.get("ID")
+                for row in BUFFER_POOL.table(table_name)
+                if isinstance(row.get("ID"), int)
+            ),
+            default=0,
+        )
+
+    state["sequence"] = last_id + count
+    if save:
+        save_table_state(metadata, table_name, state)
+    return last_id + 1
+
+
+def table_state(metadata: dict, table_name: str) -> dict:
+    """Сведения таблицы: счётчик ID, статистика и границы сегментов.
+
+    У таблиц прежних версий, пока файла сведений нет, они берутся из
+    раздела __system__ метаданных.
+    """
+    state = BUFFER_POOL.metadata(stats_path(table_name))
+    if not state:
+        settings = table_settings(metadata, table_name)
+        state.update((key, settings[key]) for key in STATE_KEYS if key in settings)
+    return state
+
+
+def save_table_state(metadata: dict, table_name: str, state: dict) -> None:
+    """Сохраняет сведения таблицы (компактный JSON одного небольшого файла).
+
+    Запись одной строки не переписывает db_meta.json: его размер растёт
+    с числом таблиц и индексов. Сведения, оставшиеся в метаданных от
+    прежних версий, удаляются из них один раз.
+    """
+    BUFFER_POOL.save_metadata(stats_path(table_name), state)
+    settings = table_settings(metadata, table_name)
+    if any(key in settings for key in STATE_KEYS):
+        for key in STATE_KEYS:
+            settings.pop(key, None)
+        BUFFER_POOL.save_metadata(DB_META_FILEPATH, metadata)
+
+
+def init_table_state(metadata: dict, table_name: str) -> None:
+    """Сведения новой таблицы: счётчик 0, пустые статистика и границы."""
+    state = {
+        "sequence": 0,
+        "stats": empty_stats(metadata[table_name]),
+        "segments": {},
+    }
+    BUFFER_POOL.save_metadata(stats_path(table_name), state)
+
+
+def table_stats(metadata: dict, table_name: str) -> dict:
+    """Поддерживаемая статистика таблицы: число строк и статистика столбцов.
+
+    Для таблиц, созданных до её появления, один раз считается по данным.
+    """
+    stats = table_state(metadata, table_name).get("stats")
+    if stats is None or "columns" not in stats:
+        stats = refresh_stats(metadata, table_name, BUFFER_POOL.table(table_name))
+    return stats
+
+
+def refresh_stats(metadata: dict, table_name: str, table_data: list[Record]) -> dict:
+    """Пересчитывает статистику и границы сегментов по данным и сохраняет
+    сведения таблицы."""
+    stats = compute_stats(metadata[table_name], table_data)
+    state = table_state(metadata, table_name)
+    state["stats"] = stats
+    state["segments"] = compute_manifest(table_data)
+    save_table_state(metadata, table_name, state)
+    return stats
+
+
+def scan_rows(
+    metadata: dict, table_name: str, where_clause: Where | None
+) -> list[Record]:
+    """Строки сегментов, в которых по границам столбцов может найтись
+    подходящая под условие строка (по возрастанию ID).
+
+    Колоночная таблица, которой нет в пуле буферов, читается по столбцам
+    (scan_columns): в пул она при этом не попадает.
+    """
+    manifest = table_state(metadata, table_name).get("segments")
+    keep = None
+    if where_clause is not None and manifest:
+        keep = sorted(
+            int(segment)
+            for segment, bounds in manifest.items()
+            if segment_may_match(bounds, where_clause)
+        )
+        if len(keep) == len(manifest):
+            keep = None
+
+    columnar = table_format(metadata, table_name) == "columnar"
+    table_data = BUFFER_POOL.cached_table(table_name)
+    if table_data is None:
+        if where_clause is not None and columnar:
+            rows = scan_columns(table_name, where_clause, keep)
+            if rows is not None:
+                return rows
+        table_data = BUFFER_POOL.table(table_name)
+    if keep is None:
+        return table_data
 
-    ordered_row = {}
-    for col in columns:
-        if col in row:
-            ordered_row[col] = row[col]
-        elif col.lower() == "id":
-            ordered_row[col] = new_id
+    rows = []
+    for segment in keep:
+        rows.extend(segment_slice(table_data, segment))
+    return rows
+
+
+def scan_columns(
+    table_name: str, where_clause: Where, segments: list[int] | None = None
+) -> list[Record] | None:
+    """Подходящие под условие строки колоночной таблицы без её загрузки.
+
+    Из сегментов (всех или segments) читаются ID и столбцы условия (у
+    столбцов со словарём — только коды), целиком — только подходящие
+    строки. Версии строк из журнала заменяют сегментные. None — не все
+    сегменты колоночные.
+    """
+    files = segment_files(table_name)
+    if os.path.exists(table_path(table_name)) or any(
+        not path.endswith(COLUMNAR_EXTENSION) for _, path in files
+    ):
+        return None
+    if segments is not None:
+        keep = set(segments)
+        files = [(segment, path) for segment, path in files if segment in keep]
+
+    changed = logged_rows(table_name)
+    skipped = load_tombstones(table_name) | changed.keys()
+    rows = []
+    for _, path in files:
+        with Segment(path) as segment:
+            where, columns = segment.coded(where_clause)
+            positions = column_positions(where, columns, len(segment))
+            if skipped and positions:
+                ids = segment.column("ID", positions)
+                positions = [
+                    pos for pos, row_id in zip(positions, ids) if row_id not in skipped
+                ]
+            rows.extend(segment.records(positions))
+        METRICS.inc("rows_examined_total", len(segment))
+        METRICS.inc("bytes_read_total", segment.bytes_read, kind="column")
+
+    logged = unify([row for row in changed.values() if row is not None])
+    if logged:
+        matched = [logged[pos] for pos in select_positions(where_clause, logged)]
+        if matched:
+            rows = sorted(rows + matched, key=lambda row: row.get("ID"))
+    return unify(rows)
 
-    table_data.append(ordered_row)
-    save_table_data(table_name, table_data)
 
-    print(f'Запись с ID={new_id} успешно добавлена в таблицу "{table_name}".')
-    return table_data
+@handle_db_errors
+@log_time
+def select(
+    table_data: list[Record],
+    where_clause: Where | None = None,
+    indexes: dict | None = None,
+    limit: int | None = None,
+    offset: int = 0,
+) -> list[Record]:
+    """Выбрать записи.
+
+    При limit просмотр останавливается, как только набрано offset + limit строк.
+    """
+    if limit is None and offset == 0:
+        if where_clause is None:
+            return table_data
+        return matching_rows(table_data, where_clause, indexes)
+
+    stop = None if limit is None else offset + limit
+    return list(islice(iter_select(table_data, where_clause, indexes), offset, stop))
+
+
+def iter_select(
+    table_data: list[Record],
+    where_clause: Where | None = None,
+    indexes: dict | None = None,
+    parallel: bool = False,
+):
+    """Ленивый просмотр подходящих строк."""
+    for batch in iter_batches(table_data, where_clause, indexes, parallel):
+        yield from batch
+
+
+def iter_batches(
+    table_data: list[Record],
+    where_clause: Where | None = None,
+    indexes: dict | None = None,
+    parallel: bool = False,
+):
+    """Подходящие строки пачками (просмотр идёт по SCAN_BATCH_ROWS строк).
+
+    parallel — большую таблицу просмотреть целиком в пуле процессов; для
+    чтения с limit не подходит, так как не останавливается досрочно.
+    """
+    residual = where_clause
+    candidates = table_data
+    if where_clause is not None:
+        candidates, residual = _access_path(table_data, where_clause, indexes or {})
+
+    if residual is None or not (parallel and use_parallel(len(candidates))):
+        yield from filter_batches(candidates, residual)
+        return
+
+    METRICS.inc("rows_examined_total", len(candidates))
+    positions = scan_positions(candidates, residual)
+    for start in range(0, len(positions), SCAN_BATCH_ROWS):
+        yield [candidates[pos] for pos in positions[start : start + SCAN_BATCH_ROWS]]
 
 
 @handle_db_errors
 @log_time
-def select(table_data: list[dict], where_clause: dict | None = None) -> list[dict]:
-    """Выбрать записи."""
-    if where_clause is None:
-        return table_data
+def aggregate(
+    table_data: list[Record],
+    items: tuple,
+    where_clause: Where | None = None,
+    indexes: dict | None = None,
+    group_by: str | None = None,
+) -> list[dict]:
+    """Агрегаты за один потоковый проход.
+
+    В памяти держатся только накопители каждой группы и текущая пачка строк.
+    Большая таблица делится на сегменты: частичные агрегаты считаются
+    в пуле процессов и сливаются.
+    """
+    aggregates = [item for item in items if isinstance(item, Aggregate)]
+    candidates, residual = table_data, where_clause
+    if where_clause is not None:
+        candidates, residual = _access_path(table_data, where_clause, indexes or {})
+
+    if use_parallel(len(candidates)):
+        METRICS.inc("rows_examined_total", len(candidates))
+        groups = aggregate_segments(candidates, residual, aggregates, group_by)
+    else:
+        groups = aggregate_batches(
+            filter_batches(candidates, residual), aggregates, group_by
+        )
+
+    result = []
+    for key, state in groups.items():
+        values = iter([acc.result() for acc in state])
+        result.append(
+            {
+                label(item): key if isinstance(item, str) else next(values)
+                for item in items
+            }
+        )
+    return result
+
+
+def _access_path(
+    table_data: list[Record], where: Where, indexes: dict
+) -> tuple[list[Record], Where | None]:
+    """Строки-кандидаты и условие, которое осталось к ним применить."""
+    served, residual = access_plan(where, indexes)
+    if not served:
+        return table_data, residual
+    if len(served) == 1:
+        ids = index_ids(indexes[served[0].column], served[0])
+    else:
+        ids = set()
+        for condition in served:
+            ids.update(index_ids(indexes[condition.column], condition))
+    return rows_by_ids(table_data, ids), residual
+
+
+def access_plan(
+    where: Where, indexes: dict
+) -> tuple[list[Condition], Where | None]:
+    """Условия, которые обслужат индексы, и условие, оставшееся для фильтра.
+
+    Пустой список — полный просмотр. Для or нужны индексы по всем частям
+    (их ID объединяются); для and из условий с индексом берётся самое
+    избирательное (по числу ID в индексе), остальные проверяются по
+    кандидатам.
+    """
+    if isinstance(where, Condition):
+        if _usable_index(indexes, where) is None:
+            return [], where
+        return [where], None
+
+    if where.op == "or":
+        if any(_usable_index(indexes, item) is None for item in where.items):
+            return [], where
+        return list(where.items), None
+
+    if where.op == "and":
+        best = None
+        for pos, item in enumerate(where.items):
+            index = _usable_index(indexes, item)
+            if index is None:
+                continue
+            count = index_count(index, item)
+            if best is None or count < best[0]:
+                best = (count, pos)
+
+        if best is not None:
+            _, pos = best
+            rest = where.items[:pos] + where.items[pos + 1 :]
+            residual = rest[0] if len(rest) == 1 else BoolExpr("and", rest)
+            return [where.items[pos]], residual
+
+    return [], where
+
+
+def _usable_index(indexes: dict, where: Where) -> dict | SortedIndex | None:
+    """Индекс, обслуживающий простое условие, или None."""
+    if not isinstance(where, Condition):
+        return None
+    index = indexes.get(where.column)
+    if index is None or not index_supports(index_kind(index), where.op):
+        return None
+    return index
 
-    if len(where_clause) != 1:
-        return []
 
-    key, value = next(iter(where_clause.items()))
-    return [row for row in table_data if row.get(key) == value]
+@handle_db_errors
+def update(
+    table_data: list[Record],
+    set_clause: dict,
+    where_clause: Where,
+    indexes: dict | None = None,
+) -> list[tuple[Record, Record]]:
+    """Обновить записи. Возвращает пары (старая, новая) изменённых строк.
+
+    Строки неизменяемы: новые заменяют старые в таблице при записи
+    изменений (log_changes).
+    """
+    changed = []
+    for row in matching_rows(table_data, where_clause, indexes):
+        new = row.replace(set_clause)
+        if new != row:
+            changed.append((row, new))
+    return changed
 
 
 @handle_db_errors
-def update(table_data: list[dict], set_clause: dict, where_clause: dict) -> list[dict]:
-    """Обновить записи."""
-    if len(where_clause) != 1:
-        return table_data
+@confirm_action("удаление записи")
+def delete(
+    table_data: list[Record],
+    where_clause: Where,
+    indexes: dict | None = None,
+) -> list[Record]:
+    """Удалить записи. Возвращает удаляемые строки.
 
-    w_key, w_val = next(iter(where_clause.items()))
-    updated = False
+    Таблица здесь не перестраивается: строки убирает log_changes, а на
+    диске они отмечаются как удалённые до уплотнения.
+    """
+    return matching_rows(table_data, where_clause, indexes)
 
-    for row in table_data:
-        if row.get(w_key) == w_val:
-            for s_key, s_val in set_clause.items():
-                if s_key in row:
-                    row[s_key] = s_val
-                    updated = True
 
-    if not updated:
-        return table_data
+def matching_rows(
+    table_data: list[Record],
+    where_clause: Where,
+    indexes: dict | None = None,
+) -> list[Record]:
+    """Строки, подходящие под условие; при наличии индекса — без полного обхода.
 
-    return table_data
+    Большие таблицы просматриваются по сегментам в пуле процессов.
+    """
+    return list(iter_select(table_data, where_clause, indexes, parallel=True))
 
 
 @handle_db_errors
-@confirm_action("удаление записи")
-def delete(table_data: list[dict], where_clause: dict) -> list[dict]:
-    """Удалить записи."""
-    if len(where_clause) != 1:
-        return table_data
+def create_index(
+    metadata: dict, table_name: str, column: str, kind: str = "hash"
+) -> dict:
+    """Создать индекс по столбцу (hash или ordered)."""
+    if not is_table(metadata, table_name):
+        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        return metadata
+
+    if column not in metadata[table_name]:
+        print(f"Некорректное значение: {column}. Попробуйте снова.")
+        return metadata
+
+    if kind not in INDEX_KINDS:
+        print(f"Некорректное значение: {kind}. Попробуйте снова.")
+        return metadata
+
+    if column in table_indexes(metadata, table_name):
+        print(f'Ошибка: Индекс по столбцу "{column}" уже существует.')
+        return metadata
+
+    table_data = BUFFER_POOL.table(table_name)
+    save_index(table_name, column, build_index(table_data, column, kind))
+
+    new_metadata = copy.deepcopy(metadata)
+    table_settings(new_metadata, table_name).setdefault("indexes", {})[column] = kind
+
+    print(f'Индекс по столбцу "{column}" таблицы "{table_name}" успешно создан.')
+    return new_metadata
+
+
+def plan_where(
+    metadata: dict, table_name: str, where_clause: Where | None
+) -> tuple[Where | None, dict] | None:
+    """Готовит условие к выполнению по статистике таблицы.
+
+    Возвращает условие (части and упорядочены по оценке избирательности)
+    и индексы, которые стоит использовать, либо None, если по статистике
+    ни одна строка подойти не может.
+    """
+    stats = table_stats(metadata, table_name)
+    if where_clause is None:
+        return None, {}
+    if not may_match(stats, where_clause):
+        return None
 
-    key, value = next(iter(where_clause.items()))
-    return [row for row in table_data if row.get(key) != value]
+    where_clause = order_where(where_clause, lambda item: selectivity(stats, item))
+    return where_clause, find_indexes(metadata, table_name, where_clause, stats)
+
+
+def find_indexes(
+    metadata: dict,
+    table_name: str,
+    where_clause: Where | None,
+    stats: dict | None = None,
+) -> dict:
+    """Индексы по столбцам условия, которые могут его обслужить.
+
+    Со статистикой индекс пропускается, если условие по нему отбирает
+    больше INDEX_MAX_SELECTIVITY строк: полный просмотр тогда дешевле.
+    """
+    table_index_kinds = table_indexes(metadata, table_name)
+    indexes = {}
+    for condition in conditions(where_clause):
+        kind = table_index_kinds.get(condition.column)
+        if kind is None or condition.column in indexes:
+            continue
+        if not index_supports(kind, condition.op):
+            continue
+        if stats is not None and selectivity(stats, condition) > INDEX_MAX_SELECTIVITY:
+            continue
+        indexes[condition.column] = BUFFER_POOL.index(
+            table_name, condition.column, kind
+        )
+    return indexes
+
+
+def log_changes(
+    metadata: dict,
+    table_name: str,
+    inserted: list[Record] = (),
+    updated: list[tuple[Record, Record]] = (),
+    deleted: list[Record] = (),
+) -> None:
+    """Записывает изменения в журнал таблицы и поддерживает индексы.
+
+    Сведения таблицы (счётчик ID, статистика и границы сегментов)
+    сохраняются до записи данных.
+    """
+    state = table_state(metadata, table_name)
+    stats = state.get("stats")
+    if stats is not None and "columns" not in stats:
+        stats = None
+    if stats is not None:
+        apply_stats_changes(stats, inserted, updated, deleted)
+    manifest = state.get("segments")
+    if manifest is not None:
+        widen_manifest(manifest, list(inserted) + [new for _, new in updated])
+    if inserted or deleted or (updated and (stats is not None or manifest is not None)):
+        save_table_state(metadata, table_name, state)
+
+    records = [{"op": "insert", "row": as_dict(row)} for row in inserted]
+    records.extend({"op": "update", "row": as_dict(new)} for _, new in updated)
+    if deleted:
+        records.append({"op": "delete", "ids": [row.get("ID") for row in deleted]})
+    # Журнал мог свернуться в снимок: число удалённых строк в сегментах
+    # хранится в метаданных, чтобы info не читал их множество.
+    tombstones = []
+    BUFFER_POOL.write_through(
+        ("table", table_name),
+        lambda data: tombstones.append(
+            append_table_log(
+                table_name,
+                records,
+                data,
+                table_format(metadata, table_name),
+                table_dictionary(metadata, table_name),
+            )
+        ),
+        apply=lambda data: _apply_changes(data, inserted, updated, deleted),
+    )
+    if tombstones[0] is not None:
+        table_settings(metadata, table_name)["tombstones"] = tombstones[0]
+        BUFFER_POOL.save_metadata(DB_META_FILEPATH, metadata)
+
+    for column, kind in table_indexes(metadata, table_name).items():
+        changes = []
+        for row in inserted:
+            changes.append({"op": "add", "value": row.get(column), "id": row.get("ID")})
+        for old, new in updated:
+            if old.get(column) != new.get(column):
+                changes.append(
+                    {"op": "remove", "value": old.get(column), "id": old.get("ID")}
+                )
+                changes.append(
+                    {"op": "add", "value": new.get(column), "id": new.get("ID")}
+                )
+        for row in deleted:
+            changes.append(
+                {"op": "remove", "value": row.get(column), "id": row.get("ID")}
+            )
+        if not changes:
+            continue
+        BUFFER_POOL.write_through(
+            ("index", table_name, column),
+            lambda index: log_index_changes(table_name, column, changes, kind, index),
+            apply=lambda index: apply_index_changes(index, changes),
+        )
+
+
+def _apply_changes(
+    table_data: list[Record],
+    inserted: list[Record],
+    updated: list[tuple[Record, Record]],
+    deleted: list[Record],
+) -> None:
+    """Применяет изменения к таблице в памяти."""
+    table_data.extend(conform(table_data, inserted))
+    for _, new in updated:
+        pos = row_position(table_data, new.get("ID"))
+        if pos is not None:
+            table_data[pos] = conform(table_data, [new])[0]
+    if len(deleted) <= DELETE_IN_PLACE_ROWS:
+        for row in deleted:
+            pos = row_position(table_data, row.get("ID"))
+            if pos is not None:
+                del table_data[pos]
+    else:
+        ids = {row.get("ID") for row in deleted}
+        table_data[:] = [row for row in table_data if row.get("ID") not in ids]
@@ -1,6 +1,8 @@
 import time
 from functools import wraps
 
+from .metrics import METRICS
+
 
 def handle_db_errors(func):
     """Централизованная обработка ошибок БД."""
@@ -22,11 +24,23 @@ def handle_db_errors(func):
 
 
 
+_auto_confirm = False
+
+
+def set_auto_confirm(value: bool) -> None:
+    """Включает автоматическое подтверждение (пакетный режим)."""
+    global _auto_confirm
+    _auto_confirm = value
+
+
 def confirm_action(action_name: str):
     """Запрашивает подтверждение опасного действия."""
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
+            if _auto_confirm:
+                return func(*args, **kwargs)
+
             answer = input(
                 f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: '
             ).strip().lower()
@@ -41,28 +55,17 @@ def confirm_action(action_name: str):
     
 
 def log_time(func):
-    """Логирует время выполнения функции."""
+    """Замеряет время выполнения функции в метрики (function_seconds)."""
+    name = func.__name__
+
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start = time.monotonic()
-        result = func(*args, **kwargs)
-        end = time.monotonic()
-        duration = end - start
-        print(f"Функция {func.__name__} выполнилась за {duration:.3f} секунд.")
-        return result
+        if not METRICS.enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            METRICS.observe("function_seconds", elapsed, function=name)
     return wrapper
-    
-    
-def create_cacher():
-    """Создаёт кэширующую функцию."""
-    cache: dict = {}
-
-    def cache_result(key, value_func):
-        if key in cache:
-            return cache[key]
-        result = value_func()
-        cache[key] = result
-        return result
-
-    return cache_result
-
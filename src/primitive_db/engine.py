@@ -1,15 +1,94 @@
+import cProfile
+import io
 import shlex
+import time
+from contextlib import nullcontext, redirect_stdout
+from itertools import islice
 
 import prompt
 from prettytable import PrettyTable
 
-from .core import create_table, delete, drop_table, insert, select, update
-from .decorators import create_cacher
-from .parser import parse_set, parse_where
-from .utils import load_metadata, load_table_data, save_metadata, save_table_data
-
-DB_META_FILEPATH = "db_meta.json"
-SELECT_CACHE = create_cacher()
+from .aggregate import label
+from .buffer import BUFFER_POOL
+from .cache import PlanCache, SelectCache
+from .catalog import (
+    is_table,
+    table_dictionary,
+    table_format,
+    table_indexes,
+    table_names,
+    table_settings,
+    table_tombstones,
+)
+from .core import (
+    aggregate,
+    create_index,
+    create_table,
+    delete,
+    drop_table,
+    import_file,
+    init_table_state,
+    insert,
+    insert_many,
+    iter_select,
+    log_changes,
+    plan_where,
+    refresh_stats,
+    scan_rows,
+    select,
+    table_stats,
+    update,
+)
+from .decorators import handle_db_errors, set_auto_confirm
+from .explain import describe, report
+from .index import build_index, remove_index, save_index
+from .locks import LOCKS, LockTimeoutError
+from .metrics import METRICS, OTHER_LABEL
+from .parser import Aggregate, Where
+from .planner import Query, prepare
+from .stats import distinct_count
+from .utils import (
+    DB_META_FILEPATH,
+    META_LOCK_FILEPATH,
+    TABLE_FORMATS,
+    begin_transaction,
+    commit_transaction,
+    deferred_writes,
+    flush_metadata,
+    in_transaction,
+    lock_path,
+    recover_transaction,
+    redo_pending,
+    remove_table_data,
+    save_table_data,
+    snapshot_size,
+    writes_pending,
+)
+
+SELECT_CACHE = SelectCache()
+PLAN_CACHE = PlanCache()
+_table_signatures: dict[str, tuple] = {}
+PAGE_SIZE = 100
+DDL_COMMANDS = {
+    "create_table",
+    "drop_table",
+    "create_index",
+    "checkpoint",
+    "compact",
+    "convert",
+    "encoding",
+}
+ENCODINGS = {"dictionary", "plain"}
+SHARED_LOCK_COMMANDS = {"list_tables", "info"}
+EXCLUSIVE_LOCK_COMMANDS = DDL_COMMANDS | {"import"}
+STATEMENT_COMMANDS = {"insert", "select", "update", "delete"}
+# Команды с собственной меткой в метриках.
+COMMANDS = (
+    STATEMENT_COMMANDS
+    | EXCLUSIVE_LOCK_COMMANDS
+    | SHARED_LOCK_COMMANDS
+    | {"explain", "begin", "commit", "rollback", "cache_stats", "stats", "help", "exit"}
+)
 
 
 def print_help() -> None:
@@ -18,19 +97,49 @@ def print_help() -> None:
     print("Функции:")
     print('<command> insert into <имя_таблицы> values ("строка", 1, true)\
 - создать запись.')
+    print("<command> insert into <имя_таблицы> values (...), (...) - создать \
+несколько записей.")
+    print("<command> import <имя_таблицы> <файл.csv|файл.jsonl> - импорт записей.")
     print("<command> select from <имя_таблицы> where <столбец> = <значение>\
 - прочитать по условию.")
+    print("<command> select from <имя_таблицы> where <столбец> between <a> and <b>\
+- прочитать диапазон (также <, <=, >, >=).")
+    print("<command> ... where <условие> and|or <условие>, not <условие>, \
+<столбец> in (<a>, <b>) - составные условия.")
     print("<command> select from <имя_таблицы> - прочитать все записи.")
+    print("<command> select count(*), sum(<столбец>), min, max, avg from \
+<имя_таблицы> [where ...] [group by <столбец>] - агрегаты.")
+    print("<command> select from <имя_таблицы> ... limit <N> offset <M> - \
+прочитать часть записей.")
     print("<command> update <имя_таблицы> set <столбец> = <значение> where <столбец>\
 = <значение> - обновить."
     )
     print("<command> delete from <имя_таблицы> where <столбец> = <значение> - удалить.")
-    print("<command> info <имя_таблицы> - вывести информацию о таблице.\n")
+    print("<command> info <имя_таблицы> - вывести информацию о таблице.")
+    print("<command> explain <запрос> - показать план запроса (индекс, полный \
+просмотр, кэш).")
+    print("<command> explain analyze [profile <файл>] <запрос> - выполнить запрос \
+и показать время этапов, строки и прочитанные байты (профиль cProfile в файл).")
+    print("<command> checkpoint <имя_таблицы> - свернуть журнал изменений в снимок.")
+    print("<command> compact <имя_таблицы> - вычистить удалённые строки из снимка.")
+    print("<command> convert <имя_таблицы> json|columnar - перевести снимок \
+таблицы в формат JSON или в колоночный двоичный формат.")
+    print("<command> encoding <имя_таблицы> <столбец> dictionary|plain - хранить \
+столбец str в колоночном формате кодами словаря или строками.")
+    print("<command> cache_stats - статистика кэша select и пула буферов.")
+    print("<command> stats [reset | json <файл> | prometheus <файл>] - метрики \
+команд: число, ошибки, p50/p95/p99 по командам, таблицам и этапам.\n")
 
     print("***Управление таблицами***\n")
     print("<command> create_table <имя_таблицы> <столбец1:тип> .. - создать таблицу")
     print("<command> list_tables - показать список всех таблиц")
-    print("<command> drop_table <имя_таблицы> - удалить таблицу\n")
+    print("<command> drop_table <имя_таблицы> - удалить таблицу")
+    print("<command> create_index <имя_таблицы> <столбец> [ordered] - создать индекс\n")
+
+    print("***Транзакции***\n")
+    print("<command> begin - начать транзакцию")
+    print("<command> commit - зафиксировать транзакцию")
+    print("<command> rollback - отменить транзакцию\n")
 
     print("Общие команды:")
     print("<command> exit - выход из программы")
@@ -39,443 +148,836 @@ def print_help() -> None:
 
 def run() -> None:
     """Основной цикл."""
+    recover()
     print_help()
 
     while True:
-        metadata = load_metadata(DB_META_FILEPATH)
-        if metadata is None:
-            metadata = {}
-            
         user_input = prompt.string(prompt="Введите команду: ")
         if user_input is None:
             continue
 
-        user_input = user_input.strip()
-        if not user_input:
-            continue
+        if not execute(user_input):
+            break
 
-        try:
-            args = shlex.split(user_input)
-        except ValueError as exc:
-            print(f"Некорректное значение: {exc}. Попробуйте снова.")
-            continue
+    abort_open_transaction()
+
+
+def run_script(
+    lines, auto_confirm: bool = False, flush_every: int | None = None
+) -> None:
+    """Пакетное выполнение команд.
+
+    Изменения копятся в памяти и записываются на диск один раз в конце
+    (или каждые flush_every команд): подряд идущие изменения одной таблицы
+    дают одну дозапись журнала. Блокировки держатся до записи изменений.
+    """
+    recover()
+    set_auto_confirm(auto_confirm)
+    with deferred_writes():
+        executed = 0
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith(("#", "--")):
+                continue
 
-        if not args:
-            continue
+            if not execute(line):
+                break
 
-        cmd = args[0]
-        low = user_input.lower()
+            executed += 1
+            if flush_every and executed % flush_every == 0:
+                BUFFER_POOL.flush_writes()
+                if not in_transaction():
+                    LOCKS.release_all()
 
-        if cmd == "exit":
-            break
+        abort_open_transaction()
+    LOCKS.release_all()
 
-        if cmd == "help":
-            print_help()
-            continue
 
-        if cmd == "list_tables":
-            for name in metadata:
-                print(f"- {name}")
-            continue
+def recover() -> None:
+    """Доводит до конца транзакцию, прерванную сбоем."""
+    if not redo_pending():
+        return
+    try:
+        LOCKS.acquire(META_LOCK_FILEPATH, exclusive=True)
+        if recover_transaction():
+            print("Восстановлена транзакция, прерванная после фиксации.")
+    except LockTimeoutError as exc:
+        print(f'Ошибка: блокировка "{exc}" занята другим процессом.')
+    finally:
+        LOCKS.release_all()
+
+
+def abort_open_transaction() -> None:
+    """Откатывает транзакцию, не завершённую к выходу."""
+    if in_transaction():
+        BUFFER_POOL.rollback()
+        print("Незавершённая транзакция отменена.")
+
+
+def execute(user_input: str) -> bool:
+    """Выполняет одну команду. Возвращает False для exit.
+
+    Блокировки, взятые командой, снимаются после неё, если изменения
+    уже на диске, иначе — после их записи (commit, конец скрипта).
+    """
+    user_input = user_input.strip()
+    if not user_input:
+        return True
 
-        if cmd == "create_table":
-            if len(args) < 3:
-                print("Некорректное значение: create_table. Попробуйте снова.")
-                continue
-            table_name = args[1]
-            columns = args[2:]
-            updated = create_table(metadata, table_name, columns)
-            if updated is not metadata:
-                save_metadata(DB_META_FILEPATH, updated)
-            continue
+    try:
+        with METRICS.scope(_command_label(user_input.split(maxsplit=1)[0])):
+            return _execute(user_input)
+    except LockTimeoutError as exc:
+        print(f'Ошибка: блокировка "{exc}" занята другим процессом. Попробуйте позже.')
+        return True
+    finally:
+        if not writes_pending():
+            LOCKS.release_all()
+        METRICS.maybe_dump()
 
-        if cmd == "drop_table":
-            if len(args) != 2:
-                print("Некорректное значение: drop_table. Попробуйте снова.")
-                continue
 
-            table_name = args[1]
-            updated = drop_table(metadata, table_name)
+def _command_label(word: str) -> str:
+    """Метка команды в метриках (OTHER_LABEL для неизвестной)."""
+    lowered = word.lower()
+    if lowered in STATEMENT_COMMANDS or lowered == "explain":
+        return lowered
+    return word if word in COMMANDS else OTHER_LABEL
 
-            if updated is None:
-                continue
 
-            save_metadata(DB_META_FILEPATH, updated)
+def _table_label(metadata: dict, table_name: str) -> str:
+    """Метка таблицы в метриках (OTHER_LABEL для несуществующей)."""
+    return table_name if is_table(metadata, table_name) else OTHER_LABEL
 
-            global SELECT_CACHE
-            SELECT_CACHE = create_cacher()
-            continue
 
-        if low.startswith("insert into "):
-            _handle_insert(user_input, metadata)
-            continue
+def _execute(user_input: str) -> bool:
+    first = user_input.split(maxsplit=1)[0].lower()
+    if first in STATEMENT_COMMANDS:
+        _handle_statement(user_input)
+        return True
 
-        if low.startswith("select from "):
-            _handle_select(user_input, metadata)
-            continue
+    if first == "explain":
+        _handle_explain(user_input)
+        return True
 
-        if low.startswith("update "):
-            _handle_update(user_input, metadata)
-            continue
+    try:
+        args = shlex.split(user_input)
+    except ValueError as exc:
+        print(f"Некорректное значение: {exc}. Попробуйте снова.")
+        return True
 
-        if low.startswith("delete from "):
-            _handle_delete(user_input, metadata)
-            continue
+    if not args:
+        return True
 
-        if low.startswith("info "):
-            _handle_info(user_input, metadata)
-            continue
+    cmd = args[0]
 
-        print(f"Функции {cmd} нет. Попробуйте снова.")
+    if cmd == "exit":
+        return False
 
+    if cmd == "help":
+        print_help()
+        return True
 
-def _handle_insert(user_input: str, metadata: dict) -> None:
-    """insert into <table> values (...)"""
-    try:
-        table_name, values = _parse_insert(user_input)
-    except ValueError as exc:
-        print(f"Некорректное значение: {exc}. Попробуйте снова.")
-        return
+    if cmd == "stats":
+        _handle_stats(args)
+        return True
 
-    if table_name not in metadata:
-        print(f'Ошибка: Таблица "{table_name}" не существует.')
-        return
+    with METRICS.phase("lock"):
+        _lock_command(cmd, args)
+    metadata = _load_metadata()
+    if len(args) > 1:
+        METRICS.set_table(_table_label(metadata, args[1]))
 
-    result = insert(metadata, table_name, values)
-    if result is None:
-        return
+    if cmd == "list_tables":
+        for name in table_names(metadata):
+            print(f"- {name}")
+        return True
 
-    global SELECT_CACHE
-    SELECT_CACHE = create_cacher()
+    if cmd in ("begin", "commit", "rollback"):
+        _handle_transaction(cmd, metadata)
+        return True
 
+    if cmd in DDL_COMMANDS and in_transaction():
+        print(f"Ошибка: команда {cmd} недоступна внутри транзакции.")
+        return True
 
-def _handle_select(user_input: str, metadata: dict) -> None:
-    """select from <table> [where ...]"""
-    try:
-        table_name, where_text = _parse_select(user_input)
-    except ValueError as exc:
-        print(f"Некорректное значение: {exc}. Попробуйте снова.")
-        return
+    if cmd == "create_table":
+        if len(args) < 3:
+            print("Некорректное значение: create_table. Попробуйте снова.")
+            return True
+        table_name = args[1]
+        columns = args[2:]
+        updated = create_table(metadata, table_name, columns)
+        if updated is not metadata:
+            BUFFER_POOL.save_metadata(DB_META_FILEPATH, updated)
+            init_table_state(updated, table_name)
+        return True
 
-    if table_name not in metadata:
-        print(f'Ошибка: Таблица "{table_name}" не существует.')
-        return
+    if cmd == "drop_table":
+        if len(args) != 2:
+            print("Некорректное значение: drop_table. Попробуйте снова.")
+            return True
 
-    schema = metadata[table_name]
-    columns = list(schema.keys())
-
-    where_clause = None
-    if where_text is not None:
-        try:
-            where_clause = parse_where(where_text)
-            where_clause = _cast_clause(schema, where_clause)
-        except ValueError as exc:
-            print(f"Некорректное значение: {exc}. Попробуйте снова.")
-            return
+        table_name = args[1]
+        indexes = list(table_indexes(metadata, table_name))
+        updated = drop_table(metadata, table_name)
 
-    where_key = None
-    if where_clause is not None:
-        where_key = tuple(where_clause.items())
+        if updated is None:
+            return True
 
-    cache_key = (table_name, where_key)
+        BUFFER_POOL.save_metadata(DB_META_FILEPATH, updated)
+        remove_table_data(table_name)
+        for column in indexes:
+            remove_index(table_name, column)
+        BUFFER_POOL.evict_table(table_name)
 
-    rows = SELECT_CACHE(
-        cache_key,
-        lambda: select(load_table_data(table_name), where_clause=where_clause),
-    )
+        SELECT_CACHE.invalidate(table_name)
+        return True
 
-    if rows is None:
-        return
+    if cmd == "create_index":
+        if len(args) not in (3, 4):
+            print("Некорректное значение: create_index. Попробуйте снова.")
+            return True
+        kind = args[3].lower() if len(args) == 4 else "hash"
+        updated = create_index(metadata, args[1], args[2], kind)
+        if updated is not None and updated is not metadata:
+            BUFFER_POOL.save_metadata(DB_META_FILEPATH, updated)
+        return True
 
-    _print_rows(rows, columns)
+    if cmd == "import":
+        _handle_import(args, metadata)
+        return True
 
+    if cmd == "info":
+        _handle_info(user_input, metadata)
+        return True
 
+    if cmd == "cache_stats":
+        _print_cache_stats()
+        return True
 
-def _handle_update(user_input: str, metadata: dict) -> None:
-    """update <table> set ... where ..."""
-    try:
-        table_name, set_text, where_text = _parse_update(user_input)
-    except ValueError as exc:
-        print(f"Некорректное значение: {exc}. Попробуйте снова.")
-        return
+    if cmd in ("checkpoint", "compact"):
+        _handle_checkpoint(args, metadata, compact=cmd == "compact")
+        return True
 
-    if table_name not in metadata:
-        print(f'Ошибка: Таблица "{table_name}" не существует.')
-        return
+    if cmd == "convert":
+        _handle_convert(args, metadata)
+        return True
 
-    schema = metadata[table_name]
-    table_data = load_table_data(table_name)
+    if cmd == "encoding":
+        _handle_encoding(args, metadata)
+        return True
 
-    before = [row.copy() for row in table_data]
+    print(f"Функции {cmd} нет. Попробуйте снова.")
+    return True
 
-    try:
-        set_clause = _cast_clause(schema, parse_set(set_text))
-        where_clause = _cast_clause(schema, parse_where(where_text))
-    except ValueError as exc:
-        print(f"Некорректное значение: {exc}. Попробуйте снова.")
-        return
 
-    after = update(table_data, set_clause=set_clause, where_clause=where_clause)
+def _lock_command(cmd: str, args: list[str]) -> None:
+    """Блокировки метаданных и таблицы команды (не запроса)."""
+    tables = [lock_path(args[1])] if len(args) > 1 else []
+    if cmd in SHARED_LOCK_COMMANDS:
+        LOCKS.acquire_all(shared=[META_LOCK_FILEPATH, *tables])
+    elif cmd in EXCLUSIVE_LOCK_COMMANDS:
+        LOCKS.acquire_all(exclusive=[META_LOCK_FILEPATH, *tables])
 
-    if after != before:
-        save_table_data(table_name, after)
 
-        ids_before = {row.get("ID") for row in before}
-        ids_after = {row.get("ID") for row in after}
-        _ = ids_before, ids_after
+def _load_metadata() -> dict:
+    """Метаданные из пула (перечитываются, если файл изменил другой процесс)."""
+    with METRICS.phase("metadata"):
+        metadata = BUFFER_POOL.metadata(DB_META_FILEPATH)
+    if metadata is None:
+        metadata = {}
+    return metadata
 
-        changed_ids = []
-        for b, a in zip(before, after, strict=False):
-            if b != a and isinstance(a.get("ID"), int):
-                changed_ids.append(a["ID"])
 
-        if len(changed_ids) == 1:
-            print(f'Запись с ID={changed_ids[0]} в таблице "{table_name}\
-" успешно обновлена.')
+def _handle_transaction(cmd: str, metadata: dict) -> None:
+    """begin | commit | rollback"""
+    try:
+        if cmd == "begin":
+            begin_transaction()
+            print("Транзакция начата.")
+        elif cmd == "commit":
+            BUFFER_POOL.flush_writes(commit_transaction)
+            print("Транзакция зафиксирована.")
         else:
-            print(f'Записи в таблице "{table_name}" успешно обновлены.')
-            
-        global SELECT_CACHE
-        SELECT_CACHE = create_cacher()
-    
-        return
+            BUFFER_POOL.rollback()
+            for table_name in table_names(metadata):
+                SELECT_CACHE.invalidate(table_name)
+            print("Транзакция отменена.")
+    except ValueError as exc:
+        print(f"Ошибка: {exc}.")
 
-    print("Записи для обновления не найдены.")
 
+def _handle_statement(user_input: str) -> None:
+    """insert | select | update | delete через кэш планов."""
+    prepared = _prepare_statement(user_input)
+    if prepared is not None:
+        query, metadata = prepared
+        STATEMENT_HANDLERS[query.kind](query, metadata)
 
-def _handle_delete(user_input: str, metadata: dict) -> None:
-    """delete from <table> where ..."""
+
+def _prepare_statement(
+    user_input: str, read_only: bool = False
+) -> tuple[Query, dict] | None:
+    """Разбор запроса, блокировки и подстановка параметров.
+
+    read_only — только разделяемые блокировки (план без выполнения).
+    """
     try:
-        table_name, where_text = _parse_delete(user_input)
+        with METRICS.phase("parse"):
+            plan, params = prepare(user_input, PLAN_CACHE)
     except ValueError as exc:
         print(f"Некорректное значение: {exc}. Попробуйте снова.")
-        return
+        return None
 
-    if table_name not in metadata:
-        print(f'Ошибка: Таблица "{table_name}" не существует.')
-        return
+    paths = [META_LOCK_FILEPATH, lock_path(plan.table)]
+    with METRICS.phase("lock"):
+        if plan.kind == "select" or read_only:
+            LOCKS.acquire_all(shared=paths)
+        else:
+            LOCKS.acquire_all(exclusive=paths)
+    metadata = _load_metadata()
+    METRICS.set_table(_table_label(metadata, plan.table))
 
-    schema = metadata[table_name]
-    table_data = load_table_data(table_name)
-    before_len = len(table_data)
+    if not is_table(metadata, plan.table):
+        print(f'Ошибка: Таблица "{plan.table}" не существует.')
+        return None
 
     try:
-        where_clause = parse_where(where_text)
-        where_clause = _cast_clause(schema, where_clause)
+        with METRICS.phase("parse"):
+            query = plan.bind(params, metadata[plan.table])
     except ValueError as exc:
         print(f"Некорректное значение: {exc}. Попробуйте снова.")
-        return
+        return None
+    return query, metadata
 
-    w_key, w_val = next(iter(where_clause.items()))
-    target_id = None
-    for row in table_data:
-        if row.get(w_key) == w_val and isinstance(row.get("ID"), int):
-            target_id = row["ID"]
-            break
 
-    new_data = delete(table_data, where_clause=where_clause)
-    if new_data is None:
+def _handle_insert(query: Query, metadata: dict) -> None:
+    """insert into <table> values (...)"""
+    table_name = query.table
+    if len(query.rows) == 1:
+        result = insert(metadata, table_name, query.rows[0])
+    else:
+        result = insert_many(metadata, table_name, query.rows)
+    if result is None:
         return
 
-    if len(new_data) < before_len:
-        save_table_data(table_name, new_data)
+    METRICS.inc("rows_changed_total", len(query.rows), table=table_name)
+    SELECT_CACHE.invalidate(table_name)
 
-        if target_id is not None:
-            print(f'Запись с ID={target_id} успешно удалена из таблицы "{table_name}".')
-        else:
-            print(f'Удалено записей: {before_len - len(new_data)}.')
 
-        global SELECT_CACHE
-        SELECT_CACHE = create_cacher()
+def _handle_import(args: list[str], metadata: dict) -> None:
+    """import <table> <file.csv|file.jsonl>"""
+    if len(args) != 3:
+        print("Некорректное значение: import. Попробуйте снова.")
         return
 
-    print("Записи для удаления не найдены.")
+    table_name, filepath = args[1], args[2]
+    if not is_table(metadata, table_name):
+        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        return
 
+    if import_file(metadata, table_name, filepath):
+        SELECT_CACHE.invalidate(table_name)
 
-def _handle_info(user_input: str, metadata: dict) -> None:
-    """info <table>"""
-    parts = user_input.split(maxsplit=1)
-    if len(parts) != 2:
-        print("Некорректное значение: info. Попробуйте снова.")
-        return
 
-    table_name = parts[1].strip()
-    if table_name not in metadata:
-        print(f'Ошибка: Таблица "{table_name}" не существует.')
+def _handle_select(query: Query, metadata: dict) -> None:
+    """select [столбцы|агрегаты] from <table> [where] [group by] [limit] [offset]"""
+    table_name = query.table
+    _check_external_changes(table_name)
+    columns = list(metadata[table_name].keys())
+    aggregated = query.group_by is not None or any(
+        isinstance(item, Aggregate) for item in query.items or ()
+    )
+    if query.items is not None:
+        columns = [label(item) for item in query.items]
+
+    cache_key = _select_cache_key(query)
+
+    def load_rows() -> tuple[list, Where | None, dict]:
+        planned = plan_where(metadata, table_name, query.where)
+        if planned is None:
+            return [], None, {}
+        where_clause, indexes = planned
+        with METRICS.phase("table_load"):
+            return scan_rows(metadata, table_name, where_clause), where_clause, indexes
+
+    def run_query() -> list[dict] | None:
+        METRICS.inc("select_cache_misses_total", table=table_name)
+        table_data, where_clause, indexes = load_rows()
+        if not aggregated:
+            with METRICS.phase("filter"):
+                return select(
+                    table_data,
+                    where_clause=where_clause,
+                    indexes=indexes,
+                    limit=query.limit,
+                    offset=query.offset,
+                )
+
+        with METRICS.phase("filter"):
+            result = aggregate(
+                table_data, query.items, where_clause, indexes, query.group_by
+            )
+        if result is None:
+            return None
+        stop = None if query.limit is None else query.offset + query.limit
+        return result[query.offset : stop]
+
+    METRICS.inc("select_cache_requests_total", table=table_name)
+    if aggregated or query.limit is not None or cache_key in SELECT_CACHE:
+        rows = SELECT_CACHE(cache_key, run_query)
+        if rows is None:
+            return
+        METRICS.inc("rows_returned_total", len(rows), table=table_name)
+        with METRICS.phase("render"):
+            _print_rows(rows, columns)
         return
 
-    schema = metadata[table_name]
-    columns_str = ", ".join(f"{k}:{v}" for k, v in schema.items())
-    count = len(load_table_data(table_name))
-
-    print(f"Таблица: {table_name}")
-    print(f"Столбцы: {columns_str}")
-    print(f"Количество записей: {count}")
+    # Без limit результат может быть сколь угодно большим: страницы
+    # печатаются по мере просмотра, не дожидаясь всего результата.
+    METRICS.inc("select_cache_misses_total", table=table_name)
+    table_data, where_clause, indexes = load_rows()
+    rows = iter_select(table_data, where_clause, indexes, parallel=True)
+    rows = SELECT_CACHE.stream(cache_key, islice(rows, query.offset, None))
+    with METRICS.phase("render"):
+        count = _print_stream(rows, columns)
+    if count is not None:
+        METRICS.inc("rows_returned_total", count, table=table_name)
 
 
-def _parse_insert(user_input: str) -> tuple[str, list[object]]:
-    """Парсит insert."""
-    rest = user_input[len("insert into ") :].strip()
-    if " " not in rest:
-        raise ValueError("insert")
+@handle_db_errors
+def _print_stream(rows, columns: list[str]) -> int:
+    """_print_rows для ленивого просмотра: ошибка в середине печатается."""
+    return _print_rows(rows, columns)
 
-    table_name, tail = rest.split(" ", 1)
-    tail = tail.strip()
 
-    if not tail.lower().startswith("values"):
-        raise ValueError("insert")
+def _select_cache_key(query: Query) -> tuple:
+    return (
+        query.table,
+        (query.where, query.limit, query.offset, query.items, query.group_by),
+    )
 
-    lpar = tail.find("(")
-    rpar = tail.rfind(")")
-    if lpar == -1 or rpar == -1 or rpar < lpar:
-        raise ValueError("values (...)")
 
-    inside = tail[lpar + 1 : rpar].strip()
-    if not inside:
-        raise ValueError("values")
+def _check_external_changes(table_name: str) -> None:
+    """Сбрасывает кэш select таблицы, если её файлы изменил другой процесс."""
+    signature = BUFFER_POOL.table_signature(table_name)
+    if _table_signatures.get(table_name) != signature:
+        _table_signatures[table_name] = signature
+        SELECT_CACHE.invalidate(table_name)
 
-    return table_name, _parse_values_list(inside)
 
+def _handle_update(query: Query, metadata: dict) -> None:
+    """update <table> set ... where ..."""
+    table_name = query.table
+    planned = plan_where(metadata, table_name, query.where)
+    if planned is None:
+        print("Записи для обновления не найдены.")
+        return
 
-def _parse_select(user_input: str) -> tuple[str, str | None]:
-    """Парсит select."""
-    rest = user_input[len("select from ") :].strip()
-    if not rest:
-        raise ValueError("select")
+    where_clause, indexes = planned
+    with METRICS.phase("table_load"):
+        table_data = scan_rows(metadata, table_name, where_clause)
+
+    with METRICS.phase("filter"):
+        changed = update(
+            table_data,
+            set_clause=query.assignments,
+            where_clause=where_clause,
+            indexes=indexes,
+        )
+    if changed is None:
+        return
 
-    low = rest.lower()
-    if " where " in low:
-        idx = low.find(" where ")
-        table_name = rest[:idx].strip()
-        where_text = rest[idx + len(" where ") :].strip()
-        if not table_name or not where_text:
-            raise ValueError("select where")
-        return table_name, where_text
+    if changed:
+        changed_ids = [
+            new.get("ID") for _, new in changed if isinstance(new.get("ID"), int)
+        ]
+        with METRICS.phase("save"):
+            log_changes(metadata, table_name, updated=changed)
+        METRICS.inc("rows_changed_total", len(changed), table=table_name)
 
-    return rest.strip(), None
+        if len(changed_ids) == 1:
+            print(f'Запись с ID={changed_ids[0]} в таблице "{table_name}\
+" успешно обновлена.')
+        else:
+            print(f'Записи в таблице "{table_name}" успешно обновлены.')
+            
+        SELECT_CACHE.invalidate(table_name)
+    
+        return
 
+    print("Записи для обновления не найдены.")
 
-def _parse_update(user_input: str) -> tuple[str, str, str]:
-    """Парсит update."""
-    rest = user_input[len("update ") :].strip()
-    if not rest:
-        raise ValueError("update")
 
-    low = rest.lower()
-    set_idx = low.find(" set ")
-    where_idx = low.find(" where ")
+def _handle_delete(query: Query, metadata: dict) -> None:
+    """delete from <table> where ..."""
+    table_name = query.table
+    planned = plan_where(metadata, table_name, query.where)
+    if planned is None:
+        print("Записи для удаления не найдены.")
+        return
 
-    if set_idx == -1 or where_idx == -1 or where_idx < set_idx:
-        raise ValueError("update set/where")
+    where_clause, indexes = planned
+    with METRICS.phase("table_load"):
+        table_data = scan_rows(metadata, table_name, where_clause)
 
-    table_name = rest[:set_idx].strip()
-    set_text = rest[set_idx + len(" set ") : where_idx].strip()
-    where_text = rest[where_idx + len(" where ") :].strip()
+    with METRICS.phase("filter"):
+        deleted = delete(table_data, where_clause=where_clause, indexes=indexes)
+    if deleted is None:
+        return
 
-    if not table_name or not set_text or not where_text:
-        raise ValueError("update")
+    if deleted:
+        with METRICS.phase("save"):
+            log_changes(metadata, table_name, deleted=deleted)
+        METRICS.inc("rows_changed_total", len(deleted), table=table_name)
 
-    return table_name, set_text, where_text
+        target_id = next(
+            (row.get("ID") for row in deleted if isinstance(row.get("ID"), int)), None
+        )
+        if target_id is not None:
+            print(f'Запись с ID={target_id} успешно удалена из таблицы "{table_name}".')
+        else:
+            print(f'Удалено записей: {len(deleted)}.')
 
+        SELECT_CACHE.invalidate(table_name)
+        return
 
-def _parse_delete(user_input: str) -> tuple[str, str]:
-    """Парсит delete."""
-    rest = user_input[len("delete from ") :].strip()
-    if not rest:
-        raise ValueError("delete")
+    print("Записи для удаления не найдены.")
 
-    low = rest.lower()
-    where_idx = low.find(" where ")
-    if where_idx == -1:
-        raise ValueError("delete where")
 
-    table_name = rest[:where_idx].strip()
-    where_text = rest[where_idx + len(" where ") :].strip()
+STATEMENT_HANDLERS = {
+    "insert": _handle_insert,
+    "select": _handle_select,
+    "update": _handle_update,
+    "delete": _handle_delete,
+}
+
+
+def _handle_explain(user_input: str) -> None:
+    """explain <запрос> | explain analyze [profile <файл>] <запрос>"""
+    _, statement = _split_word(user_input)
+    word, rest = _split_word(statement)
+    analyze = word.lower() == "analyze"
+    profile_path = None
+    if analyze:
+        statement = rest
+        word, rest = _split_word(statement)
+        if word.lower() == "profile":
+            profile_path, statement = _split_word(rest)
+
+    if _split_word(statement)[0].lower() not in STATEMENT_COMMANDS:
+        print("Некорректное значение: explain. Попробуйте снова.")
+        return
 
-    if not table_name or not where_text:
-        raise ValueError("delete")
+    if not analyze:
+        prepared = _prepare_statement(statement, read_only=True)
+        if prepared is not None:
+            _print_plan(*prepared)
+        return
 
-    return table_name, where_text
+    with METRICS.capture() as trace:
+        start = time.perf_counter()
+        prepared = _prepare_statement(statement)
+        if prepared is None:
+            return
+        query, metadata = prepared
+        _print_plan(query, metadata)
+
+        # Строки результата select выводятся в буфер, а не на экран:
+        # время отрисовки входит в замер.
+        output = io.StringIO()
+        sink = redirect_stdout(output) if query.kind == "select" else nullcontext()
+        profiler = cProfile.Profile() if profile_path else None
+        with sink:
+            if profiler is not None:
+                profiler.enable()
+            try:
+                STATEMENT_HANDLERS[query.kind](query, metadata)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        elapsed = time.perf_counter() - start
+
+    if "rows_returned_total" not in trace.counters:
+        # Строк нет — в буфере сообщение об ошибке.
+        print(output.getvalue(), end="")
+    if profiler is not None:
+        profiler.dump_stats(profile_path)
+    print("--- analyze")
+    for line in report(trace, elapsed, query.kind, profile_path):
+        print(line)
+
+
+def _print_plan(query: Query, metadata: dict) -> None:
+    if query.kind == "select":
+        _check_external_changes(query.table)
+    cached = _select_cache_key(query) in SELECT_CACHE
+    for line in describe(query, metadata, cached):
+        print(line)
+
+
+def _split_word(text: str) -> tuple[str, str]:
+    """Первое слово и остаток строки."""
+    parts = text.split(maxsplit=1)
+    if not parts:
+        return "", ""
+    return parts[0], parts[1] if len(parts) == 2 else ""
 
 
-def _parse_values_list(text: str) -> list[object]:
-    """Парсит значения для insert."""
-    parts: list[str] = []
-    current: list[str] = []
-    in_quotes = False
+def _handle_info(user_input: str, metadata: dict) -> None:
+    """info <table>"""
+    parts = user_input.split(maxsplit=1)
+    if len(parts) != 2:
+        print("Некорректное значение: info. Попробуйте снова.")
+        return
 
-    for ch in text:
-        if ch == '"':
-            in_quotes = not in_quotes
-            current.append(ch)
-            continue
+    table_name = parts[1].strip()
+    if not is_table(metadata, table_name):
+        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        return
 
-        if ch == "," and not in_quotes:
-            parts.append("".join(current).strip())
-            current = []
-            continue
+    schema = metadata[table_name]
+    columns_str = ", ".join(f"{k}:{v}" for k, v in schema.items())
+    stats = table_stats(metadata, table_name)
 
-        current.append(ch)
+    print(f"Таблица: {table_name}")
+    print(f"Столбцы: {columns_str}")
+    print(f"Количество записей: {stats['rows']}")
+    print(f"Формат снимка: {table_format(metadata, table_name)}")
+    dictionary = table_dictionary(metadata, table_name)
+    if dictionary:
+        print(f"Столбцы со словарём: {', '.join(dictionary)}")
+    print(f"Удалённых строк до уплотнения: {table_tombstones(metadata, table_name)}")
 
-    if current:
-        parts.append("".join(current).strip())
+    table = PrettyTable()
+    table.field_names = ["Столбец", "Мин.", "Макс.", "Пустых", "Различных (≈)"]
+    for col, col_stats in stats["columns"].items():
+        table.add_row(
+            [
+                col,
+                col_stats["min"],
+                col_stats["max"],
+                col_stats["nulls"],
+                distinct_count(stats, col),
+            ]
+        )
+    print(table)
 
-    return [_parse_scalar(p) for p in parts]
 
+def _handle_checkpoint(args: list[str], metadata: dict, compact: bool = False) -> None:
+    """checkpoint <table> | compact <table>"""
+    if len(args) != 2:
+        print(f"Некорректное значение: {args[0]}. Попробуйте снова.")
+        return
 
-def _parse_scalar(token: str) -> object:
-    """Парсит одно значение."""
-    t = token.strip()
-    if not t:
-        raise ValueError("значение")
+    table_name = args[1]
+    if not is_table(metadata, table_name):
+        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        return
 
-    low = t.lower()
-    if low == "true":
-        return True
-    if low == "false":
-        return False
+    with METRICS.phase("table_load"):
+        table_data = BUFFER_POOL.table(table_name)
+    with METRICS.phase("save"):
+        BUFFER_POOL.flush_writes(flush_metadata)
+        segments, tombstones = save_table_data(
+            table_name,
+            table_data,
+            compact=compact,
+            fmt=table_format(metadata, table_name),
+            dictionary=table_dictionary(metadata, table_name),
+        )
+        BUFFER_POOL.store_table(table_name, table_data)
+        table_settings(metadata, table_name)["tombstones"] = tombstones
+        BUFFER_POOL.save_metadata(DB_META_FILEPATH, metadata)
+        refresh_stats(metadata, table_name, table_data)
+        for column, kind in table_indexes(metadata, table_name).items():
+            save_index(table_name, column, build_index(table_data, column, kind))
+
+    count = len(table_data)
+    if compact:
+        print(f'Таблица "{table_name}" уплотнена ({count} записей, \
+переписано сегментов: {segments}).')
+        return
+    print(f'Журнал таблицы "{table_name}" свёрнут в снимок ({count} записей, \
+переписано сегментов: {segments}).')
 
-    try:
-        return int(t)
-    except ValueError:
-        pass
 
-    if len(t) >= 2 and t[0] == '"' and t[-1] == '"':
-        return t[1:-1]
+def _handle_convert(args: list[str], metadata: dict) -> None:
+    """convert <table> json|columnar"""
+    if len(args) != 3 or args[2] not in TABLE_FORMATS:
+        print("Некорректное значение: convert. Попробуйте снова.")
+        return
 
-    raise ValueError("строки должны быть в кавычках")
+    table_name, fmt = args[1], args[2]
+    if not is_table(metadata, table_name):
+        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        return
 
+    with METRICS.phase("table_load"):
+        table_data = BUFFER_POOL.table(table_name)
+    with METRICS.phase("save"):
+        # Сегменты в прежнем формате save_table_data перепишет все, даже
+        # если запись прервётся и команду придётся повторить.
+        table_settings(metadata, table_name)["format"] = fmt
+        BUFFER_POOL.save_metadata(DB_META_FILEPATH, metadata)
+        BUFFER_POOL.flush_writes(flush_metadata)
+        _, tombstones = save_table_data(
+            table_name,
+            table_data,
+            fmt=fmt,
+            dictionary=table_dictionary(metadata, table_name),
+        )
+        BUFFER_POOL.store_table(table_name, table_data)
+        table_settings(metadata, table_name)["tombstones"] = tombstones
+        BUFFER_POOL.save_metadata(DB_META_FILEPATH, metadata)
+
+    print(f'Таблица "{table_name}" переведена в формат {fmt} \
+({len(table_data)} записей, размер снимка: {snapshot_size(table_name)} байт).')
+
+
+def _handle_encoding(args: list[str], metadata: dict) -> None:
+    """encoding <table> <column> dictionary|plain"""
+    if len(args) != 4 or args[3] not in ENCODINGS:
+        print("Некорректное значение: encoding. Попробуйте снова.")
+        return
 
-def _cast_clause(schema: dict, clause: dict) -> dict:
-    """Проверяет столбец и тип."""
-    col, value = next(iter(clause.items()))
-    if col not in schema:
-        raise ValueError(f"столбец {col}")
+    table_name, column, encoding = args[1:]
+    if not is_table(metadata, table_name):
+        print(f'Ошибка: Таблица "{table_name}" не существует.')
+        return
+    if metadata[table_name].get(column) != "str":
+        print(f"Некорректное значение: {column}. Попробуйте снова.")
+        return
 
-    col_type = schema[col]
-    if col_type == "int":
-        if isinstance(value, bool) or not isinstance(value, int):
-            raise ValueError(f"тип {col}")
-        return {col: value}
+    settings = table_settings(metadata, table_name)
+    dictionary = [name for name in settings.get("dictionary", []) if name != column]
+    if encoding == "dictionary":
+        dictionary.append(column)
+    if dictionary:
+        settings["dictionary"] = dictionary
+    else:
+        settings.pop("dictionary", None)
+    BUFFER_POOL.save_metadata(DB_META_FILEPATH, metadata)
+
+    fmt = table_format(metadata, table_name)
+    if fmt != "columnar":
+        print(f'Кодирование столбца "{column}" таблицы "{table_name}": {encoding}. \
+Оно применяется в колоночном формате (convert {table_name} columnar).')
+        return
 
-    if col_type == "bool":
-        if not isinstance(value, bool):
-            raise ValueError(f"тип {col}")
-        return {col: value}
+    with METRICS.phase("table_load"):
+        table_data = BUFFER_POOL.table(table_name)
+    with METRICS.phase("save"):
+        BUFFER_POOL.flush_writes(flush_metadata)
+        save_table_data(
+            table_name, table_data, fmt=fmt, dictionary=dictionary, rewrite=True
+        )
+        BUFFER_POOL.store_table(table_name, table_data)
+        settings["tombstones"] = 0
+        BUFFER_POOL.save_metadata(DB_META_FILEPATH, metadata)
+    print(f'Кодирование столбца "{column}" таблицы "{table_name}": {encoding} \
+(размер снимка: {snapshot_size(table_name)} байт).')
+
+
+def _print_cache_stats() -> None:
+    """Печатает счётчики кэша select."""
+    stats = SELECT_CACHE.stats()
+    print(f"Записей в кэше: {stats['entries']}")
+    print(f"Строк в кэше: {stats['rows']} из {stats['max_rows']}")
+    print(f"Попадания: {stats['hits']}")
+    print(f"Промахи: {stats['misses']}")
+    print(f"Вытеснения: {stats['evictions']}")
+    print(f"Инвалидации: {stats['invalidations']}")
+
+    plans = PLAN_CACHE.stats()
+    print(f"Кэш планов: записей {plans['entries']} из {plans['max_entries']}, \
+попадания {plans['hits']}, промахи {plans['misses']}")
+
+    locks = LOCKS.stats()
+    print(f"Блокировки: получено {locks['acquired']}, с ожиданием \
+{locks['contended']}, таймауты {locks['timeouts']}, \
+ожидание {locks['wait_seconds']:.3f} с")
+
+    pool = BUFFER_POOL.stats()
+    print(f"Пул буферов: записей {pool['entries']}, строк {pool['rows']} \
+из {pool['max_rows']}")
+    print(f"Пул буферов: попадания {pool['hits']}, загрузки {pool['loads']}, \
+вытеснения {pool['evictions']}")
+
+
+def _handle_stats(args: list[str]) -> None:
+    """stats | stats reset | stats json <файл> | stats prometheus <файл>"""
+    if len(args) == 2 and args[1] == "reset":
+        METRICS.reset()
+        print("Метрики сброшены.")
+        return
 
-    if col_type == "str":
-        if not isinstance(value, str):
-            raise ValueError(f"тип {col}")
-        return {col: value}
+    if len(args) == 3 and args[1] in ("json", "prometheus"):
+        METRICS.dump(args[2], args[1])
+        print(f"Метрики записаны в {args[2]}.")
+        return
 
-    raise ValueError(f"тип {col}")
+    if len(args) != 1:
+        print("Некорректное значение: stats. Попробуйте снова.")
+        return
 
+    if not METRICS.enabled:
+        print("Метрики выключены.")
+        return
 
-def _print_rows(rows: list[dict], columns: list[str]) -> None:
-    """Печатает таблицу."""
-    table = PrettyTable()
-    table.field_names = columns
+    snapshot = METRICS.snapshot()
+    commands = PrettyTable()
+    commands.field_names = [
+        "Метрика",
+        "Метки",
+        "Число",
+        "p50, мс",
+        "p95, мс",
+        "p99, мс",
+        "Макс., мс",
+    ]
+    for item in snapshot["histograms"]:
+        labels = ", ".join(f"{k}={v}" for k, v in item["labels"].items() if v)
+        commands.add_row(
+            [
+                item["name"],
+                labels,
+                item["count"],
+                f"{item['p50'] * 1000:.3f}",
+                f"{item['p95'] * 1000:.3f}",
+                f"{item['p99'] * 1000:.3f}",
+                f"{item['max'] * 1000:.3f}",
+            ]
+        )
+    print(commands)
+
+    counters = PrettyTable()
+    counters.field_names = ["Счётчик", "Метки", "Значение"]
+    for item in snapshot["counters"]:
+        labels = ", ".join(f"{k}={v}" for k, v in item["labels"].items() if v)
+        counters.add_row([item["name"], labels, item["value"]])
+    print(counters)
+
+
+def _print_rows(rows, columns: list[str], page_size: int = PAGE_SIZE) -> int:
+    """Печатает таблицу страницами по page_size строк; возвращает число строк.
+
+    Каждая страница выводится сразу, не дожидаясь построения остальных.
+    """
+    page = None
+    count = 0
     for row in rows:
-        table.add_row([row.get(col) for col in columns])
-    print(table)
+        if count % page_size == 0:
+            if page is not None:
+                print(page, flush=True)
+            page = PrettyTable()
+            page.field_names = columns
+        page.add_row([row.get(col) for col in columns])
+        count += 1
+
+    if page is None:
+        page = PrettyTable()
+        page.field_names = columns
+    print(page, flush=True)
+    return count
 
@@ -0,0 +1,164 @@
+import json
+
+from .aggregate import label
+from .buffer import BUFFER_POOL
+from .catalog import table_dictionary, table_format
+from .core import access_plan, plan_where, table_state, table_stats
+from .index import index_count, index_kind
+from .metrics import Trace
+from .parallel import use_parallel, workers
+from .parser import Aggregate, Condition, Where
+from .planner import Query, conditions
+from .segments import may_match as segment_may_match
+from .stats import selectivity
+
+PHASES = ("parse", "lock", "metadata", "table_load", "filter", "render", "save")
+
+
+def describe(query: Query, metadata: dict, cached: bool = False) -> list[str]:
+    """План запроса: путь доступа, сегменты и оценки числа строк.
+
+    cached — результат select уже лежит в кэше.
+    """
+    table_name = query.table
+    stats = table_stats(metadata, table_name)
+    rows = stats["rows"]
+    lines = [f'{query.kind}: таблица "{table_name}" (записей: {rows})']
+
+    if query.kind == "insert":
+        lines.append(f"Вставка записей: {len(query.rows)}, дозапись в журнал таблицы")
+        return lines
+
+    if query.kind == "select":
+        if cached:
+            lines.append("Кэш select: попадание, таблица не читается")
+            return lines
+        lines.append("Кэш select: промах")
+
+    planned = plan_where(metadata, table_name, query.where)
+    if planned is None:
+        lines.append("По статистике ни одна запись не подходит: таблица не читается")
+        return lines
+    where, indexes = planned
+
+    manifest = table_state(metadata, table_name).get("segments") or {}
+    kept = sum(1 for bounds in manifest.values() if segment_may_match(bounds, where))
+    if manifest:
+        lines.append(f"Сегменты: просматриваются {kept} из {len(manifest)}")
+    scanned = rows * kept // len(manifest) if manifest else rows
+    if (
+        where is not None
+        and table_format(metadata, table_name) == "columnar"
+        and not BUFFER_POOL.has_table(table_name)
+    ):
+        names = sorted({condition.column for condition in conditions(where)})
+        lines.append(
+            f"Колоночное чтение: столбцы {', '.join(names)}, "
+            "остальные — только у подходящих строк"
+        )
+        dictionary = table_dictionary(metadata, table_name)
+        coded = [name for name in names if name in dictionary]
+        if coded:
+            lines.append(f"Сравнение по кодам словаря: {', '.join(coded)}")
+
+    served, residual = access_plan(where, indexes) if where is not None else ([], None)
+    if not served:
+        lines.append("Доступ: полный просмотр")
+        candidates = scanned
+    else:
+        candidates = 0
+        for condition in served:
+            count = index_count(indexes[condition.column], condition)
+            candidates += count
+            kind = index_kind(indexes[condition.column])
+            lines.append(
+                f"Доступ: индекс {kind} по столбцу {condition.column} "
+                f"({format_where(condition)}, ID: {count})"
+            )
+        if len(served) > 1:
+            lines.append("Доступ: объединение ID нескольких индексов")
+
+    if residual is not None:
+        lines.append(f"Фильтр: {format_where(residual)}")
+    if where is not None:
+        estimate = round(rows * selectivity(stats, where))
+        lines.append(f"Оценка подходящих записей: ≈{estimate}")
+
+    aggregated = query.group_by is not None or any(
+        isinstance(item, Aggregate) for item in query.items or ()
+    )
+    if aggregated:
+        items = ", ".join(label(item) for item in query.items)
+        group = f", группировка по {query.group_by}" if query.group_by else ""
+        lines.append(f"Агрегаты: {items}{group}")
+    elif query.kind == "select" and (query.limit is not None or query.offset):
+        lines.append(
+            f"Limit {query.limit} offset {query.offset}: "
+            "просмотр останавливается, как только набраны строки"
+        )
+        return lines
+
+    if residual is not None and use_parallel(candidates):
+        lines.append(f"Параллельный просмотр: процессов {workers()}")
+    return lines
+
+
+def report(
+    trace: Trace, elapsed: float, kind: str, profile_path: str | None = None
+) -> list[str]:
+    """Итоги explain analyze: время этапов, строки и прочитанные байты."""
+    counters = trace.counters
+    lines = [f"Время выполнения: {elapsed * 1000:.3f} мс"]
+    phases = [
+        f"{phase} {trace.phases[phase] * 1000:.3f}"
+        for phase in PHASES
+        if phase in trace.phases
+    ]
+    if phases:
+        lines.append(f"Этапы, мс: {', '.join(phases)}")
+
+    if kind == "select":
+        if counters.get("select_cache_requests_total"):
+            hit = not counters.get("select_cache_misses_total")
+            lines.append(f"Кэш select: {'попадание' if hit else 'промах'}")
+        lines.append(f"Строк возвращено: {int(counters.get('rows_returned_total', 0))}")
+    else:
+        lines.append(f"Строк изменено: {int(counters.get('rows_changed_total', 0))}")
+    lines.append(f"Строк просмотрено: {int(counters.get('rows_examined_total', 0))}")
+    lines.append(
+        f"Прочитано с диска: {int(counters.get('bytes_read_total', 0))} байт "
+        f"(загрузок в пул буферов: {int(counters.get('buffer_loads_total', 0))})"
+    )
+    if profile_path is not None:
+        lines.append(
+            f"Профиль записан в {profile_path} (python -m pstats {profile_path})"
+        )
+    return lines
+
+
+def format_where(where: Where) -> str:
+    """Условие в синтаксисе запроса."""
+    if isinstance(where, Condition):
+        if where.op == "between":
+            start, end = where.value
+            return f"{where.column} between {_literal(start)} and {_literal(end)}"
+        if where.op == "in":
+            values = ", ".join(_literal(item) for item in where.value)
+            return f"{where.column} in ({values})"
+        return f"{where.column} {where.op} {_literal(where.value)}"
+
+    if where.op == "not":
+        return f"not ({format_where(where.items[0])})"
+    parts = [
+        format_where(item) if isinstance(item, Condition) else f"({format_where(item)})"
+        for item in where.items
+    ]
+    return f" {where.op} ".join(parts)
+
+
+def _literal(value: object) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
@@ -0,0 +1,281 @@
+import json
+from bisect import bisect_left, bisect_right
+
+from .parser import Condition
+from .records import column_values
+from .utils import (
+    DATA_DIR,
+    append_json_lines,
+    atomic_write,
+    needs_checkpoint,
+    read_json_lines,
+    remove_files,
+)
+
+INDEX_KINDS = {"hash", "ordered"}
+BULK_THRESHOLD = 64
+
+
+class SortedIndex:
+    """Упорядоченный индекс: отсортированные пары (значение, ID)."""
+
+    def __init__(self, pairs: list[tuple] | None = None) -> None:
+        pairs = sorted(pairs or [])
+        self.keys = [value for value, _ in pairs]
+        self.ids = [row_id for _, row_id in pairs]
+
+    def add(self, value: object, row_id: int) -> None:
+        # Внутри одинаковых значений держим порядок по ID.
+        start = bisect_left(self.keys, value)
+        end = bisect_right(self.keys, value)
+        pos = bisect_left(self.ids, row_id, start, end)
+        self.keys.insert(pos, value)
+        self.ids.insert(pos, row_id)
+
+    def add_many(self, pairs: list[tuple]) -> None:
+        """Пакетная вставка: слияние отсортированных последовательностей."""
+        if len(pairs) < BULK_THRESHOLD:
+            for value, row_id in pairs:
+                self.add(value, row_id)
+            return
+        merged = sorted([*zip(self.keys, self.ids), *pairs])
+        self.keys = [value for value, _ in merged]
+        self.ids = [row_id for _, row_id in merged]
+
+    def remove(self, value: object, row_id: int) -> None:
+        start = bisect_left(self.keys, value)
+        end = bisect_right(self.keys, value)
+        for pos in range(start, end):
+            if self.ids[pos] == row_id:
+                del self.keys[pos]
+                del self.ids[pos]
+                return
+
+    def range(
+        self,
+        low: object = None,
+        high: object = None,
+        low_inclusive: bool = True,
+        high_inclusive: bool = True,
+    ) -> list[int]:
+        """ID в диапазоне значений за O(log n + k)."""
+        start, end = self._bounds(low, high, low_inclusive, high_inclusive)
+        return self.ids[start:end]
+
+    def count(
+        self,
+        low: object = None,
+        high: object = None,
+        low_inclusive: bool = True,
+        high_inclusive: bool = True,
+    ) -> int:
+        """Число ID в диапазоне значений за O(log n)."""
+        start, end = self._bounds(low, high, low_inclusive, high_inclusive)
+        return max(end - start, 0)
+
+    def pairs(self) -> list[list]:
+        return [[value, row_id] for value, row_id in zip(self.keys, self.ids)]
+
+    def _bounds(
+        self, low: object, high: object, low_inclusive: bool, high_inclusive: bool
+    ) -> tuple[int, int]:
+        if low is None:
+            start = 0
+        elif low_inclusive:
+            start = bisect_left(self.keys, low)
+        else:
+            start = bisect_right(self.keys, low)
+
+        if high is None:
+            end = len(self.keys)
+        elif high_inclusive:
+            end = bisect_right(self.keys, high)
+        else:
+            end = bisect_left(self.keys, high)
+
+        return start, end
+
+
+def index_path(table_name: str, column: str) -> str:
+    """Путь к снимку индекса."""
+    return f"{DATA_DIR}/{table_name}.{column}.idx"
+
+
+def index_log_path(table_name: str, column: str) -> str:
+    """Путь к журналу индекса."""
+    return f"{DATA_DIR}/{table_name}.{column}.idx.log"
+
+
+def build_index(
+    table_data: list[dict], column: str, kind: str = "hash"
+) -> dict | SortedIndex:
+    """Строит индекс по столбцу.
+
+    hash — {значение: [ID, ...]}, ordered — SortedIndex.
+    """
+    pairs = zip(
+        column_values(table_data, column), column_values(table_data, "ID"), strict=True
+    )
+    if kind == "ordered":
+        return SortedIndex(list(pairs))
+
+    mapping: dict = {}
+    for value, row_id in pairs:
+        mapping.setdefault(value, []).append(row_id)
+    return mapping
+
+
+def save_index(table_name: str, column: str, index: dict | SortedIndex) -> None:
+    """Сохраняет снимок индекса и очищает его журнал."""
+    if isinstance(index, SortedIndex):
+        payload = {"kind": "ordered", "entries": index.pairs()}
+    else:
+        # Пары [значение, [ID]]: ключи JSON-объекта теряли бы тип значения.
+        payload = {"kind": "hash", "entries": [[v, ids] for v, ids in index.items()]}
+
+    text = json.dumps(payload, ensure_ascii=False)
+    atomic_write(index_path(table_name, column), text)
+    remove_files(index_log_path(table_name, column))
+
+
+def load_index(
+    table_name: str, column: str, kind: str = "hash"
+) -> dict | SortedIndex:
+    """Загружает индекс: снимок + журнал."""
+    try:
+        with open(index_path(table_name, column), "r", encoding="utf-8") as file:
+            entries = json.load(file)["entries"]
+    except FileNotFoundError:
+        entries = []
+
+    if kind == "ordered":
+        index = SortedIndex([(value, row_id) for value, row_id in entries])
+    else:
+        index = {v: ids for v, ids in entries}
+
+    apply_index_changes(index, read_json_lines(index_log_path(table_name, column)))
+    return index
+
+
+def apply_index_changes(index: dict | SortedIndex, changes) -> None:
+    """Применяет к индексу изменения вида {"op", "value", "id"}."""
+    if isinstance(index, SortedIndex):
+        pending: list[tuple] = []
+        for rec in changes:
+            if rec["op"] == "add":
+                pending.append((rec["value"], rec["id"]))
+                continue
+            index.add_many(pending)
+            pending = []
+            index.remove(rec["value"], rec["id"])
+        index.add_many(pending)
+        return
+
+    for rec in changes:
+        value, row_id = rec["value"], rec["id"]
+        if rec["op"] == "add":
+            index.setdefault(value, []).append(row_id)
+        else:
+            ids = index.get(value, [])
+            if row_id in ids:
+                ids.remove(row_id)
+            if not ids:
+                index.pop(value, None)
+
+
+def log_index_changes(
+    table_name: str,
+    column: str,
+    changes: list[dict],
+    kind: str = "hash",
+    index: dict | SortedIndex | None = None,
+) -> None:
+    """Дописывает изменения в журнал индекса.
+
+    index — актуальный индекс в памяти, если он есть.
+    """
+    if not changes:
+        return
+    log_size = append_json_lines(index_log_path(table_name, column), changes)
+    if needs_checkpoint(log_size, index_path(table_name, column)):
+        if index is None:
+            index = load_index(table_name, column, kind)
+        save_index(table_name, column, index)
+
+
+def remove_index(table_name: str, column: str) -> None:
+    """Удаляет файлы индекса."""
+    remove_files(index_path(table_name, column), index_log_path(table_name, column))
+
+
+def index_kind(index: dict | SortedIndex) -> str:
+    """Вид индекса: hash или ordered."""
+    return "ordered" if isinstance(index, SortedIndex) else "hash"
+
+
+def index_supports(kind: str, op: str) -> bool:
+    """Может ли индекс данного вида обслужить оператор."""
+    return kind == "ordered" or op in ("=", "in")
+
+
+def index_ids(index: dict | SortedIndex, condition: Condition) -> list[int]:
+    """ID строк, подходящих под условие, по индексу."""
+    op, value = condition.op, condition.value
+    if op == "in":
+        ids: list[int] = []
+        for item in dict.fromkeys(value):
+            ids.extend(index_ids(index, Condition(condition.column, "=", item)))
+        return ids
+
+    if isinstance(index, dict):
+        return index.get(value, [])
+    return index.range(*_range_args(op, value))
+
+
+def index_count(index: dict | SortedIndex, condition: Condition) -> int:
+    """Число строк, подходящих под условие, без выборки ID."""
+    op, value = condition.op, condition.value
+    if op == "in":
+        return sum(
+            index_count(index, Condition(condition.column, "=", item))
+            for item in dict.fromkeys(value)
+        )
+
+    if isinstance(index, dict):
+        return len(index.get(value, ()))
+    return index.count(*_range_args(op, value))
+
+
+def _range_args(op: str, value: object) -> tuple:
+    """Аргументы SortedIndex.range для оператора сравнения."""
+    if op == "=":
+        return value, value
+    if op == "<":
+        return None, value, True, False
+    if op == "<=":
+        return None, value
+    if op == ">":
+        return value, None, False
+    if op == ">=":
+        return value, None
+    if op == "between":
+        return value
+    raise ValueError(f"оператор {op}")
+
+
+def row_position(table_data: list[dict], row_id: int) -> int | None:
+    """Позиция строки по ID двоичным поиском (строки упорядочены по ID)."""
+    pos = bisect_left(table_data, row_id, key=lambda row: row.get("ID"))
+    if pos < len(table_data) and table_data[pos].get("ID") == row_id:
+        return pos
+    return None
+
+
+def rows_by_ids(table_data: list[dict], ids: list[int]) -> list[dict]:
+    """Находит строки по списку ID."""
+    found = []
+    for row_id in sorted(ids):
+        pos = row_position(table_data, row_id)
+        if pos is not None:
+            found.append(table_data[pos])
+    return found
@@ -0,0 +1,112 @@
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировки между процессами недоступны.
+    fcntl = None
+
+LOCK_TIMEOUT = 10.0
+_POLL_START = 0.001
+_POLL_MAX = 0.05
+
+
+class LockTimeoutError(TimeoutError):
+    """Блокировку не удалось получить за отведённое время."""
+
+
+class LockManager:
+    """Разделяемые и исключительные блокировки файлов (flock) между процессами.
+
+    Читатели берут разделяемую блокировку и работают параллельно, писатель —
+    исключительную. Ожидание ограничено timeout; повторный запрос уже
+    полученной блокировки ничего не делает, а запрос исключительной поверх
+    разделяемой повышает её.
+    """
+
+    def __init__(self, timeout: float = LOCK_TIMEOUT) -> None:
+        self.timeout = timeout
+        self._held: dict[str, list] = {}
+        self.acquired = 0
+        self.contended = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+
+    def acquire(self, path: str, exclusive: bool = False) -> None:
+        """Берёт блокировку файла path, ожидая не дольше timeout."""
+        if fcntl is None:
+            return
+        held = self._held.get(path)
+        if held is not None and (held[1] or not exclusive):
+            return
+
+        new = held is None
+        if new:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            held = [os.open(path, os.O_RDWR | os.O_CREAT, 0o644), False]
+            self._held[path] = held
+
+        mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            self._wait(held[0], mode, path)
+        except LockTimeoutError:
+            if new:
+                del self._held[path]
+                os.close(held[0])
+            raise
+        held[1] = exclusive
+        self.acquired += 1
+
+    def release_all(self) -> None:
+        """Снимает все блокировки процесса."""
+        while self._held:
+            _, (fd, _) = self._held.popitem()
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def acquire_all(self, shared=(), exclusive=()) -> None:
+        """Берёт несколько блокировок.
+
+        Пути берутся в порядке сортировки, чтобы процессы не ждали друг
+        друга по кругу; путь из обоих списков блокируется исключительно.
+        """
+        for path in sorted(set(shared) | set(exclusive)):
+            self.acquire(path, exclusive=path in exclusive)
+
+    def stats(self) -> dict:
+        """Счётчики блокировок."""
+        return {
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "timeouts": self.timeouts,
+            "wait_seconds": self.wait_seconds,
+        }
+
+    def _wait(self, fd: int, mode: int, path: str) -> None:
+        try:
+            fcntl.flock(fd, mode | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            pass
+
+        # Блокировку держит другой процесс.
+        self.contended += 1
+        start = time.monotonic()
+        delay = _POLL_START
+        try:
+            while True:
+                time.sleep(delay)
+                try:
+                    fcntl.flock(fd, mode | fcntl.LOCK_NB)
+                    return
+                except BlockingIOError:
+                    pass
+                if time.monotonic() - start >= self.timeout:
+                    self.timeouts += 1
+                    raise LockTimeoutError(path)
+                delay = min(delay * 2, _POLL_MAX)
+        finally:
+            self.wait_seconds += time.monotonic() - start
+
+
+LOCKS = LockManager()
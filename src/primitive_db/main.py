@@ -1,11 +1,108 @@
 #!/usr/bin/env python3
-from .engine import run
+import argparse
+import sys
+
+from .engine import run, run_script
+from .locks import LOCK_TIMEOUT, LOCKS
+from .metrics import METRICS
+from .parallel import set_workers, workers
+from .server import DEFAULT_HOST, DEFAULT_PORT, serve
 
 
 def main() -> None:
-    run()
+    parser = argparse.ArgumentParser(prog="database")
+    parser.add_argument(
+        "mode",
+        nargs="?",
+        choices=["serve"],
+        help="serve — запустить сервер для сетевых клиентов",
+    )
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_HOST,
+        help=f"адрес сервера (по умолчанию {DEFAULT_HOST})",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"порт сервера (по умолчанию {DEFAULT_PORT}, 0 — любой свободный)",
+    )
+    parser.add_argument(
+        "--script",
+        metavar="FILE",
+        help='выполнить команды из файла ("-" — из stdin)',
+    )
+    parser.add_argument(
+        "--yes",
+        action="store_true",
+        help="не запрашивать подтверждение опасных операций",
+    )
+    parser.add_argument(
+        "--flush-every",
+        type=int,
+        metavar="N",
+        help="сбрасывать накопленные изменения на диск каждые N команд",
+    )
+    parser.add_argument(
+        "--lock-timeout",
+        type=float,
+        metavar="SECONDS",
+        help=f"ждать блокировку не дольше (по умолчанию {LOCK_TIMEOUT:g} с)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="N",
+        help=f"процессов для просмотра больших таблиц (по умолчанию {workers()})",
+    )
+    parser.add_argument(
+        "--no-metrics",
+        action="store_true",
+        help="не собирать метрики команд",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        metavar="FILE",
+        help="периодически записывать метрики в файл (.json — JSON, "
+        "иначе формат Prometheus)",
+    )
+    args = parser.parse_args()
+    if args.script == "-" and not args.yes:
+        # Ответ на запрос подтверждения читался бы из того же stdin, что и
+        # команды: следующая строка скрипта ушла бы в ответ.
+        parser.error("--script -: команды читаются из stdin, нужен флаг --yes")
+    if args.lock_timeout is not None:
+        LOCKS.timeout = args.lock_timeout
+    if args.workers is not None:
+        if args.workers < 1:
+            parser.error("--workers: число процессов должно быть не меньше 1")
+        set_workers(args.workers)
+    METRICS.enabled = not args.no_metrics
+    METRICS.dump_path = args.metrics_file
+
+    try:
+        _run(args)
+    finally:
+        METRICS.maybe_dump(force=True)
+
+
+def _run(args: argparse.Namespace) -> None:
+    if args.mode == "serve":
+        serve(args.host, args.port)
+        return
+
+    if args.script is None:
+        run()
+        return
+
+    if args.script == "-":
+        run_script(sys.stdin, auto_confirm=args.yes, flush_every=args.flush_every)
+        return
+
+    with open(args.script, "r", encoding="utf-8") as file:
+        run_script(file, auto_confirm=args.yes, flush_every=args.flush_every)
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,317 @@
+import json
+import math
+import time
+from contextlib import contextmanager
+
+from .utils import atomic_write
+
+PREFIX = "primitive_db_"
+QUANTILES = (0.5, 0.95, 0.99)
+DUMP_INTERVAL = 5.0
+# Метка неизвестной команды или несуществующей таблицы: значения меток
+# приходят из ввода, и опечатки не должны заводить новые гистограммы.
+OTHER_LABEL = "other"
+
+# Корзины гистограммы: границы растут в 2 ** (1 / 8) раз (ошибка ~4.5%).
+_BUCKETS_PER_OCTAVE = 8
+_MIN_SECONDS = 1e-6
+
+
+class Histogram:
+    """Гистограмма задержек в логарифмических корзинах.
+
+    Память не зависит от числа наблюдений, перцентили — с точностью
+    до ширины корзины.
+    """
+
+    __slots__ = ("count", "total", "low", "high", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.low = math.inf
+        self.high = 0.0
+        self.buckets: dict[int, int] = {}
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds < self.low:
+            self.low = seconds
+        if seconds > self.high:
+            self.high = seconds
+        index = _bucket(seconds)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка перцентиля q (0..1) в секундах."""
+        if not self.count:
+            return 0.0
+        rank = max(math.ceil(q * self.count), 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                upper = _MIN_SECONDS * 2 ** ((index + 1) / _BUCKETS_PER_OCTAVE)
+                return min(max(upper, self.low), self.high)
+        return self.high
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: dict) -> None:
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.registry.observe(
+            self.name, time.perf_counter() - self.start, **self.labels
+        )
+
+
+class _Phase(_Timer):
+    __slots__ = ()
+
+    def __exit__(self, *exc_info) -> None:
+        elapsed = time.perf_counter() - self.start
+        trace = self.registry._trace
+        if trace is not None:
+            phase = self.labels["phase"]
+            trace.phases[phase] = trace.phases.get(phase, 0.0) + elapsed
+        self.registry.observe(self.name, elapsed, **self.labels)
+
+
+class Trace:
+    """Время этапов и счётчики одной команды (для explain analyze)."""
+
+    __slots__ = ("phases", "counters")
+
+    def __init__(self) -> None:
+        self.phases: dict[str, float] = {}
+        self.counters: dict[str, float] = {}
+
+
+class _Scope:
+    """Выполняемая команда: её имя, таблица и время начала."""
+
+    __slots__ = ("registry", "command", "table", "start", "parent")
+
+    def __init__(self, registry: "MetricsRegistry", command: str) -> None:
+        self.registry = registry
+        self.command = command
+        self.table = ""
+
+    def __enter__(self) -> "_Scope":
+        self.parent = self.registry._scope
+        self.registry._scope = self
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        elapsed = time.perf_counter() - self.start
+        registry = self.registry
+        registry._scope = self.parent
+        labels = {"command": self.command, "table": self.table}
+        registry.observe("command_seconds", elapsed, **labels)
+        registry.inc("commands_total", **labels)
+        if exc_type is not None:
+            registry.inc("command_errors_total", **labels)
+
+
+class _NullTimer:
+    """Заглушка таймера и команды при выключенных метриках."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NULL = _NullTimer()
+
+
+class MetricsRegistry:
+    """Счётчики и гистограммы задержек с метками.
+
+    scope(command) отмечает выполнение команды (время по команде и
+    таблице), phase(name) — этап внутри текущей команды. Пока метрики
+    выключены, оба возвращают общую заглушку без замера времени.
+    capture() дополнительно собирает значения одной команды.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.counters: dict[tuple, float] = {}
+        self.histograms: dict[tuple, Histogram] = {}
+        self.dump_path: str | None = None
+        self._last_dump = 0.0
+        self._scope: _Scope | None = None
+        self._trace: Trace | None = None
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Увеличивает счётчик."""
+        if self._trace is not None:
+            counters = self._trace.counters
+            counters[name] = counters.get(name, 0) + value
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        """Добавляет наблюдение в гистограмму."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    def timer(self, name: str, **labels: str):
+        """Контекст, замеряющий время блока в гистограмму name."""
+        if not self.enabled:
+            return _NULL
+        return _Timer(self, name, labels)
+
+    def scope(self, command: str):
+        """Контекст выполнения команды; таблицу задаёт set_table."""
+        if not self.enabled:
+            return _NULL
+        return _Scope(self, command)
+
+    def phase(self, name: str):
+        """Контекст этапа текущей команды: parse, metadata, table_load, ..."""
+        if not self.enabled and self._trace is None:
+            return _NULL
+        scope = self._scope
+        command = scope.command if scope is not None else ""
+        return _Phase(self, "phase_seconds", {"command": command, "phase": name})
+
+    @contextmanager
+    def capture(self):
+        """Собирает в Trace этапы и счётчики блока, даже если метрики выключены."""
+        trace = Trace()
+        previous, self._trace = self._trace, trace
+        try:
+            yield trace
+        finally:
+            self._trace = previous
+
+    def set_table(self, table: str) -> None:
+        """Таблица текущей команды (для меток command_seconds)."""
+        if self._scope is not None:
+            self._scope.table = table
+
+    def reset(self) -> None:
+        """Сбрасывает все значения."""
+        self.counters.clear()
+        self.histograms.clear()
+
+    def snapshot(self) -> dict:
+        """Все значения: счётчики и гистограммы с перцентилями в секундах."""
+        counters = [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(self.counters.items())
+        ]
+        histograms = []
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            item = {
+                "name": name,
+                "labels": dict(labels),
+                "count": histogram.count,
+                "sum": histogram.total,
+                "min": histogram.low if histogram.count else 0.0,
+                "max": histogram.high,
+            }
+            for q in QUANTILES:
+                item[f"p{round(q * 100)}"] = histogram.quantile(q)
+            histograms.append(item)
+        return {"counters": counters, "histograms": histograms}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=4)
+
+    def to_prometheus(self) -> str:
+        """Текстовый формат Prometheus: счётчики и summary с квантилями."""
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_labels(labels)} {_number(value)}")
+
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            metric = PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} summary")
+            for q in QUANTILES:
+                quantile = labels + (("quantile", str(q)),)
+                lines.append(
+                    f"{metric}{_labels(quantile)} {_number(histogram.quantile(q))}"
+                )
+            lines.append(f"{metric}_sum{_labels(labels)} {_number(histogram.total)}")
+            lines.append(f"{metric}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def render(self, fmt: str) -> str:
+        """Значения в формате json или prometheus."""
+        if fmt == "json":
+            return self.to_json()
+        if fmt == "prometheus":
+            return self.to_prometheus()
+        raise ValueError(f"формат {fmt}")
+
+    def dump(self, filepath: str, fmt: str) -> None:
+        """Записывает значения в файл (json или prometheus)."""
+        atomic_write(filepath, self.render(fmt))
+
+    def maybe_dump(self, force: bool = False) -> None:
+        """Пишет значения в dump_path не чаще раза в DUMP_INTERVAL секунд.
+
+        Формат по расширению: .json — JSON, иначе текст Prometheus.
+        """
+        if self.dump_path is None or not self.enabled:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_dump < DUMP_INTERVAL:
+            return
+        self._last_dump = now
+        fmt = "json" if self.dump_path.endswith(".json") else "prometheus"
+        self.dump(self.dump_path, fmt)
+
+
+def _bucket(seconds: float) -> int:
+    if seconds <= _MIN_SECONDS:
+        return 0
+    return int(math.log2(seconds / _MIN_SECONDS) * _BUCKETS_PER_OCTAVE)
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    parts = [f'{key}="{_escape(str(value))}"' for key, value in labels]
+    return "{" + ",".join(parts) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+METRICS = MetricsRegistry()
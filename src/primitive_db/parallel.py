@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+
+from .aggregate import aggregate_batches, merge_groups
+from .parser import Aggregate, Where
+from .planner import conditions, filter_batches, select_positions
+from .records import column_values, record_type
+
+SEGMENT_ROWS = 65_536
+PARALLEL_MIN_ROWS = 500_000
+
+# Рабочие процессы стартуют из forkserver (или spawn), а не fork: fork
+# многопоточного процесса (serve) копирует блокировки, захваченные другими
+# потоками, и потомок может зависнуть на них.
+_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+_workers = os.cpu_count() or 1
+_pool = None
+
+
+def set_workers(count: int) -> None:
+    """Число рабочих процессов параллельного просмотра (1 — без них)."""
+    global _workers
+    if count < 1:
+        raise ValueError("число процессов должно быть не меньше 1")
+    if count != _workers:
+        close_pool()
+    _workers = count
+
+
+def close_pool() -> None:
+    """Останавливает рабочие процессы (следующий просмотр запустит новые)."""
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+        _pool = None
+
+
+def workers() -> int:
+    """Текущее число рабочих процессов."""
+    return _workers
+
+
+def use_parallel(rows: int) -> bool:
+    """Стоит ли просматривать столько строк параллельно."""
+    return _workers > 1 and rows >= PARALLEL_MIN_ROWS
+
+
+def scan_positions(rows: list[dict], where: Where) -> list[int]:
+    """Номера подходящих строк; сегменты по SEGMENT_ROWS строк просматриваются
+    в пуле процессов, результаты идут в порядке строк."""
+    columns = {condition.column for condition in conditions(where)}
+    parts = _map(_scan_segment, rows, columns, where)
+    return [
+        start + pos
+        for start, part in zip(range(0, len(rows), SEGMENT_ROWS), parts, strict=True)
+        for pos in part
+    ]
+
+
+def aggregate_segments(
+    rows: list[dict],
+    where: Where | None,
+    aggregates: list[Aggregate],
+    group_by: str | None,
+) -> dict:
+    """Накопители по группам: частичные агрегаты сегментов сливаются по порядку."""
+    columns = {condition.column for condition in conditions(where)}
+    columns.update(item.column for item in aggregates if item.column is not None)
+    if group_by is not None:
+        columns.add(group_by)
+    groups: dict = {}
+    for part in _map(_aggregate_segment, rows, columns, where, aggregates, group_by):
+        merge_groups(groups, part)
+    return groups
+
+
+def _map(func, rows: list[dict], columns: set[str], *args) -> list:
+    """Вызывает func(сегмент, *args) для каждого сегмента rows в пуле процессов.
+
+    Пул один на всё время работы процесса. Процессам пересылаются только
+    значения столбцов columns (нужных условию и агрегатам), а не строки
+    целиком: списки значений сериализуются в разы быстрее строк.
+    """
+    global _pool
+    if _pool is None:
+        _pool = _CONTEXT.Pool(_workers)
+    columns = tuple(sorted(columns))
+    tasks = []
+    for start in range(0, len(rows), SEGMENT_ROWS):
+        segment = rows[start : start + SEGMENT_ROWS]
+        values = [column_values(segment, column) for column in columns]
+        tasks.append((func, (columns, values, len(segment)), args))
+    return _pool.starmap(_call, tasks, chunksize=1)
+
+
+def _call(func, segment: tuple, args: tuple):
+    columns, values, count = segment
+    cls = record_type(columns)
+    rows = list(map(cls, zip(*values))) if columns else [cls()] * count
+    return func(rows, *args)
+
+
+def _scan_segment(rows: list, where: Where) -> list[int]:
+    return select_positions(where, rows)
+
+
+def _aggregate_segment(
+    rows: list, where: Where | None, aggregates: list[Aggregate], group_by
+) -> dict:
+    return aggregate_batches(filter_batches(rows, where), aggregates, group_by)
@@ -1,43 +1,355 @@
-import shlex
+import re
+from typing import NamedTuple
 
+COMPARISON_OPS = {"=", "<", "<=", ">", ">="}
+KEYWORDS = {
+    "select",
+    "from",
+    "where",
+    "limit",
+    "offset",
+    "update",
+    "set",
+    "delete",
+    "insert",
+    "into",
+    "values",
+    "between",
+    "and",
+    "or",
+    "not",
+    "in",
+    "group",
+    "by",
+}
+AGGREGATE_FUNCS = {"count", "sum", "min", "max", "avg"}
 
-def parse_where(text: str) -> dict:
-    """Парсит where: <col> = <value>."""
-    tokens = shlex.split(text, posix=True)
-    if len(tokens) != 3 or tokens[1] != "=":
-        raise ValueError("условие where")
+TOKEN_RE = re.compile(r'\s*(?:"((?:[^"\\]|\\.)*)"|(<=|>=|[=<>(),])|([^\s"(),=<>]+))')
+ESCAPE_RE = re.compile(r'\\(["\\])')
 
-    col = tokens[0]
-    value = _parse_value(tokens[2], raw=text)
-    return {col: value}
 
+class Condition(NamedTuple):
+    """Условие where.
 
-def parse_set(text: str) -> dict:
-    """Парсит set: <col> = <value>."""
-    tokens = shlex.split(text, posix=True)
-    if len(tokens) != 3 or tokens[1] != "=":
-        raise ValueError("условие set")
+    Для between value — пара (нижняя, верхняя), для in — кортеж значений.
+    """
 
-    col = tokens[0]
-    value = _parse_value(tokens[2], raw=text)
-    return {col: value}
+    column: str
+    op: str
+    value: object
 
 
-def _parse_value(token: str, raw: str) -> object:
-    """Парсит значение."""
-    low = token.lower()
+class BoolExpr(NamedTuple):
+    """Логическое выражение: op — and, or или not (один операнд)."""
+
+    op: str
+    items: tuple
+
+
+class Param(NamedTuple):
+    """Место параметра: номер литерала в тексте запроса."""
+
+    position: int
+
+
+class Aggregate(NamedTuple):
+    """Агрегатная функция; column None — count(*)."""
+
+    func: str
+    column: str | None
+
+
+Where = Condition | BoolExpr
+
+
+class Select(NamedTuple):
+    table: str
+    where: Where | None
+    limit: Param | None
+    offset: Param | None
+    items: tuple | None = None
+    group_by: str | None = None
+
+
+class Update(NamedTuple):
+    table: str
+    assignments: tuple[tuple[str, Param], ...]
+    where: Where
+
+
+class Delete(NamedTuple):
+    table: str
+    where: Where
+
+
+class Insert(NamedTuple):
+    table: str
+    rows: tuple[tuple[Param, ...], ...]
+
+
+def tokenize(text: str) -> tuple[str, list, list]:
+    """Разбивает запрос на лексемы.
+
+    Литералы (строки в кавычках, числа, true/false) заменяются на Param.
+    Возвращает нормализованный текст с "?" вместо литералов (ключ кэша
+    планов), лексемы и значения параметров.
+    """
+    tokens: list = []
+    params: list = []
+    key: list[str] = []
+    pos = 0
+    end = len(text.rstrip())
+
+    while pos < end:
+        match = TOKEN_RE.match(text, pos)
+        if match is None:
+            raise ValueError("кавычки")
+        pos = match.end()
+        string, punct, word = match.groups()
+
+        if punct is not None:
+            tokens.append(punct)
+            key.append(punct)
+            continue
+
+        if string is not None:
+            value = ESCAPE_RE.sub(r"\1", string)
+        else:
+            value = _literal(word)
+            if value is None:
+                low = word.lower()
+                tokens.append(low if low in KEYWORDS else word)
+                key.append(tokens[-1])
+                continue
+
+        tokens.append(Param(len(params)))
+        params.append(value)
+        key.append("?")
+
+    return " ".join(key), tokens, params
+
+
+def _literal(word: str) -> object | None:
+    """Значение слова-литерала или None для имён и ключевых слов."""
+    low = word.lower()
     if low == "true":
         return True
     if low == "false":
         return False
-
     try:
-        return int(token)
+        return int(word)
     except ValueError:
-        pass
+        return None
+
+
+def parse_statement(tokens: list) -> Select | Update | Delete | Insert:
+    """Строит дерево запроса select, update, delete или insert."""
+    return _Parser(tokens).statement()
+
+
+class _Parser:
+    """Рекурсивный спуск по лексемам."""
+
+    def __init__(self, tokens: list) -> None:
+        self.tokens = tokens
+        self.pos = 0
 
-    if '"' in raw:
+    def statement(self) -> Select | Update | Delete | Insert:
+        head = self._peek()
+        if head == "select":
+            stmt = self._select()
+        elif head == "update":
+            stmt = self._update()
+        elif head == "delete":
+            stmt = self._delete()
+        elif head == "insert":
+            stmt = self._insert()
+        else:
+            raise ValueError("запрос")
+
+        if self._peek() is not None:
+            raise ValueError(f"{head}: лишнее {self._describe()}")
+        return stmt
+
+    def _select(self) -> Select:
+        self._expect("select")
+        items = None
+        if self._accept("*"):
+            self._expect("from", "select")
+        elif not self._accept("from"):
+            items = [self._select_item()]
+            while self._accept(","):
+                items.append(self._select_item())
+            items = tuple(items)
+            self._expect("from", "select")
+        table = self._name("select")
+
+        where = limit = offset = group_by = None
+        if self._accept("where"):
+            where = self._expression()
+        if self._accept("group"):
+            self._expect("by", "group by")
+            group_by = self._name("group by")
+        if self._accept("limit"):
+            limit = self._param("limit")
+        if self._accept("offset"):
+            offset = self._param("offset")
+        return Select(table, where, limit, offset, items, group_by)
+
+    def _select_item(self) -> str | Aggregate:
+        """Столбец или агрегат: count(*), sum(col), min, max, avg."""
+        name = self._name("select")
+        if not self._accept("("):
+            return name
+
+        func = name.lower()
+        if func not in AGGREGATE_FUNCS:
+            raise ValueError(f"функция {name}")
+        column = None
+        if not (func == "count" and self._accept("*")):
+            column = self._name(func)
+        self._expect(")", func)
+        return Aggregate(func, column)
+
+    def _update(self) -> Update:
+        self._expect("update")
+        table = self._name("update")
+        self._expect("set", "update set/where")
+
+        assignments = [self._assignment()]
+        while self._accept(","):
+            assignments.append(self._assignment())
+
+        self._expect("where", "update set/where")
+        return Update(table, tuple(assignments), self._expression())
+
+    def _delete(self) -> Delete:
+        self._expect("delete")
+        self._expect("from", "delete")
+        table = self._name("delete")
+        self._expect("where", "delete where")
+        return Delete(table, self._expression())
+
+    def _insert(self) -> Insert:
+        self._expect("insert")
+        self._expect("into", "insert")
+        table = self._name("insert")
+        self._expect("values", "insert")
+
+        rows = [self._values_group()]
+        while self._accept(","):
+            rows.append(self._values_group())
+        return Insert(table, tuple(rows))
+
+    def _values_group(self) -> tuple[Param, ...]:
+        self._expect("(", "values (...)")
+        values = [self._param("values")]
+        while self._accept(","):
+            values.append(self._param("values"))
+        self._expect(")", "values (...)")
+        return tuple(values)
+
+    def _assignment(self) -> tuple[str, Param]:
+        column = self._name("условие set")
+        self._expect("=", "условие set")
+        return column, self._param("условие set")
+
+    def _expression(self) -> Where:
+        """or-выражение: and-выражения через or."""
+        items = [self._conjunction()]
+        while self._accept("or"):
+            items.append(self._conjunction())
+        return items[0] if len(items) == 1 else BoolExpr("or", tuple(items))
+
+    def _conjunction(self) -> Where:
+        items = [self._negation()]
+        while self._accept("and"):
+            items.append(self._negation())
+        return items[0] if len(items) == 1 else BoolExpr("and", tuple(items))
+
+    def _negation(self) -> Where:
+        if self._accept("not"):
+            return BoolExpr("not", (self._negation(),))
+        if self._accept("("):
+            expr = self._expression()
+            self._expect(")", "условие where")
+            return expr
+        return self._condition()
+
+    def _condition(self) -> Where:
+        column = self._name("условие where")
+        if self._accept("not"):
+            self._expect("in", "условие where")
+            return BoolExpr("not", (self._in_list(column),))
+        if self._accept("in"):
+            return self._in_list(column)
+        if self._accept("between"):
+            low = self._param("условие where")
+            self._expect("and", "условие where")
+            return Condition(column, "between", (low, self._param("условие where")))
+
+        op = self._peek()
+        if op not in COMPARISON_OPS:
+            raise ValueError("условие where")
+        self.pos += 1
+        return Condition(column, op, self._param("условие where"))
+
+    def _in_list(self, column: str) -> Condition:
+        self._expect("(", "условие where")
+        values = [self._param("условие where")]
+        while self._accept(","):
+            values.append(self._param("условие where"))
+        self._expect(")", "условие where")
+        return Condition(column, "in", tuple(values))
+
+    def _name(self, context: str) -> str:
+        token = self._peek()
+        if not isinstance(token, str) or token in KEYWORDS or not _is_name(token):
+            raise ValueError(context)
+        self.pos += 1
         return token
 
-    raise ValueError("значение (строки должны быть в кавычках)")
+    def _param(self, context: str) -> Param:
+        token = self._peek()
+        if isinstance(token, Param):
+            self.pos += 1
+            return token
+        if isinstance(token, str) and _is_name(token):
+            raise ValueError("значение (строки должны быть в кавычках)")
+        raise ValueError(context)
+
+    def _peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return None
+
+    def _accept(self, token: str) -> bool:
+        if self._peek() == token:
+            self.pos += 1
+            return True
+        return False
+
+    def _expect(self, token: str, context: str | None = None) -> None:
+        if not self._accept(token):
+            raise ValueError(context or token)
+
+    def _describe(self) -> str:
+        token = self._peek()
+        return "значение" if isinstance(token, Param) else token
+
+
+def is_name(name: str) -> bool:
+    """Можно ли сослаться на имя таблицы или столбца в запросе.
+
+    Ключевые слова (в любом регистре), числа, true/false и слова со
+    знаками препинания запрос прочитал бы не как имя.
+    """
+    try:
+        _, tokens, _ = tokenize(name)
+    except ValueError:
+        return False
+    return tokens == [name] and name not in KEYWORDS and _is_name(name)
+
 
+def _is_name(token: str) -> bool:
+    return token not in COMPARISON_OPS and token not in ("(", ")", ",", "*")
@@ -0,0 +1,333 @@
+from typing import NamedTuple
+
+from .aggregate import NUMERIC_FUNCS
+from .metrics import METRICS
+from .parser import (
+    Aggregate,
+    BoolExpr,
+    Condition,
+    Delete,
+    Insert,
+    Param,
+    Select,
+    Update,
+    Where,
+    parse_statement,
+    tokenize,
+)
+from .records import column_values
+
+OP_COST = {"=": 0, "in": 1, "between": 2, "<": 3, "<=": 3, ">": 3, ">=": 3}
+SCAN_BATCH_ROWS = 4096
+
+
+class Query(NamedTuple):
+    """Запрос с подставленными и проверенными значениями."""
+
+    kind: str
+    table: str
+    where: Where | None = None
+    limit: int | None = None
+    offset: int = 0
+    assignments: dict | None = None
+    rows: list[list] | None = None
+    items: tuple | None = None
+    group_by: str | None = None
+
+
+class Plan:
+    """Скомпилированный запрос.
+
+    Хранит разобранное дерево с местами для параметров; bind подставляет
+    значения очередного вызова без повторного разбора текста.
+    """
+
+    __slots__ = ("kind", "table", "statement")
+
+    def __init__(self, statement: Select | Update | Delete | Insert) -> None:
+        if not isinstance(statement, Insert):
+            statement = statement._replace(where=optimize_where(statement.where))
+        self.kind = type(statement).__name__.lower()
+        self.table = statement.table
+        self.statement = statement
+
+    def bind(self, params: list, schema: dict) -> Query:
+        """Подставляет параметры и проверяет столбцы и типы по схеме."""
+        stmt = self.statement
+        if isinstance(stmt, Insert):
+            rows = [[params[p.position] for p in row] for row in stmt.rows]
+            return Query(self.kind, self.table, rows=rows)
+
+        where = _bind_where(stmt.where, params, schema)
+        if isinstance(stmt, Select):
+            limit = _bind_count(stmt.limit, params, "limit")
+            offset = _bind_count(stmt.offset, params, "offset") or 0
+            _check_items(stmt.items, stmt.group_by, schema)
+            return Query(
+                self.kind,
+                self.table,
+                where,
+                limit,
+                offset,
+                items=stmt.items,
+                group_by=stmt.group_by,
+            )
+
+        if isinstance(stmt, Update):
+            assignments = {}
+            for column, param in stmt.assignments:
+                # Журнал, сегменты и индексы находят строку по ID: его смена
+                # выглядела бы как изменение другой строки.
+                if column.lower() == "id":
+                    raise ValueError(f"{column} (ID записи не изменяется)")
+                value = params[param.position]
+                check_value(schema, column, value)
+                assignments[column] = value
+            return Query(self.kind, self.table, where, assignments=assignments)
+
+        return Query(self.kind, self.table, where)
+
+
+def prepare(text: str, cache=None) -> tuple[Plan, list]:
+    """План запроса и его параметры.
+
+    cache — вызываемый кэш планов cache(key, value_func): одинаковые с
+    точностью до литералов запросы разбираются один раз.
+    """
+    key, tokens, params = tokenize(text)
+
+    def build() -> Plan:
+        return Plan(parse_statement(tokens))
+
+    plan = build() if cache is None else cache(key, build)
+    return plan, params
+
+
+def conditions(where: Where | None):
+    """Все простые условия выражения."""
+    if isinstance(where, Condition):
+        yield where
+    elif where is not None:
+        for item in where.items:
+            yield from conditions(item)
+
+
+def select_positions(
+    where: Where, rows: list[dict], selection: list[int] | None = None
+) -> list[int]:
+    """Номера строк rows, подходящих под условие (среди selection).
+
+    Вычисление идёт по столбцам: значения столбца извлекаются из пачки
+    строк один раз в массив, и каждое условие — один проход по массиву
+    с сужением списка выбранных номеров.
+    """
+    if selection is None:
+        selection = range(len(rows))
+    return _positions(where, rows, selection, {})
+
+
+def column_positions(where: Where, columns: dict, count: int) -> list[int]:
+    """Номера подходящих строк по готовым значениям столбцов.
+
+    columns — {столбец: значения по строкам} для всех столбцов условия,
+    count — число строк.
+    """
+    rows = range(count)
+    return _positions(where, rows, rows, dict(columns))
+
+
+def filter_batches(rows: list[dict], where: Where | None):
+    """Строки rows, подходящие под условие, пачками по SCAN_BATCH_ROWS."""
+    for start in range(0, len(rows), SCAN_BATCH_ROWS):
+        batch = rows[start : start + SCAN_BATCH_ROWS]
+        METRICS.inc("rows_examined_total", len(batch))
+        if where is not None:
+            batch = [batch[pos] for pos in select_positions(where, batch)]
+        if batch:
+            yield batch
+
+
+def _positions(where: Where, rows: list[dict], selection, columns: dict) -> list:
+    if isinstance(where, Condition):
+        name = where.column
+        full = len(selection) == len(rows)
+        if name in columns:
+            values = columns[name]
+            if not full:
+                values = [values[i] for i in selection]
+        elif full:
+            values = columns[name] = column_values(rows, name)
+        else:
+            values = [rows[i].get(name) for i in selection]
+        return _compare(values, where.op, where.value, selection)
+
+    if where.op == "and":
+        for item in where.items:
+            if not selection:
+                break
+            selection = _positions(item, rows, selection, columns)
+        return list(selection)
+
+    if where.op == "or":
+        matched: set[int] = set()
+        rest = selection
+        for item in where.items:
+            if not rest:
+                break
+            matched.update(_positions(item, rows, rest, columns))
+            rest = [i for i in rest if i not in matched]
+        return [i for i in selection if i in matched]
+
+    excluded = set(_positions(where.items[0], rows, selection, columns))
+    return [i for i in selection if i not in excluded]
+
+
+def _compare(values: list, op: str, value: object, selection) -> list[int]:
+    """Номера из selection, для которых значение из values подходит под условие.
+
+    values[k] — значение столбца строки selection[k].
+    """
+    pairs = zip(selection, values)
+    if op == "=":
+        return [i for i, v in pairs if v == value]
+    if op == "in":
+        allowed = set(value)
+        return [i for i, v in pairs if v in allowed]
+    if op == "between":
+        low, high = value
+        return [i for i, v in pairs if v is not None and low <= v <= high]
+    if op == "<":
+        return [i for i, v in pairs if v is not None and v < value]
+    if op == "<=":
+        return [i for i, v in pairs if v is not None and v <= value]
+    if op == ">":
+        return [i for i, v in pairs if v is not None and v > value]
+    if op == ">=":
+        return [i for i, v in pairs if v is not None and v >= value]
+    raise ValueError(f"оператор {op}")
+
+
+def optimize_where(where: Where | None) -> Where | None:
+    """Упрощает выражение перед выполнением.
+
+    Раскрывает вложенные and/or и двойное not, а условия внутри and
+    упорядочивает от самых избирательных.
+    """
+    if where is None or isinstance(where, Condition):
+        return where
+
+    items = [optimize_where(item) for item in where.items]
+    if where.op == "not":
+        inner = items[0]
+        if isinstance(inner, BoolExpr) and inner.op == "not":
+            return inner.items[0]
+        return BoolExpr("not", (inner,))
+
+    flat: list = []
+    for item in items:
+        if isinstance(item, BoolExpr) and item.op == where.op:
+            flat.extend(item.items)
+        else:
+            flat.append(item)
+    if where.op == "and":
+        flat.sort(key=_cost)
+    return BoolExpr(where.op, tuple(flat))
+
+
+def order_where(where: Where | None, estimate) -> Where | None:
+    """Упорядочивает части and по оценке estimate(часть) — доле подходящих строк."""
+    if not isinstance(where, BoolExpr):
+        return where
+    items = tuple(order_where(item, estimate) for item in where.items)
+    if where.op == "and":
+        items = tuple(sorted(items, key=estimate))
+    return BoolExpr(where.op, items)
+
+
+def _cost(where: Where) -> int:
+    """Оценка стоимости без статистики: равенство дешевле диапазона."""
+    if isinstance(where, Condition):
+        return OP_COST.get(where.op, len(OP_COST))
+    return len(OP_COST)
+
+
+def _bind_where(where: Where | None, params: list, schema: dict) -> Where | None:
+    """Выражение с подставленными значениями."""
+    if where is None:
+        return None
+    if isinstance(where, BoolExpr):
+        items = tuple(_bind_where(item, params, schema) for item in where.items)
+        return BoolExpr(where.op, items)
+
+    column, op, value = where
+    if op in ("between", "in"):
+        value = tuple(params[p.position] for p in value)
+        for item in value:
+            check_value(schema, column, item)
+    else:
+        value = params[value.position]
+        check_value(schema, column, value)
+    return Condition(column, op, value)
+
+
+def _check_items(items: tuple | None, group_by: str | None, schema: dict) -> None:
+    """Проверяет список выборки и group by по схеме."""
+    if group_by is not None and group_by not in schema:
+        raise ValueError(f"столбец {group_by}")
+    if items is None:
+        if group_by is not None:
+            raise ValueError("group by")
+        return
+
+    has_aggregates = False
+    for item in items:
+        if isinstance(item, Aggregate):
+            has_aggregates = True
+            if item.column is None:
+                continue
+            if item.column not in schema:
+                raise ValueError(f"столбец {item.column}")
+            if item.func in NUMERIC_FUNCS and schema[item.column] != "int":
+                raise ValueError(f"тип {item.column}")
+        elif item not in schema:
+            raise ValueError(f"столбец {item}")
+
+    if not has_aggregates and group_by is None:
+        return
+    for item in items:
+        if isinstance(item, str) and item != group_by:
+            raise ValueError(f"{item} вне group by")
+
+
+def _bind_count(param: Param | None, params: list, name: str) -> int | None:
+    """Значение limit/offset."""
+    if param is None:
+        return None
+    value = params[param.position]
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise ValueError(name)
+    return value
+
+
+def check_value(schema: dict, col: str, value: object) -> None:
+    """Проверяет, что значение подходит к типу столбца."""
+    if col not in schema:
+        raise ValueError(f"столбец {col}")
+
+    col_type = schema[col]
+    if col_type == "int":
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f"тип {col}")
+        return
+
+    if col_type == "bool":
+        if not isinstance(value, bool):
+            raise ValueError(f"тип {col}")
+        return
+
+    if col_type == "str":
+        if not isinstance(value, str):
+            raise ValueError(f"тип {col}")
+        return
+
+    raise ValueError(f"тип {col}")
@@ -0,0 +1,165 @@
+from operator import itemgetter
+
+_types: dict[tuple, type] = {}
+
+
+class Record(tuple):
+    """Строка таблицы: значения в кортеже по порядку столбцов схемы.
+
+    Имена столбцов хранятся один раз в классе схемы (record_type), а не в
+    каждой строке, как у dict. По имени столбца читают get, keys, items;
+    индексирование остаётся кортежным (по номеру), чтобы выборка столбца
+    шла без вызова метода на Python. Строки неизменяемы: replace
+    возвращает новую.
+    """
+
+    __slots__ = ()
+    columns: tuple[str, ...] = ()
+    positions: dict[str, int] = {}
+
+    def get(self, column: str, default: object = None) -> object:
+        position = self.positions.get(column)
+        if position is None:
+            return default
+        return tuple.__getitem__(self, position)
+
+    def keys(self) -> tuple[str, ...]:
+        return self.columns
+
+    def values(self) -> tuple:
+        return tuple(self)
+
+    def items(self):
+        return zip(self.columns, self)
+
+    def replace(self, changes: dict) -> "Record":
+        """Копия строки с новыми значениями столбцов changes."""
+        values = list(self)
+        for column, value in changes.items():
+            values[self.positions[column]] = value
+        return type(self)(values)
+
+    def to_dict(self) -> dict:
+        return dict(zip(self.columns, self))
+
+    def __reduce__(self):
+        return _rebuild, (self.columns, tuple(self))
+
+    def __repr__(self) -> str:
+        return f"Record({self.to_dict()!r})"
+
+
+def record_type(columns) -> type[Record]:
+    """Класс строк с набором столбцов columns (один на набор)."""
+    columns = tuple(columns)
+    cls = _types.get(columns)
+    if cls is None:
+        positions = {column: i for i, column in enumerate(columns)}
+        cls = _types[columns] = type(
+            "Record",
+            (Record,),
+            {"__slots__": (), "columns": columns, "positions": positions},
+        )
+    return cls
+
+
+def _rebuild(columns: tuple, values: tuple) -> Record:
+    return record_type(columns)(values)
+
+
+def to_records(rows: list[dict]) -> list[Record]:
+    """Строки-словари (из JSON) в Record.
+
+    Все строки получают один класс; если наборы столбцов у строк разные,
+    это объединение столбцов, недостающие значения — None.
+    """
+    if not rows:
+        return []
+    columns = tuple(rows[0])
+    if not all(map(columns.__eq__, map(tuple, rows))):
+        return _to_common_records(rows)
+    return list(map(record_type(columns), map(dict.values, rows)))
+
+
+def _to_common_records(rows: list[dict]) -> list[Record]:
+    columns = dict.fromkeys(column for row in rows for column in row)
+    cls = record_type(columns)
+    return [cls(row.get(column) for column in columns) for row in rows]
+
+
+def to_record(row: dict, cls: type[Record] | None = None) -> Record:
+    """Строка-словарь в Record (класса cls, если столбцы совпадают)."""
+    columns = tuple(row)
+    if cls is None or columns != cls.columns:
+        cls = record_type(columns)
+    return cls(row.values())
+
+
+def unify(rows: list[Record]) -> list[Record]:
+    """Строки одного класса (объединение столбцов, если классы разные)."""
+    if not rows:
+        return rows
+    cls = type(rows[0])
+    if all(type(row) is cls for row in rows):
+        return rows
+    columns = dict.fromkeys(column for row in rows for column in row.keys())
+    common = record_type(columns)
+    return [_convert(row, common) for row in rows]
+
+
+def as_dict(row: Record | dict) -> dict:
+    """Строка в виде dict (для JSON и внешнего API)."""
+    return row.to_dict() if isinstance(row, Record) else row
+
+
+def conform(table_data: list[Record], rows: list[Record]) -> list[Record]:
+    """Строки rows в классе строк таблицы table_data.
+
+    Если у rows есть столбцы, которых нет у таблицы, к объединению
+    столбцов приводится и сама таблица: у всех её строк один класс.
+    """
+    if not table_data or not rows:
+        return rows
+    cls = type(table_data[0])
+    if all(type(row) is cls for row in rows):
+        return rows
+
+    columns = dict.fromkeys(cls.columns)
+    for row in rows:
+        columns.update(dict.fromkeys(row.keys()))
+    common = record_type(columns)
+    if common is not cls:
+        table_data[:] = [_convert(row, common) for row in table_data]
+    return [_convert(row, common) for row in rows]
+
+
+def _convert(row: Record, cls: type[Record]) -> Record:
+    if type(row) is cls:
+        return row
+    return cls(row.get(column) for column in cls.columns)
+
+
+def column_names(rows: list) -> tuple[str, ...]:
+    """Столбцы строк по порядку (объединение, если наборы разные)."""
+    if rows and _same_record_type(rows):
+        return type(rows[0]).columns
+    return tuple(dict.fromkeys(column for row in rows for column in row.keys()))
+
+
+def column_values(rows: list, column: str) -> list:
+    """Значения столбца по строкам (None, если столбца нет).
+
+    Строки одной таблицы — одного класса Record (to_records, conform),
+    и значения извлекаются по номеру столбца без вызова метода на строку.
+    """
+    if rows and _same_record_type(rows):
+        position = type(rows[0]).positions.get(column)
+        if position is None:
+            return [None] * len(rows)
+        return list(map(itemgetter(position), rows))
+    return [row.get(column) for row in rows]
+
+
+def _same_record_type(rows: list) -> bool:
+    cls = type(rows[0])
+    return issubclass(cls, Record) and type(rows[-1]) is cls
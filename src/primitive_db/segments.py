@@ -0,0 +1,96 @@
+from bisect import bisect_left
+
+from .parser import Condition, Where
+from .records import column_names, column_values
+
+SEGMENT_ID_SPAN = 16_384
+
+
+def segment_of(row_id: object) -> int:
+    """Номер сегмента строки: сегмент n хранит ID из [n * SPAN + 1, (n + 1) * SPAN]."""
+    if isinstance(row_id, bool) or not isinstance(row_id, int) or row_id < 1:
+        return 0
+    return (row_id - 1) // SEGMENT_ID_SPAN
+
+
+def segment_slice(table_data: list[dict], segment: int) -> list[dict]:
+    """Строки сегмента (таблица упорядочена по ID)."""
+    first = segment * SEGMENT_ID_SPAN + 1
+    start = bisect_left(table_data, first, key=_row_id)
+    stop = bisect_left(table_data, first + SEGMENT_ID_SPAN, key=_row_id)
+    return table_data[start:stop]
+
+
+def split_segments(table_data: list[dict]) -> dict[int, list[dict]]:
+    """Строки таблицы по сегментам."""
+    segments: dict[int, list[dict]] = {}
+    for row_id, row in zip(column_values(table_data, "ID"), table_data, strict=True):
+        segments.setdefault(segment_of(row_id), []).append(row)
+    return segments
+
+
+def compute_manifest(table_data: list[dict]) -> dict:
+    """Манифест сегментов: {"n": {столбец: [мин, макс]}} по всем строкам."""
+    manifest: dict = {}
+    widen_manifest(manifest, table_data)
+    return manifest
+
+
+def widen_manifest(manifest: dict, rows: list[dict]) -> None:
+    """Расширяет границы сегментов новыми и изменёнными строками.
+
+    При удалении границы не сужаются: это верхние оценки до пересчёта
+    в checkpoint, и пропуск сегмента по ним остаётся безопасным.
+    """
+    for segment, seg_rows in split_segments(rows).items():
+        bounds = manifest.setdefault(str(segment), {})
+        for col in column_names(seg_rows):
+            values = [v for v in column_values(seg_rows, col) if v is not None]
+            if not values:
+                continue
+            low, high = min(values), max(values)
+            span = bounds.get(col)
+            if span is None:
+                bounds[col] = [low, high]
+                continue
+            span[0] = min(span[0], low)
+            span[1] = max(span[1], high)
+
+
+def may_match(bounds: dict, where: Where | None) -> bool:
+    """Может ли в сегменте с границами bounds найтись строка под условие."""
+    if where is None:
+        return True
+    if not isinstance(where, Condition):
+        if where.op == "and":
+            return all(may_match(bounds, item) for item in where.items)
+        if where.op == "or":
+            return any(may_match(bounds, item) for item in where.items)
+        return True
+
+    span = bounds.get(where.column)
+    if span is None:
+        # Все значения столбца в сегменте пустые: под условие они не подходят.
+        return False
+    low, high = span
+    op, value = where.op, where.value
+    if op == "=":
+        return low <= value <= high
+    if op == "in":
+        return any(low <= item <= high for item in value)
+    if op == "between":
+        start, end = value
+        return start <= high and end >= low and start <= end
+    if op == "<":
+        return low < value
+    if op == "<=":
+        return low <= value
+    if op == ">":
+        return high > value
+    if op == ">=":
+        return high >= value
+    return True
+
+
+def _row_id(row: dict) -> int:
+    return row.get("ID")
@@ -0,0 +1,141 @@
+import asyncio
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+from .decorators import set_auto_confirm
+from .engine import abort_open_transaction, execute, recover
+from .parallel import close_pool
+from .utils import in_transaction
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7432
+MAX_REQUEST_BYTES = 1 << 20
+
+
+class DatabaseServer:
+    """TCP-сервер БД.
+
+    Протокол строковый: запрос — команда в одной строке UTF-8, ответ — одна
+    строка JSON {"ok": bool, "output": str} с тем, что команда напечатала.
+    Ответы идут в порядке запросов, поэтому клиент может отправить несколько
+    команд, не дожидаясь ответов.
+
+    Таблицы, индексы и кэши живут в памяти процесса между запросами.
+    Команды выполняются по одной в отдельном потоке: соединения
+    обслуживаются параллельно, а изменения таблиц идут строго по очереди.
+    Открытая транзакция принадлежит своему соединению: команды других
+    соединений ждут её commit/rollback или отключения клиента.
+    """
+
+    def __init__(self) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+        self._ready = asyncio.Condition()
+        self._busy = False
+        self._owner = None
+        self.connections = 0
+        self.commands = 0
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """Восстанавливает прерванную транзакцию и открывает порт."""
+        output, _, _ = await self._run(None, None, recover)
+        print(output, end="", flush=True)
+        return await asyncio.start_server(
+            self._handle, host, port, limit=MAX_REQUEST_BYTES
+        )
+
+    def close(self) -> None:
+        """Останавливает поток выполнения команд и процессы просмотра."""
+        self._executor.submit(abort_open_transaction).result()
+        self._executor.shutdown()
+        close_pool()
+
+    async def _handle(self, reader, writer) -> None:
+        """Обслуживает одно соединение до exit или отключения клиента."""
+        conn = object()
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):
+                    break
+                if not line:
+                    break
+
+                try:
+                    command = line.decode("utf-8")
+                except UnicodeDecodeError:
+                    response = {"ok": False, "output": "Ошибка: запрос не в UTF-8."}
+                    alive = True
+                else:
+                    output, alive, ok = await self._run(conn, command, execute)
+                    response = {"ok": ok, "output": output}
+
+                writer.write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    break
+                if not alive:
+                    break
+        finally:
+            if self._owner is conn:
+                await self._run(conn, None, abort_open_transaction)
+            self.connections -= 1
+            writer.close()
+
+    async def _run(self, conn, command: str | None, func) -> tuple[str, bool, bool]:
+        """Выполняет func(command) в очереди команд (см. _capture)."""
+        async with self._ready:
+            await self._ready.wait_for(
+                lambda: not self._busy and self._owner in (None, conn)
+            )
+            self._busy = True
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, _capture, func, command)
+        finally:
+            async with self._ready:
+                self._busy = False
+                self._owner = conn if in_transaction() else None
+                self.commands += 1
+                self._ready.notify_all()
+
+
+def _capture(func, command: str | None) -> tuple[str, bool, bool]:
+    """Вызывает func; возвращает напечатанный текст, признак продолжения и успеха."""
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        try:
+            alive = func() if command is None else func(command)
+        except Exception as exc:
+            print(f"Произошла непредвиденная ошибка: {exc}")
+            return buffer.getvalue(), True, False
+    return buffer.getvalue(), alive is not False, True
+
+
+async def _serve(host: str, port: int) -> None:
+    server = DatabaseServer()
+    listener = await server.start(host, port)
+    address = listener.sockets[0].getsockname()
+    print(f"Сервер слушает {address[0]}:{address[1]}.", flush=True)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+    """database serve: обслуживает клиентов до Ctrl+C.
+
+    Подтверждения опасных операций не запрашиваются: у сервера нет терминала.
+    """
+    set_auto_confirm(True)
+    try:
+        asyncio.run(_serve(host, port))
+    except KeyboardInterrupt:
+        print("Сервер остановлен.")
@@ -0,0 +1,166 @@
+import math
+from hashlib import blake2b
+
+from .parser import Condition, Where
+from .records import column_values
+
+HLL_PRECISION = 8
+HLL_REGISTERS = 1 << HLL_PRECISION
+RANGE_SELECTIVITY = 1 / 3
+
+_HASH_BITS = 64
+_RANK_BITS = _HASH_BITS - HLL_PRECISION
+
+
+def empty_stats(schema: dict) -> dict:
+    """Статистика пустой таблицы."""
+    return {"rows": 0, "columns": {col: _empty_column() for col in schema}}
+
+
+def compute_stats(schema: dict, table_data: list[dict]) -> dict:
+    """Статистика по всем строкам таблицы."""
+    stats = empty_stats(schema)
+    apply_stats_changes(stats, inserted=table_data)
+    return stats
+
+
+def apply_stats_changes(
+    stats: dict,
+    inserted: list[dict] = (),
+    updated: list[tuple[dict, dict]] = (),
+    deleted: list[dict] = (),
+) -> None:
+    """Обновляет статистику по изменениям.
+
+    Минимум, максимум и число различных значений при удалении не
+    уменьшаются: это верхние оценки до пересчёта в checkpoint.
+    """
+    stats["rows"] += len(inserted) - len(deleted)
+    added = list(inserted) + [new for _, new in updated]
+    removed = [old for old, _ in updated] + list(deleted)
+
+    for col, col_stats in stats["columns"].items():
+        if removed:
+            col_stats["nulls"] -= column_values(removed, col).count(None)
+        if not added:
+            continue
+
+        values = [v for v in column_values(added, col) if v is not None]
+        col_stats["nulls"] += len(added) - len(values)
+        if not values:
+            continue
+
+        low, high = min(values), max(values)
+        if col_stats["min"] is None or low < col_stats["min"]:
+            col_stats["min"] = low
+        if col_stats["max"] is None or high > col_stats["max"]:
+            col_stats["max"] = high
+
+        registers = bytearray.fromhex(col_stats["hll"])
+        _hll_add(registers, values)
+        col_stats["hll"] = registers.hex()
+
+
+def distinct_count(stats: dict, col: str) -> int:
+    """Оценка числа различных непустых значений столбца (HyperLogLog)."""
+    col_stats = stats["columns"][col]
+    non_null = stats["rows"] - col_stats["nulls"]
+    return min(_hll_estimate(bytearray.fromhex(col_stats["hll"])), non_null)
+
+
+def may_match(stats: dict, where: Where | None) -> bool:
+    """Может ли хоть одна строка подойти под условие.
+
+    False — только если это следует из статистики наверняка.
+    """
+    if where is None:
+        return stats["rows"] > 0
+    if isinstance(where, Condition):
+        return selectivity(stats, where) > 0
+    if where.op == "and":
+        return all(may_match(stats, item) for item in where.items)
+    if where.op == "or":
+        return any(may_match(stats, item) for item in where.items)
+    return stats["rows"] > 0
+
+
+def selectivity(stats: dict, where: Where) -> float:
+    """Оценка доли строк, подходящих под условие."""
+    rows = stats["rows"]
+    if rows <= 0:
+        return 0.0
+
+    if not isinstance(where, Condition):
+        parts = [selectivity(stats, item) for item in where.items]
+        if where.op == "and":
+            return math.prod(parts)
+        if where.op == "or":
+            return 1 - math.prod(1 - part for part in parts)
+        return 1 - parts[0]
+
+    col_stats = stats["columns"].get(where.column)
+    if col_stats is None:
+        return RANGE_SELECTIVITY
+    non_null = rows - col_stats["nulls"]
+    low, high = col_stats["min"], col_stats["max"]
+    if non_null <= 0 or low is None:
+        return 0.0
+
+    op, value = where.op, where.value
+    if op == "in":
+        total = sum(
+            selectivity(stats, Condition(where.column, "=", item))
+            for item in set(value)
+        )
+        return min(total, 1.0)
+    if op == "=":
+        if not low <= value <= high:
+            return 0.0
+        return non_null / max(distinct_count(stats, where.column), 1) / rows
+
+    if op == "between":
+        start, end = value
+    elif op in ("<", "<="):
+        start, end = None, value
+    else:
+        start, end = value, None
+
+    if (start is not None and start > high) or (end is not None and end < low):
+        return 0.0
+    if (op == "<" and value <= low) or (op == ">" and value >= high):
+        return 0.0
+    if start is not None and end is not None and start > end:
+        return 0.0
+
+    if not isinstance(low, int) or isinstance(low, bool):
+        return RANGE_SELECTIVITY * non_null / rows
+    start = low if start is None else max(start, low)
+    end = high if end is None else min(end, high)
+    fraction = (end - start + 1) / (high - low + 1)
+    return min(max(fraction, 0.0), 1.0) * non_null / rows
+
+
+def _empty_column() -> dict:
+    return {"min": None, "max": None, "nulls": 0, "hll": bytes(HLL_REGISTERS).hex()}
+
+
+def _hll_add(registers: bytearray, values: list) -> None:
+    """Добавляет значения в регистры HyperLogLog."""
+    for value in values:
+        digest = blake2b(repr(value).encode(), digest_size=8).digest()
+        h = int.from_bytes(digest, "big")
+        pos = h >> _RANK_BITS
+        rank = _RANK_BITS - (h & ((1 << _RANK_BITS) - 1)).bit_length() + 1
+        if rank > registers[pos]:
+            registers[pos] = rank
+
+
+def _hll_estimate(registers: bytearray) -> int:
+    """Оценка мощности множества по регистрам HyperLogLog."""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / sum(2.0**-r for r in registers)
+    zeros = registers.count(0)
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * math.log(m / zeros)
+    return round(estimate)
@@ -1,8 +1,39 @@
+import gc
 import json
+import os
+from contextlib import contextmanager
+
+from .columnar import EXTENSION as COLUMNAR_EXTENSION
+from .columnar import encode_segment, load_segment
+from .locks import LOCKS
+from .records import Record, as_dict, column_values, to_record, to_records, unify
+from .segments import SEGMENT_ID_SPAN, segment_of, segment_slice, split_segments
+
+DB_META_FILEPATH = "db_meta.json"
+DATA_DIR = "data"
+REDO_FILEPATH = f"{DATA_DIR}/.transaction"
+META_LOCK_FILEPATH = f"{DB_META_FILEPATH}.lock"
+LOG_CHECKPOINT_BYTES = 1024 * 1024
+COMPACT_SEGMENT_RATIO = 0.25
+# Форматы файлов сегментов и их расширения.
+TABLE_FORMATS = {"json": ".json", "columnar": COLUMNAR_EXTENSION}
+
+# json.dumps с нестандартными параметрами создаёт кодировщик на каждый вызов.
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+# Отложенная запись: дозаписи журналов и метаданные копятся в памяти.
+_deferred = False
+# Строки журналов кодируются сразу: записи могут ссылаться на строки таблицы,
+# которые следующие команды меняют на месте.
+_pending_lines: dict[str, list[str]] = {}
+_pending_meta: dict[str, dict] = {}
+_transaction: dict | None = None
 
 
 def load_metadata(filepath: str) -> dict:
     """Загрузка метаданных из JSON."""
+    if filepath in _pending_meta:
+        return _pending_meta[filepath]
     try:
         with open(filepath, "r", encoding="utf-8") as file:
             return json.load(file)
@@ -12,24 +43,634 @@ def load_metadata(filepath: str) -> dict:
 
 def save_metadata(filepath: str, data: dict) -> None:
     """Сохранение метаданных в JSON."""
-    with open(filepath, "w", encoding="utf-8") as file:
-        json.dump(data, file, ensure_ascii=False, indent=4)
-        
+    if _deferred:
+        _pending_meta[filepath] = data
+        return
+    # Метаданные пишет только владелец исключительной блокировки.
+    LOCKS.acquire(META_LOCK_FILEPATH, exclusive=True)
+    atomic_write(filepath, _dump_metadata(filepath, data))
+
+
+def _dump_metadata(filepath: str, data: dict) -> str:
+    """db_meta.json — с отступами для чтения, служебные файлы таблиц — компактно."""
+    if filepath == DB_META_FILEPATH:
+        return json.dumps(data, ensure_ascii=False, indent=4)
+    return _encode(data)
+
+
+def atomic_write(filepath: str, text: str | bytes, sync_dir: bool = False) -> None:
+    """Запись через временный файл: fsync и переименование.
+
+    После сбоя на месте остаётся либо старое, либо новое содержимое.
+    """
+    directory = os.path.dirname(filepath) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{filepath}.tmp"
+    if isinstance(text, bytes):
+        file = open(tmp_path, "wb")
+    else:
+        file = open(tmp_path, "w", encoding="utf-8")
+    with file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, filepath)
+    if sync_dir:
+        _fsync_dir(directory)
+
+
+def table_path(table_name: str) -> str:
+    """Путь к снимку таблицы одним файлом (до разбиения на сегменты)."""
+    return f"{DATA_DIR}/{table_name}.json"
+
+
+def segment_dir(table_name: str) -> str:
+    """Каталог сегментов снимка таблицы."""
+    return f"{DATA_DIR}/{table_name}"
+
+
+def segment_path(table_name: str, segment: int, fmt: str = "json") -> str:
+    """Путь к сегменту снимка таблицы в формате fmt."""
+    return f"{segment_dir(table_name)}/{segment}{TABLE_FORMATS[fmt]}"
+
+
+def tombstones_path(table_name: str) -> str:
+    """Путь к множеству ID удалённых строк, ещё лежащих в сегментах."""
+    return f"{segment_dir(table_name)}/deleted.json"
 
-def load_table_data(table_name: str) -> list[dict]:
-    """Загрузка данных таблицы."""
-    filepath = f"data/{table_name}.json"
+
+def load_tombstones(table_name: str) -> set:
+    """ID удалённых строк, которые ещё не вычищены из сегментов."""
     try:
-        with open(filepath, "r", encoding="utf-8") as file:
-            return json.load(file)
+        return set(_load_rows(tombstones_path(table_name)))
+    except FileNotFoundError:
+        return set()
+
+
+def segment_files(table_name: str) -> list[tuple[int, str]]:
+    """Файлы сегментов таблицы на диске: (номер, путь) по возрастанию номеров.
+
+    Сегмент может лежать в двух форматах сразу, если смена формата
+    прервалась: содержимое у копий одинаковое с учётом журнала.
+    """
+    try:
+        names = os.listdir(segment_dir(table_name))
     except FileNotFoundError:
         return []
+    extensions = set(TABLE_FORMATS.values())
+    files = []
+    for name in names:
+        stem, extension = os.path.splitext(name)
+        if extension in extensions and stem.isdigit():
+            files.append((int(stem), f"{segment_dir(table_name)}/{name}"))
+    return sorted(files)
+
+
+def stats_path(table_name: str) -> str:
+    """Путь к счётчику ID, статистике и границам сегментов таблицы."""
+    return f"{DATA_DIR}/{table_name}.stats"
+
+
+def log_path(table_name: str) -> str:
+    """Путь к журналу изменений таблицы."""
+    return f"{DATA_DIR}/{table_name}.log"
+
+
+def lock_path(table_name: str) -> str:
+    """Путь к файлу блокировки таблицы."""
+    return f"{DATA_DIR}/{table_name}.lock"
+
+
+def load_table_data(table_name: str) -> list[Record]:
+    """Загрузка данных таблицы: сегменты снимка без удалённых строк + журнал.
+
+    Строки переводятся из dict в Record сразу после разбора каждого файла,
+    поэтому словари одновременно держатся только для одного сегмента.
+
+    Снимок одним файлом (таблица до разбиения на сегменты) главнее
+    сегментов: он удаляется только после записи всех сегментов.
+    """
+    with _gc_paused():
+        if os.path.exists(table_path(table_name)):
+            data = to_records(_load_rows(table_path(table_name)))
+        else:
+            data = []
+            for path in dict(segment_files(table_name)).values():
+                data.extend(_load_segment(path))
+            data = unify(data)
+            tombstones = load_tombstones(table_name)
+            if tombstones:
+                ids = column_values(data, "ID")
+                data = [
+                    row for row, row_id in zip(data, ids) if row_id not in tombstones
+                ]
+        return _replay_log(table_name, data)
+
+
+@contextmanager
+def _gc_paused():
+    """Отключает сборщик циклов на время массового создания строк.
+
+    Циклов строки не образуют, а сборщик поколений при росте числа
+    объектов раз за разом обходил бы уже созданные строки.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def save_table_data(
+    table_name: str,
+    data: list[Record],
+    compact: bool = False,
+    fmt: str = "json",
+    dictionary=(),
+    rewrite: bool = False,
+) -> tuple[int, int]:
+    """Контрольная точка: переписывает сегменты, затронутые журналом.
+
+    Удаления сегменты не переписывают: ID удалённых строк добавляются в
+    множество удалённых (tombstones), которое отфильтровывается при чтении.
+    Сегмент вычищается, когда удалённых в нём набирается
+    COMPACT_SEGMENT_RATIO от диапазона ID, или при compact=True.
+    Остальные сегменты не меняются, поэтому объём записи пропорционален
+    изменённым строкам, а не размеру таблицы. Возвращает число
+    переписанных сегментов и число удалённых строк, оставшихся в сегментах.
+
+    fmt — формат сегментов (TABLE_FORMATS), dictionary — столбцы str,
+    кодируемые словарём (в колоночном формате). Если на диске есть сегменты
+    в другом формате или rewrite=True, переписываются все.
+    """
+    legacy = os.path.exists(table_path(table_name))
+    files = segment_files(table_name)
+    rewrite = (
+        rewrite
+        or legacy
+        or any(
+            path != segment_path(table_name, segment, fmt) for segment, path in files
+        )
+    )
+    tombstones = set()
+    if rewrite:
+        parts = split_segments(data)
+        written = set()
+        for segment, rows in parts.items():
+            written.add(_write_segment(table_name, segment, rows, fmt, dictionary))
+        stale = [path for _, path in files if path not in written]
+    else:
+        parts, deleted = logged_changes(table_name)
+        tombstones = load_tombstones(table_name) | deleted
+        per_segment: dict[int, int] = {}
+        for row_id in tombstones:
+            segment = segment_of(row_id)
+            per_segment[segment] = per_segment.get(segment, 0) + 1
+        threshold = COMPACT_SEGMENT_RATIO * SEGMENT_ID_SPAN
+        parts |= {
+            segment
+            for segment, count in per_segment.items()
+            if compact or count >= threshold
+        }
+
+        stale = []
+        for segment in parts:
+            rows = segment_slice(data, segment)
+            if rows:
+                _write_segment(table_name, segment, rows, fmt, dictionary)
+            else:
+                stale.append(segment_path(table_name, segment, fmt))
+        tombstones = {
+            row_id for row_id in tombstones if segment_of(row_id) not in parts
+        }
+
+    remove_files(*stale)
+    if tombstones:
+        atomic_write(tombstones_path(table_name), _encode(sorted(tombstones)))
+    else:
+        remove_files(tombstones_path(table_name))
+    if legacy:
+        remove_files(table_path(table_name))
+    remove_files(log_path(table_name))
+    return len(parts), len(tombstones)
+
+
+def logged_changes(table_name: str) -> tuple[set[int], set]:
+    """Номера сегментов со вставленными и изменёнными в журнале строками
+    и ID удалённых строк."""
+    segments = set()
+    deleted = set()
+    for rec in read_json_lines(log_path(table_name)):
+        if rec.get("op") == "delete":
+            deleted.update(rec["ids"])
+        else:
+            segments.add(segment_of(rec["row"].get("ID")))
+    return segments, deleted
+
+
+def append_table_log(
+    table_name: str,
+    records: list[dict],
+    data: list[dict] | None = None,
+    fmt: str = "json",
+    dictionary=(),
+) -> int | None:
+    """Дописывает записи в журнал таблицы.
+
+    Формат записи: {"op": "insert" | "update", "row": {...}}
+    или {"op": "delete", "ids": [...]}. data — актуальные данные таблицы,
+    если они уже есть в памяти (для контрольной точки без чтения с диска);
+    fmt и dictionary — формат сегментов таблицы и столбцы со словарём.
+
+    Если журнал свёрнут в снимок, возвращает число удалённых строк,
+    оставшихся в сегментах, иначе None.
+    """
+    if not records:
+        return None
+    log_size = append_json_lines(log_path(table_name), records)
+    if not needs_checkpoint(log_size, *snapshot_paths(table_name)):
+        return None
+    if data is None:
+        data = load_table_data(table_name)
+    _, tombstones = save_table_data(table_name, data, fmt=fmt, dictionary=dictionary)
+    return tombstones
+
+
+def needs_checkpoint(log_size: int, *paths: str) -> bool:
+    """Журнал пора свернуть: он больше порога и больше самого снимка.
+
+    Порог растёт вместе со снимком, поэтому переписанное при свёртке в
+    среднем не больше записанного в журнал.
+    """
+    if log_size <= LOG_CHECKPOINT_BYTES:
+        return False
+    return log_size > sum(_file_size(path) for path in paths)
+
+
+def snapshot_paths(table_name: str) -> list[str]:
+    """Файлы снимка таблицы: снимок одним файлом и сегменты."""
+    paths = [table_path(table_name)]
+    paths.extend(path for _, path in segment_files(table_name))
+    return paths
+
+
+def snapshot_size(table_name: str) -> int:
+    """Размер файлов снимка таблицы в байтах."""
+    return sum(_file_size(path) for path in snapshot_paths(table_name))
+
+
+def append_json_lines(filepath: str, records: list[dict]) -> int:
+    """Дописывает записи JSON-строками. Возвращает размер файла."""
+    lines = [_encode(rec) + "\n" for rec in records]
+    if _deferred:
+        _pending_lines.setdefault(filepath, []).extend(lines)
+        # Пока записи не на диске, контрольная точка не нужна (и недопустима
+        # внутри транзакции: снимок включил бы неподтверждённые изменения).
+        return 0
+
+    return _append_lines(filepath, lines)
+
+
+def _append_lines(filepath: str, lines: list[str]) -> int:
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    with open(filepath, "a", encoding="utf-8") as file:
+        file.write("".join(lines))
+        return file.tell()
+
+
+def read_json_lines(filepath: str):
+    """Построчно читает записи JSON. Пропускает недописанный хвост.
+
+    Затем отдаёт ещё не записанные на диск (отложенные) записи.
+    """
+    try:
+        file = open(filepath, "r", encoding="utf-8")
+    except FileNotFoundError:
+        file = None
+
+    if file is not None:
+        with file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Недописанная строка после сбоя.
+                    break
+
+    for line in _pending_lines.get(filepath, ()):
+        yield json.loads(line)
+
+
+def has_json_lines(filepath: str) -> bool:
+    """Есть ли записи в файле журнала (на диске или отложенные)."""
+    return filepath in _pending_lines or os.path.exists(filepath)
+
+
+def remove_files(*paths: str) -> None:
+    """Удаляет файлы вместе с отложенными для них записями."""
+    for path in paths:
+        _pending_lines.pop(path, None)
+        _pending_meta.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+@contextmanager
+def deferred_writes():
+    """Откладывает дозаписи журналов и сохранение метаданных до выхода."""
+    global _deferred
+    previous = _deferred
+    _deferred = True
+    try:
+        yield
+    finally:
+        _deferred = previous
+        if not _deferred:
+            flush_writes()
+
+
+def flush_writes() -> set[str]:
+    """Записывает отложенные изменения: одна дозапись на файл.
+
+    Возвращает множество записанных путей. Внутри транзакции ничего
+    не делает: её изменения записывает только commit.
+    """
+    if _transaction is not None:
+        return set()
+    # Метаданные раньше журналов: последовательность ID и статистика
+    # на диске не должны отставать от записанных строк.
+    written = flush_metadata()
+    while _pending_lines:
+        path, lines = _pending_lines.popitem()
+        _append_lines(path, lines)
+        written.add(path)
+    return written
+
+
+def flush_metadata() -> set[str]:
+    """Записывает отложенные метаданные. Возвращает множество путей.
+
+    Вызывается и перед записью сегментов в пакетном режиме: строки в
+    сегментах не должны опережать последовательность ID на диске.
+    """
+    global _deferred
+    if _transaction is not None:
+        return set()
+    previous = _deferred
+    _deferred = False
+    written = set()
+    try:
+        while _pending_meta:
+            path, data = _pending_meta.popitem()
+            save_metadata(path, data)
+            written.add(path)
+    finally:
+        _deferred = previous
+    return written
+
+
+def in_transaction() -> bool:
+    """Открыта ли транзакция."""
+    return _transaction is not None
+
+
+def writes_pending() -> bool:
+    """Копятся ли изменения в памяти (пакетный режим или транзакция)."""
+    return _deferred or _transaction is not None
+
+
+def begin_transaction() -> None:
+    """Начинает транзакцию: все изменения копятся в памяти до commit."""
+    global _deferred, _transaction
+    if _transaction is not None:
+        raise ValueError("транзакция уже начата")
+    # Отложенное до begin (пакетный режим) в транзакцию не входит.
+    flush_writes()
+    _transaction = {"deferred": _deferred}
+    _deferred = True
+
+
+def commit_transaction() -> set[str]:
+    """Фиксирует транзакцию. Возвращает множество записанных путей.
+
+    Все изменения (журналы всех таблиц и метаданные) сначала пишутся одной
+    записью повтора (redo) через временный файл + fsync + rename — это точка
+    фиксации. Затем изменения переносятся в файлы, каждый со своим fsync, и
+    только после этого запись повтора удаляется: число fsync растёт с числом
+    затронутых файлов (журналы, файлы сведений, db_meta.json), а не команд.
+    Если процесс упадёт между этими шагами, recover_transaction() при
+    следующем запуске доведёт фиксацию до конца.
+    """
+    global _deferred, _transaction
+    if _transaction is None:
+        raise ValueError("транзакция не начата")
+
+    redo = {
+        "logs": [
+            [path, _file_size(path), lines] for path, lines in _pending_lines.items()
+        ],
+        "meta": [[path, data] for path, data in _pending_meta.items()],
+    }
+    _pending_lines.clear()
+    _pending_meta.clear()
+    _deferred = _transaction["deferred"]
+    _transaction = None
+
+    if not redo["logs"] and not redo["meta"]:
+        return set()
+
+    atomic_write(REDO_FILEPATH, _encode(redo), sync_dir=True)
+    written = _apply_redo(redo)
+    os.remove(REDO_FILEPATH)
+    return written
+
+
+def rollback_transaction() -> set[str]:
+    """Отменяет транзакцию. Возвращает пути с отброшенными изменениями."""
+    global _deferred, _transaction
+    if _transaction is None:
+        raise ValueError("транзакция не начата")
+
+    discarded = set(_pending_lines) | set(_pending_meta)
+    _pending_lines.clear()
+    _pending_meta.clear()
+    _deferred = _transaction["deferred"]
+    _transaction = None
+    return discarded
+
+
+def redo_pending() -> bool:
+    """Остался ли после сбоя файл записи повтора."""
+    return os.path.exists(REDO_FILEPATH)
+
+
+def recover_transaction() -> bool:
+    """Доводит до конца транзакцию, прерванную после точки фиксации.
+
+    Вызывающий держит исключительную блокировку метаданных: её держит и
+    процесс, фиксирующий транзакцию, поэтому чужая фиксация в процессе
+    не будет принята за прерванную.
+    """
+    try:
+        with open(REDO_FILEPATH, "r", encoding="utf-8") as file:
+            redo = json.load(file)
+    except FileNotFoundError:
+        return False
+    except json.JSONDecodeError:
+        # Запись повтора не дописана — транзакция не была зафиксирована.
+        os.remove(REDO_FILEPATH)
+        return False
+
+    _apply_redo(redo)
+    os.remove(REDO_FILEPATH)
+    return True
+
+
+def _apply_redo(redo: dict) -> set[str]:
+    """Переносит запись повтора в файлы. Повторное применение безопасно:
+    журнал сначала обрезается до размера на момент фиксации."""
+    written = set()
+    for path, data in redo["meta"]:
+        atomic_write(path, _dump_metadata(path, data))
+        written.add(path)
+    for path, size, lines in redo["logs"]:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a+b") as file:
+            file.truncate(size)
+            file.write("".join(lines).encode("utf-8"))
+            file.flush()
+            os.fsync(file.fileno())
+        written.add(path)
+    return written
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _fsync_dir(directory: str) -> None:
+    """fsync каталога, чтобы переименование пережило сбой питания."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def remove_table_data(table_name: str) -> None:
+    """Удаляет файлы таблицы."""
+    remove_files(
+        table_path(table_name),
+        log_path(table_name),
+        stats_path(table_name),
+        tombstones_path(table_name),
+        *(path for _, path in segment_files(table_name)),
+    )
+    try:
+        os.rmdir(segment_dir(table_name))
+    except OSError:
+        pass
+
+
+def _load_rows(filepath: str) -> list[dict]:
+    with open(filepath, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _load_segment(path: str) -> list[Record]:
+    if path.endswith(COLUMNAR_EXTENSION):
+        return load_segment(path)
+    return to_records(_load_rows(path))
+
+
+def _write_segment(
+    table_name: str, segment: int, rows: list[Record], fmt: str, dictionary=()
+) -> str:
+    """Записывает сегмент в формате fmt. Возвращает путь к файлу."""
+    path = segment_path(table_name, segment, fmt)
+    if fmt == "columnar":
+        atomic_write(path, encode_segment(rows, dictionary))
+    else:
+        atomic_write(path, _dump_rows(rows))
+    return path
+
+
+def _dump_rows(data: list[Record]) -> str:
+    """JSON-массив по строке на запись.
+
+    json.dump с indent работает через медленный кодировщик на Python,
+    а построчный dumps использует C-ускорение и остаётся читаемым.
+    """
+    if not data:
+        return "[]"
+    rows = ",\n".join(
+        "    " + _encode(as_dict(row)) for row in data
+    )
+    return f"[\n{rows}\n]"
+
+
+def logged_rows(table_name: str) -> dict:
+    """Строки из журнала по ID: последняя версия вставленной или изменённой
+    строки, None — для удалённой."""
+    rows: dict = {}
+    for rec in read_json_lines(log_path(table_name)):
+        op = rec.get("op")
+        if op == "delete":
+            rows.update(dict.fromkeys(rec["ids"]))
+        elif op in ("insert", "update"):
+            row = to_record(rec["row"])
+            row_id = row.get("ID")
+            if op == "update" and row_id in rows and rows[row_id] is None:
+                continue
+            rows[row_id] = row
+    return rows
+
 
+def _replay_log(table_name: str, data: list[Record]) -> list[Record]:
+    """Применяет журнал к снимку."""
+    if not has_json_lines(log_path(table_name)):
+        return data
 
-def save_table_data(table_name: str, data: list[dict]) -> None:
-    """Сохранение данных таблицы."""
-    filepath = f"data/{table_name}.json"
-    with open(filepath, "w", encoding="utf-8") as file:
-        json.dump(data, file, ensure_ascii=False, indent=4)
+    cls = type(data[0]) if data else None
+    rows: list[Record | None] = list(data)
+    positions = {row_id: i for i, row_id in enumerate(column_values(data, "ID"))}
 
+    for rec in read_json_lines(log_path(table_name)):
+        op = rec.get("op")
+        if op == "insert":
+            # Строка может уже быть в снимке, если сбой случился между
+            # записью сегментов и удалением журнала.
+            row = to_record(rec["row"], cls)
+            idx = positions.get(row.get("ID"))
+            if idx is not None and rows[idx] is not None:
+                rows[idx] = row
+                continue
+            positions[row.get("ID")] = len(rows)
+            rows.append(row)
+        elif op == "update":
+            row = to_record(rec["row"], cls)
+            idx = positions.get(row.get("ID"))
+            if idx is not None:
+                rows[idx] = row
+        elif op == "delete":
+            for row_id in rec["ids"]:
+                idx = positions.pop(row_id, None)
+                if idx is not None:
+                    rows[idx] = None
 
+    return unify([row for row in rows if row is not None])
@@ -0,0 +1,32 @@
+from collections import OrderedDict
+
+import pytest
+
+from src.primitive_db import engine, utils
+from src.primitive_db.buffer import BUFFER_POOL
+from src.primitive_db.cache import PlanCache, SelectCache
+from src.primitive_db.decorators import set_auto_confirm
+from src.primitive_db.locks import LOCKS
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Пустая база в tmp_path с пустыми кэшами и пулом буферов."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(BUFFER_POOL, "_entries", OrderedDict())
+    monkeypatch.setattr(BUFFER_POOL, "_rows", 0)
+    monkeypatch.setattr(engine, "SELECT_CACHE", SelectCache())
+    monkeypatch.setattr(engine, "PLAN_CACHE", PlanCache())
+    monkeypatch.setattr(engine, "_table_signatures", {})
+    monkeypatch.setattr(utils, "_pending_lines", {})
+    monkeypatch.setattr(utils, "_pending_meta", {})
+    set_auto_confirm(True)
+    yield tmp_path
+    set_auto_confirm(False)
+    LOCKS.release_all()
+
+
+def run(*commands: str) -> None:
+    """Выполняет команды по одной, как в интерактивном режиме."""
+    for command in commands:
+        engine.execute(command)
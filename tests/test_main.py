@@ -0,0 +1,13 @@
+import pytest
+
+from src.primitive_db import main
+
+
+def test_script_from_stdin_requires_yes(db, monkeypatch, capsys):
+    monkeypatch.setattr("sys.argv", ["database", "--script", "-"])
+
+    with pytest.raises(SystemExit) as exc:
+        main.main()
+
+    assert exc.value.code == 2
+    assert "--yes" in capsys.readouterr().err
@@ -0,0 +1,35 @@
+from conftest import run
+
+from src.primitive_db.metrics import METRICS, OTHER_LABEL
+
+
+def _labels(name: str) -> set[tuple]:
+    return {
+        labels for (metric, labels), _ in METRICS.counters.items() if metric == name
+    }
+
+
+def test_unknown_commands_and_tables_share_other_label(db, monkeypatch):
+    monkeypatch.setattr(METRICS, "enabled", True)
+    monkeypatch.setattr(METRICS, "counters", {})
+    monkeypatch.setattr(METRICS, "histograms", {})
+
+    run(
+        "create_table t name:str",
+        'insert into t values ("a")',
+        "selct from t",
+        "frobnicate t",
+        "frobnicate2 t",
+        "select from missing1",
+        "select from missing2",
+        "info missing3",
+    )
+
+    assert _labels("commands_total") == {
+        (("command", "create_table"), ("table", OTHER_LABEL)),
+        (("command", "insert"), ("table", "t")),
+        (("command", OTHER_LABEL), ("table", OTHER_LABEL)),
+        (("command", OTHER_LABEL), ("table", "t")),
+        (("command", "select"), ("table", OTHER_LABEL)),
+        (("command", "info"), ("table", OTHER_LABEL)),
+    }
@@ -0,0 +1,42 @@
+import pytest
+from conftest import run
+
+from src.primitive_db import engine, parallel
+from src.primitive_db.cache import SelectCache
+
+
+@pytest.fixture
+def workers(db, monkeypatch):
+    """Параллельный просмотр уже с 10 строк, сегменты по 4 строки."""
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_ROWS", 10)
+    monkeypatch.setattr(parallel, "SEGMENT_ROWS", 4)
+    parallel.set_workers(2)
+    yield
+    parallel.set_workers(1)
+
+
+def test_parallel_scan_matches_sequential(workers, monkeypatch, capsys):
+    values = ", ".join(f'("n{n}", {n % 3})' for n in range(1, 31))
+    run("create_table t name:str grp:int", f"insert into t values {values}")
+    queries = [
+        'select from t where grp = 1 or name = "n2"',
+        "select count(*), sum(ID), max(name) from t where grp > 0 group by grp",
+    ]
+    calls = []
+    map_segments = parallel._map
+    monkeypatch.setattr(
+        parallel, "_map", lambda *args: calls.append(args) or map_segments(*args)
+    )
+    capsys.readouterr()
+    run(*queries)
+    parallel_out = capsys.readouterr().out
+    assert parallel._pool is not None
+
+    parallel.set_workers(1)
+    assert parallel._pool is None
+    monkeypatch.setattr(engine, "SELECT_CACHE", SelectCache())
+    run(*queries)
+
+    assert len(calls) == 2
+    assert capsys.readouterr().out == parallel_out
+    assert "n28" in parallel_out and "n2 " in parallel_out
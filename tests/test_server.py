@@ -0,0 +1,63 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+
+from src.primitive_db.client import Client
+from src.primitive_db.server import DatabaseServer
+
+
+@pytest.fixture
+def client(db):
+    """Клиент сервера, запущенного в отдельном потоке на свободном порту."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    server = DatabaseServer()
+    listener = asyncio.run_coroutine_threadsafe(
+        server.start("127.0.0.1", 0), loop
+    ).result(timeout=10)
+    port = listener.sockets[0].getsockname()[1]
+
+    with Client(port=port, timeout=10) as client:
+        yield client
+
+    async def stop():
+        listener.close()
+        await listener.wait_closed()
+
+    asyncio.run_coroutine_threadsafe(stop(), loop).result(timeout=10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=10)
+    loop.close()
+    server.close()
+
+
+def test_pipeline_returns_responses_in_request_order(client):
+    client.execute("create_table t name:str")
+    commands = [f'insert into t values ("v{n}")' for n in range(1, 151)]
+
+    outputs = client.pipeline(commands, window=16)
+
+    assert outputs == [
+        f'Запись с ID={n} успешно добавлена в таблицу "t".\n' for n in range(1, 151)
+    ]
+    assert "v150" in client.execute("select from t where ID = 150")
+
+
+def test_transaction_rolls_back_when_connection_drops(client):
+    client.execute("create_table t name:str")
+    conn = socket.create_connection(("127.0.0.1", client.port), timeout=10)
+    file = conn.makefile("rb")
+    conn.sendall('begin\ninsert into t values ("lost")\n'.encode())
+    assert b'"ok": true' in file.readline()
+    assert b'"ok": true' in file.readline()
+    file.close()
+    conn.close()
+
+    # Команды других соединений ждут, пока транзакция отключившегося
+    # клиента не будет отменена.
+    assert "lost" not in client.execute("select from t")
+    client.execute('insert into t values ("kept")')
+    assert "kept" in client.execute("select from t where ID = 1")
@@ -0,0 +1,84 @@
+from conftest import run
+
+from src.primitive_db import engine
+from src.primitive_db.utils import load_table_data
+
+
+def _rows(table_name: str) -> list[tuple]:
+    return [(row.get("ID"), row.get("name")) for row in load_table_data(table_name)]
+
+
+def test_update_rejects_id_assignment(db, capsys):
+    run(
+        "create_table t name:str",
+        'insert into t values ("a"), ("b"), ("c")',
+    )
+    capsys.readouterr()
+
+    run(
+        'update t set ID = 10 where name = "a"',
+        'update t set ID = 3 where name = "b"',
+        'update t set name = "x", ID = 3 where name = "b"',
+    )
+
+    out = capsys.readouterr().out
+    assert out.count("Некорректное значение: ID (ID записи не изменяется)") == 3
+    assert _rows("t") == [(1, "a"), (2, "b"), (3, "c")]
+
+
+def test_create_table_rejects_names_queries_cannot_reach(db, capsys):
+    run(
+        "create_table t group:str",
+        "create_table t In:int",
+        "create_table t 42:int",
+        "create_table t true:bool",
+        "create_table 123 name:str",
+        "create_table where name:str",
+    )
+
+    out = capsys.readouterr().out
+    assert "успешно создана" not in out
+    for name in ("group", "In", "42", "true", "123", "where"):
+        assert f"Некорректное значение: {name}. Попробуйте снова." in out
+
+
+def test_created_names_can_be_queried(db, capsys):
+    run(
+        "create_table t grouping:str count:int",
+        'insert into t values ("x", 1)',
+    )
+    capsys.readouterr()
+
+    run('select from t where grouping = "x" and count = 1')
+
+    assert "| 1  |    x     |   1   |" in capsys.readouterr().out
+
+
+def test_select_without_limit_prints_pages_while_scanning(db, monkeypatch):
+    values = ", ".join(f'("n{n}")' for n in range(1, 251))
+    run("create_table t name:str", f"insert into t values {values}")
+    monkeypatch.setattr(engine.SELECT_CACHE, "max_rows", 200)
+    scanned = []
+    iter_select = engine.iter_select
+
+    def record(*args, **kwargs):
+        for row in iter_select(*args, **kwargs):
+            scanned.append(row)
+            yield row
+
+    printed = []
+    monkeypatch.setattr(engine, "iter_select", record)
+    monkeypatch.setattr(
+        engine,
+        "print",
+        lambda page, **kwargs: printed.append(len(scanned)),
+        raising=False,
+    )
+
+    run("select from t offset 5", 'select from t where name < "n2"')
+    # Первая страница (строки 6..105) напечатана до просмотра остальных.
+    assert printed[:3] == [106, 206, 250]
+    run("select from t offset 5", 'select from t where name < "n2"')
+
+    stats = engine.SELECT_CACHE.stats()
+    assert (stats["hits"], stats["rows"]) == (1, 111)
@@ -0,0 +1,139 @@
+import json
+
+import pytest
+from conftest import run
+
+from src.primitive_db import utils
+from src.primitive_db.buffer import BUFFER_POOL
+from src.primitive_db.catalog import table_settings
+from src.primitive_db.utils import (
+    DB_META_FILEPATH,
+    deferred_writes,
+    load_metadata,
+    load_table_data,
+)
+
+
+def test_lowercase_id_column_is_stored_as_id(db):
+    run(
+        "create_table t id:int name:str",
+        'insert into t values ("a")',
+        'insert into t values ("b")',
+        'insert into t values ("c")',
+    )
+
+    assert list(load_metadata(DB_META_FILEPATH)["t"]) == ["ID", "name"]
+    rows = load_table_data("t")
+    assert [(row.get("ID"), row.get("name")) for row in rows] == [
+        (1, "a"),
+        (2, "b"),
+        (3, "c"),
+    ]
+
+
+def test_lowercase_id_select_after_reload(db, capsys):
+    run(
+        "create_table t id:int name:str",
+        'insert into t values ("alpha")',
+        'insert into t values ("beta")',
+    )
+    BUFFER_POOL.evict_table("t")
+    capsys.readouterr()
+
+    run("select from t")
+
+    out = capsys.readouterr().out
+    assert "alpha" in out and "beta" in out
+
+
+def _sequence_on_disk(table_name: str) -> int:
+    with open(utils.stats_path(table_name), encoding="utf-8") as file:
+        return json.load(file)["sequence"]
+
+
+def _fail(*args):
+    raise OSError("сбой записи")
+
+
+def test_batch_flush_writes_metadata_before_log(db, monkeypatch):
+    run("create_table t name:str")
+    monkeypatch.setattr(utils, "_append_lines", _fail)
+
+    with pytest.raises(OSError):
+        with deferred_writes():
+            run('insert into t values ("a")', 'insert into t values ("b")')
+
+    # Журнал не записан, но последовательность уже сохранена: выданные
+    # ID не будут выданы повторно.
+    assert _sequence_on_disk("t") == 2
+    assert load_table_data("t") == []
+
+
+def test_checkpoint_in_batch_writes_metadata_before_segments(db, monkeypatch):
+    run("create_table t name:str")
+    monkeypatch.setattr(utils, "_write_segment", _fail)
+
+    with deferred_writes():
+        run('insert into t values ("a")')
+        with pytest.raises(OSError):
+            run("checkpoint t")
+        assert _sequence_on_disk("t") == 1
+
+
+def test_info_reads_tombstone_count_from_metadata(db, monkeypatch, capsys):
+    run(
+        "create_table t name:str",
+        'insert into t values ("a"), ("b"), ("c")',
+        "checkpoint t",
+        'delete from t where name = "b"',
+        "checkpoint t",
+    )
+    assert table_settings(load_metadata(DB_META_FILEPATH), "t")["tombstones"] == 1
+    monkeypatch.setattr(utils, "_load_rows", _fail)
+    capsys.readouterr()
+
+    run("info t")
+
+    assert "Удалённых строк до уплотнения: 1" in capsys.readouterr().out
+
+
+def test_single_row_write_does_not_rewrite_catalog(db, monkeypatch):
+    run("create_table t name:str", 'insert into t values ("a")')
+    catalog = load_metadata(DB_META_FILEPATH)
+    written = []
+    atomic_write = utils.atomic_write
+
+    def record(path, *args, **kwargs):
+        written.append(path)
+        atomic_write(path, *args, **kwargs)
+
+    monkeypatch.setattr(utils, "atomic_write", record)
+
+    run(
+        'insert into t values ("b")',
+        'update t set name = "c" where name = "b"',
+        'delete from t where name = "c"',
+    )
+
+    assert written and DB_META_FILEPATH not in written
+    assert load_metadata(DB_META_FILEPATH) == catalog
+    with open(utils.stats_path("t"), encoding="utf-8") as file:
+        state = json.load(file)
+    assert state["sequence"] == 2
+    assert state["stats"]["rows"] == 1
+
+
+def test_state_moves_out_of_catalog_of_older_tables(db):
+    run("create_table t name:str", 'insert into t values ("a")')
+    with open(utils.stats_path("t"), encoding="utf-8") as file:
+        state = json.load(file)
+    catalog = load_metadata(DB_META_FILEPATH)
+    table_settings(catalog, "t").update(state)
+    utils.save_metadata(DB_META_FILEPATH, catalog)
+    utils.remove_files(utils.stats_path("t"))
+
+    run('insert into t values ("b")')
+
+    assert "sequence" not in table_settings(load_metadata(DB_META_FILEPATH), "t")
+    assert _sequence_on_disk("t") == 2
+    assert [row.get("ID") for row in load_table_data("t")] == [1, 2]